@@ -1,3 +1,5 @@
+import copy
+
 from pluribus_vle.autoload.vle_blade import VLEBlade
 from pluribus_vle.autoload.vle_fabric import VLEFabric
 from pluribus_vle.autoload.vle_port import VLEPort
@@ -13,6 +15,8 @@ class Autoload(object):
         self._ports_table = ports_table
         self._resource_address = resource_address
         self._associations_table = associations_table
+        self._ports_dict = None
+        self._structure = None
 
     def _build_fabric(self):
         fabric = VLEFabric(self._fabric_name, self._resource_address, self._fabric_id)
@@ -57,8 +61,8 @@ class Autoload(object):
             ports_dict[(fabric_node.resource_id, port_id)] = port
         return ports_dict
 
-    def _build_mappings(self, ports_dict):
-        for slave_port_id, master_port_id in self._associations_table.iteritems():
+    def _build_mappings(self, ports_dict, associations_table):
+        for slave_port_id, master_port_id in associations_table.iteritems():
             slave_port = ports_dict.get(slave_port_id)
             master_port = ports_dict.get(master_port_id)
             if slave_port and master_port:
@@ -68,5 +72,30 @@ class Autoload(object):
         fabric = self._build_fabric()
         nodes_dict = self.build_fabric_nodes(fabric)
         ports_dict = self._build_ports(nodes_dict)
-        self._build_mappings(ports_dict)
-        return [fabric]
+        self._build_mappings(ports_dict, self._associations_table)
+        self._ports_dict = ports_dict
+        self._structure = [fabric]
+        return self._structure
+
+    def patch_mappings(self, associations_table):
+        """ Structure with the mappings created since it was built added.
+
+        The mappings are added to a copy, structures already returned are
+        not changed.
+        :return: the structure, None if a mapping was removed or changed, then
+            it has to be built again
+        :rtype: list
+        """
+        for port_id, peer_port_id in self._associations_table.iteritems():
+            if associations_table.get(port_id) != peer_port_id:
+                return None
+        added = {port_id: peer_port_id
+                 for port_id, peer_port_id in associations_table.iteritems()
+                 if port_id not in self._associations_table}
+        if added:
+            # Copied together, the ports stay the ones of the copied structure
+            self._structure, self._ports_dict = copy.deepcopy(
+                (self._structure, self._ports_dict))
+            self._build_mappings(self._ports_dict, added)
+        self._associations_table = associations_table
+        return self._structure
@@ -0,0 +1,25 @@
+from pluribus_vle.helpers import deadline
+
+
+class DeadlineSessionMixin(object):
+    """ Limit expect timeouts by the deadline of the current command.
+
+    The session which ran out of the deadline is deactivated: the output of
+    the interrupted command may still arrive on it, so the session pool drops
+    it instead of handing it to the next command.
+    """
+
+    def _receive_all(self, timeout, logger):
+        timeout = timeout or self._timeout
+        try:
+            bounded = deadline.bounded_timeout(timeout)
+        except deadline.DeadlineExceeded:
+            self.set_active(False)
+            raise
+        try:
+            return super(DeadlineSessionMixin, self)._receive_all(bounded, logger)
+        except Exception:
+            if bounded < timeout:
+                # Timed out by the deadline, not by the session timeout
+                self.set_active(False)
+            raise
@@ -3,20 +3,20 @@
 
 from cloudshell.cli.cli import CLI
 from cloudshell.cli.command_mode_helper import CommandModeHelper
-from cloudshell.cli.session.telnet_session import TelnetSession
 from cloudshell.cli.session_pool_manager import SessionPoolManager
 from cloudshell.layer_one.core.helper.runtime_configuration import RuntimeConfiguration
 from cloudshell.layer_one.core.layer_one_driver_exception import LayerOneDriverException
 from pluribus_vle.cli.command_modes import DefaultCommandMode
 from pluribus_vle.cli.vw_ssh_session import VWSSHSession
+from pluribus_vle.cli.vw_telnet_session import VWTelnetSession
 
 
 class VWCliHandler(object):
-    def __init__(self, logger):
+    def __init__(self, logger, max_pool_size=1):
         self._logger = logger
-        self._cli = CLI(session_pool=SessionPoolManager(max_pool_size=1))
+        self._cli = CLI(session_pool=SessionPoolManager(max_pool_size=max_pool_size))
         self.modes = CommandModeHelper.create_command_mode()
-        self._defined_session_types = {"SSH": VWSSHSession, "TELNET": TelnetSession}
+        self._defined_session_types = {"SSH": VWSSHSession, "TELNET": VWTelnetSession}
 
         self._session_types = RuntimeConfiguration().read_key(
             "API.CLI.TYPE", ["SSH"]) or self._defined_session_types.keys()
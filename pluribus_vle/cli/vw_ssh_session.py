@@ -1,7 +1,8 @@
 from cloudshell.cli.session.ssh_session import SSHSession
+from pluribus_vle.cli.deadline_session import DeadlineSessionMixin
 
 
-class VWSSHSession(SSHSession):
+class VWSSHSession(DeadlineSessionMixin, SSHSession):
     def _connect_actions(self, prompt, logger):
         self.hardware_expect(
             command=None,
@@ -0,0 +1,6 @@
+from cloudshell.cli.session.telnet_session import TelnetSession
+from pluribus_vle.cli.deadline_session import DeadlineSessionMixin
+
+
+class VWTelnetSession(DeadlineSessionMixin, TelnetSession):
+    pass
@@ -1,3 +1,8 @@
+from cloudshell.cli.command_template.command_template_executor import \
+    CommandTemplateExecutor
+from pluribus_vle.helpers.single_flight import SingleFlight
+
+
 class ActionsManager(object):
     def __init__(self, actions_instance, cli_service):
         self._actions_instance = actions_instance
@@ -35,3 +40,36 @@ class ActionsHelper(object):
                     result_dict[key] = values[keys.index(key)]
                 result_table.append(result_dict)
         return result_table
+
+
+class ReadCommandExecutor(CommandTemplateExecutor):
+    """ Executor of read-only command templates.
+
+    Identical reads in flight on the same device are sent to it once, the
+    other callers get the output of the first one.
+    """
+    _reads = SingleFlight()
+
+    def __init__(self, cli_service, command_template, *args, **kwargs):
+        super(ReadCommandExecutor, self).__init__(cli_service, command_template,
+                                                  *args, **kwargs)
+        host = getattr(getattr(cli_service, "session", None), "host", None)
+        self._read_key = (host, command_template, tuple(sorted(kwargs.items())))
+
+    def execute_command(self, **command_kwargs):
+        key = self._read_key + (tuple(sorted(command_kwargs.items())),)
+        return self._reads.do(key, super(ReadCommandExecutor, self).execute_command,
+                              **command_kwargs)
+
+
+class WriteCommandExecutor(CommandTemplateExecutor):
+    """ Executor of command templates changing the device.
+
+    Reads in flight when the command completes are not joined anymore.
+    """
+
+    def execute_command(self, **command_kwargs):
+        try:
+            return super(WriteCommandExecutor, self).execute_command(**command_kwargs)
+        finally:
+            ReadCommandExecutor._reads.wrote()
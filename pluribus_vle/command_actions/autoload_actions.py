@@ -4,9 +4,8 @@ import re
 
 import pluribus_vle.command_templates.autoload as command_template
 
-from cloudshell.cli.command_template.command_template_executor import \
-    CommandTemplateExecutor
-from pluribus_vle.command_actions.actions_helper import ActionsHelper
+from pluribus_vle.command_actions.actions_helper import ActionsHelper, \
+    ReadCommandExecutor
 
 
 class AutoloadActions(object):
@@ -23,13 +22,27 @@ class AutoloadActions(object):
         self._cli_service = cli_service
         self._logger = logger
 
-    def ports_table(self, switch_name):
-        """ """
+    @property
+    def cli_service(self):
+        return self._cli_service
+
+    @cli_service.setter
+    def cli_service(self, cli_service):
+        self._cli_service = cli_service
+
+    def ports_table(self, switch_name, port_id=None):
+        """ Get ports table, of the given port only if port_id passed. """
         port_table = {}
-        logic_ports_output = CommandTemplateExecutor(
-            self._cli_service,
-            command_template.PORT_SHOW
-        ).execute_command(switch_name=switch_name)
+        if port_id is None:
+            logic_ports_output = ReadCommandExecutor(
+                self._cli_service,
+                command_template.PORT_SHOW
+            ).execute_command(switch_name=switch_name)
+        else:
+            logic_ports_output = ReadCommandExecutor(
+                self._cli_service,
+                command_template.PORT_SHOW_FOR_PORT
+            ).execute_command(switch_name=switch_name, port_id=port_id)
 
         for record in re.findall(r"^\d+:.+:.+$", logic_ports_output,
                                  flags=re.MULTILINE):
@@ -42,8 +55,8 @@ class AutoloadActions(object):
         return port_table
 
     def associations_table(self):
-        out = CommandTemplateExecutor(self._cli_service, command_template.VLE_SHOW,
-                                      remove_prompt=True).execute_command()
+        out = ReadCommandExecutor(self._cli_service, command_template.VLE_SHOW,
+                                  remove_prompt=True).execute_command()
 
         associations_table = {}
         for line in out.splitlines():
@@ -55,22 +68,24 @@ class AutoloadActions(object):
                 associations_table[slave_port] = master_port
         return associations_table
 
-    def fabric_nodes_table(self, fabric_name):
+    def fabric_nodes_table(self, fabric_name, node_names=None):
+        """ Get fabric nodes data, of the given nodes only if node_names passed. """
 
-        out = CommandTemplateExecutor(self._cli_service,
-                                      command_template.FABRIC_NODES_SHOW,
-                                      remove_prompt=True).execute_command(
+        out = ReadCommandExecutor(self._cli_service,
+                                  command_template.FABRIC_NODES_SHOW,
+                                  remove_prompt=True).execute_command(
             fabric_name=fabric_name)
         nodes_table = {}
         for line in out.splitlines():
             match = re.match(r".+\:(.+)\:.+", line)
             if match:
                 node_name = match.group(1).strip()
-                nodes_table[node_name] = self._switch_info_table(node_name)
+                if node_names is None or node_name in node_names:
+                    nodes_table[node_name] = self._switch_info_table(node_name)
         return nodes_table
 
     def _switch_info_table(self, switch_name):
-        out = CommandTemplateExecutor(self._cli_service, command_template.SWITCH_INFO,
-                                      remove_prompt=True).execute_command(
+        out = ReadCommandExecutor(self._cli_service, command_template.SWITCH_INFO,
+                                  remove_prompt=True).execute_command(
             switch_name=switch_name)
         return ActionsHelper.parse_table(out)
@@ -1,13 +1,31 @@
 import pluribus_vle.command_templates.mapping as command_template
-from cloudshell.cli.command_template.command_template_executor import \
-    CommandTemplateExecutor
 from cloudshell.cli.session.session_exceptions import CommandExecutionException
-from pluribus_vle.command_actions.actions_helper import ActionsHelper
+from pluribus_vle.command_actions.actions_helper import ActionsHelper, \
+    ReadCommandExecutor, WriteCommandExecutor
 from pluribus_vle.constants import FORBIDDEN_PORT_STATUS_TABLE
+from pluribus_vle.helpers.mapping_plan import MappingPlan, Operation, PlanBackend, \
+    PlanExecutor
+from pluribus_vle.helpers.port_vlan_index import PortVlanIndex, parse_vlan_ids
 
 
-class MappingActions(object):
+class MappingActions(PlanBackend):
     """Autoload actions."""
+    OPERATION_HANDLERS = {
+        Operation.VALIDATE_PORT: "_validate_port",
+        Operation.CREATE_VLAN: "_create_vlan",
+        Operation.CREATE_EMPTY_VLAN: "_create_empty_vlan",
+        Operation.ADD_PORT: "_add_to_vlan",
+        Operation.REMOVE_PORT: "_remove_from_vlan",
+        Operation.ADD_VXLAN: "_add_vxlan",
+        Operation.REMOVE_VXLAN: "_remove_vxlan",
+        Operation.VERIFY_VXLAN: "_validate_vxlan_add",
+        Operation.CREATE_VLE: "_create_vle",
+        Operation.VERIFY_VLE: "_validate_vle_creation",
+        Operation.DELETE_VLE: "_delete_vle",
+        Operation.VERIFY_VLE_DELETED: "_validate_vle_deletion",
+        Operation.DELETE_VLAN: "_delete_vlan",
+        Operation.VERIFY_VLAN_DELETED: "_validate_vlan_id_deletion",
+    }
 
     def __init__(self, cli_service, logger):
         """
@@ -20,6 +38,8 @@ class MappingActions(object):
 
         self.__associations_table = None
         self.__phys_to_logical_table = None
+        self._port_vlan_indexes = {}
+        self._port_status_tables = {}
 
     @property
     def cli_service(self):
@@ -30,87 +50,66 @@ class MappingActions(object):
         self._cli_service = cli_service
 
     def map_bidi_multi_node(self, src_node, dst_node, src_port, dst_port, src_tunnel,
-                            dst_tunnel, vlan_id, vle_name):
-        self._validate_port(src_node, src_port)
-        self._validate_port(dst_node, dst_port)
-        self._create_vlan(src_node, src_port, vlan_id)
-        out = CommandTemplateExecutor(
-            self._cli_service,
-            command_template.ADD_VXLAN_TO_TUNNEL
-        ).execute_command(node_name=src_node, tunnel_name=src_tunnel, vxlan_id=vlan_id)
-        self._validate_vxlan_add(src_node, vlan_id, src_tunnel)
+                            dst_tunnel, vlan_id, vle_name, dst_cli_service=None,
+                            plan_filter=None, completed=None, compensate=True):
+        """ Create BiDirectional connection on multiple nodes.
 
-        self._create_vlan(dst_node, dst_port, vlan_id)
-        out += CommandTemplateExecutor(
-            self._cli_service,
-            command_template.ADD_VXLAN_TO_TUNNEL
-        ).execute_command(node_name=dst_node, tunnel_name=dst_tunnel, vxlan_id=vlan_id)
-        self._validate_vxlan_add(dst_node, vlan_id, dst_tunnel)
+        If dst_cli_service is passed, the destination node is provisioned
+        through it concurrently with the source node. plan_filter selects the
+        part of the mapping plan to execute, keys of executed operations are
+        added to completed.
+        """
+        node_backends = {}
+        if dst_cli_service:
+            node_backends[dst_node] = MappingActions(dst_cli_service, self._logger)
+        plan = MappingPlan.map_multi_node(src_node, dst_node, src_port, dst_port,
+                                          src_tunnel, dst_tunnel, vlan_id, vle_name)
+        if plan_filter:
+            plan = plan_filter(plan)
+        PlanExecutor(self, self._logger, node_backends).execute(plan, completed,
+                                                                compensate)
 
-        out += CommandTemplateExecutor(
-            self._cli_service,
-            command_template.VLE_CREATE
-        ).execute_command(
-            vle_name=vle_name,
-            node_1=src_node,
-            node_1_port=src_port,
-            node_2=dst_node,
-            node_2_port=dst_port
-        )
-        self._validate_vle_creation(vle_name)
+    def map_bidi_warm_multi_node(self, src_node, dst_node, src_port, dst_port,
+                                 vlan_id, vle_name):
+        plan = MappingPlan.map_multi_node_warm(src_node, dst_node, src_port, dst_port,
+                                               vlan_id, vle_name)
+        PlanExecutor(self, self._logger).execute(plan, compensate=True)
 
-    def map_bidi_single_node(self, node, src_port, dst_port, vlan_id, vle_name):
-        self._validate_port(node, src_port)
-        self._validate_port(node, dst_port)
-        self._create_vlan(node, src_port, vlan_id)
-        self._add_to_vlan(node, dst_port, vlan_id)
+    def warm_up(self, src_node, dst_node, src_tunnel, dst_tunnel, vlan_id,
+                description):
+        plan = MappingPlan.warm_up(src_node, dst_node, src_tunnel, dst_tunnel, vlan_id,
+                                   description)
+        PlanExecutor(self, self._logger).execute(plan)
 
-        out = CommandTemplateExecutor(
-            self._cli_service,
-            command_template.VLE_CREATE
-        ).execute_command(
-            vle_name=vle_name,
-            node_1=node,
-            node_1_port=src_port,
-            node_2=node,
-            node_2_port=dst_port
-        )
-        self._validate_vle_creation(vle_name)
+    def map_bidi_single_node(self, node, src_port, dst_port, vlan_id, vle_name,
+                             plan_filter=None, completed=None, compensate=True):
+        plan = MappingPlan.map_single_node(node, src_port, dst_port, vlan_id, vle_name)
+        if plan_filter:
+            plan = plan_filter(plan)
+        PlanExecutor(self, self._logger).execute(plan, completed, compensate)
+
+    def release_vlan(self, node, vlan_id):
+        """ Delete VLAN created for a mapping which has not been completed. """
+        PlanExecutor(self, self._logger).execute(MappingPlan.release_vlan(node, vlan_id))
 
     def delete_single_node_vle(self, node, vle_name, vlan_id):
-        out = CommandTemplateExecutor(
-            self._cli_service,
-            command_template.DELETE_VLE
-        ).execute_command(vle_name=vle_name)
-        self._validate_vle_deletion(vle_name)
-        out += CommandTemplateExecutor(
-            self._cli_service,
-            command_template.DELETE_VLAN
-        ).execute_command(node=node, vlan_id=vlan_id)
-        self._validate_vlan_id_deletion(node, vlan_id)
+        plan = MappingPlan.clear([node], vle_name, vlan_id)
+        PlanExecutor(self, self._logger).execute(plan)
 
     def delete_multi_node_vle(self, src_node, dst_node, vle_name, vlan_id):
-        out = CommandTemplateExecutor(
-            self._cli_service,
-            command_template.DELETE_VLE).execute_command(vle_name=vle_name)
-        self._validate_vle_deletion(vle_name)
-        out += CommandTemplateExecutor(
-            self._cli_service,
-            command_template.DELETE_VLAN).execute_command(
-            node=src_node,
-            vlan_id=vlan_id
-        )
-        self._validate_vlan_id_deletion(src_node, vlan_id)
-        out += CommandTemplateExecutor(
-            self._cli_service,
-            command_template.DELETE_VLAN).execute_command(
-            node=dst_node,
-            vlan_id=vlan_id
-        )
-        self._validate_vlan_id_deletion(dst_node, vlan_id)
+        plan = MappingPlan.clear([src_node, dst_node], vle_name, vlan_id)
+        PlanExecutor(self, self._logger).execute(plan)
+
+    def delete_vle(self, vle_name):
+        self._delete_vle(vle_name)
+
+    def delete_vle_vlans(self, nodes, vle_name, vlan_id):
+        plan = MappingPlan.clear(nodes, vle_name, vlan_id).select(
+            lambda operation: operation.kind != Operation.DELETE_VLE)
+        PlanExecutor(self, self._logger).execute(plan)
 
     def connection_table(self):
-        out = CommandTemplateExecutor(
+        out = ReadCommandExecutor(
             self._cli_service, command_template.VLE_SHOW,
             remove_prompt=True).execute_command()
 
@@ -138,43 +137,77 @@ class MappingActions(object):
 
     def _create_vlan(self, node, port, vlan_id):
         self._remove_port_from_vlans(node, port)
-        self._validate_port_is_not_a_member(node, port)
-        out = CommandTemplateExecutor(
+        out = WriteCommandExecutor(
             self._cli_service,
             command_template.CREATE_VLAN,
         ).execute_command(node_name=node, vlan_id=vlan_id, vxlan_id=vlan_id, port=port)
-        self._validate_port_is_a_member(node, port, vlan_id)
+        self._port_vlan_index(node).set_vlan_ids(port, [vlan_id])
+
+    def _create_empty_vlan(self, node, vlan_id, description):
+        WriteCommandExecutor(
+            self._cli_service,
+            command_template.CREATE_EMPTY_VLAN,
+        ).execute_command(node_name=node, vlan_id=vlan_id, vxlan_id=vlan_id,
+                          description=description)
 
     def _add_to_vlan(self, node, port, vlan_id):
         self._remove_port_from_vlans(node, port)
-        self._validate_port_is_not_a_member(node, port)
-        out = CommandTemplateExecutor(
+        out = WriteCommandExecutor(
             self._cli_service,
             command_template.ADD_TO_VLAN
         ).execute_command(node_name=node, vlan_id=vlan_id, port=port)
-        self._validate_port_is_a_member(node, port, vlan_id)
+        self._port_vlan_index(node).set_vlan_ids(port, [vlan_id])
 
-    def _validate_port_is_not_a_member(self, node, port):
-        vlan_members = self.vlan_ids_for_port(node, port)
-        if vlan_members and len(set(vlan_members) - {1}) > 0:
-            raise CommandExecutionException(
-                "Port {} already a member of vlan_id {}".format(
-                    (node, port),
-                    vlan_members)
-            )
+    def _remove_from_vlan(self, node, port, vlan_id):
+        WriteCommandExecutor(
+            self._cli_service,
+            command_template.REMOVE_FROM_VLANS
+        ).execute_command(node_name=node, port=port, vlan_ids=vlan_id)
+        self._port_vlan_index(node).discard(port, vlan_id)
 
-    def _validate_port_is_a_member(self, node, port, vlan_id):
-        vlan_members = self.vlan_ids_for_port(node, port)
-        if not vlan_members or int(vlan_id) not in vlan_members:
-            raise CommandExecutionException(
-                "Cannot add port {} to vlan {}".format((node, port), vlan_id)
-            )
+    def _add_vxlan(self, node, tunnel, vlan_id):
+        out = WriteCommandExecutor(
+            self._cli_service,
+            command_template.ADD_VXLAN_TO_TUNNEL
+        ).execute_command(node_name=node, tunnel_name=tunnel, vxlan_id=vlan_id)
+
+    def _remove_vxlan(self, node, tunnel, vlan_id):
+        WriteCommandExecutor(
+            self._cli_service,
+            command_template.REMOVE_VXLAN_FROM_TUNNEL
+        ).execute_command(node_name=node, tunnel_name=tunnel, vxlan_id=vlan_id)
+
+    def _create_vle(self, vle_name, node_1, node_1_port, node_2, node_2_port):
+        out = WriteCommandExecutor(
+            self._cli_service,
+            command_template.VLE_CREATE
+        ).execute_command(
+            vle_name=vle_name,
+            node_1=node_1,
+            node_1_port=node_1_port,
+            node_2=node_2,
+            node_2_port=node_2_port
+        )
+
+    def _delete_vle(self, vle_name):
+        out = WriteCommandExecutor(
+            self._cli_service,
+            command_template.DELETE_VLE
+        ).execute_command(vle_name=vle_name)
+
+    def _delete_vlan(self, node, vlan_id):
+        out = WriteCommandExecutor(
+            self._cli_service,
+            command_template.DELETE_VLAN
+        ).execute_command(node=node, vlan_id=vlan_id)
+        if node in self._port_vlan_indexes:
+            self._port_vlan_indexes[node].remove_vlan(vlan_id)
 
     def _validate_vxlan_add(self, node_name, vxlan_id, tunnel):
         switch_key = "switch"
         tunnel_name_key = "tunnel_name"
         vxlan_id_key = "vxlan_id"
-        out = CommandTemplateExecutor(
+        out = ReadCommandExecutor(
             self._cli_service,
             command_template.VXLAN_SHOW,
             remove_prompt=True
@@ -199,7 +232,7 @@ class MappingActions(object):
         node_1_port_key = "node_1_port"
         node_2_port_key = "node_2_port"
         status_key = "status"
-        out = CommandTemplateExecutor(
+        out = ReadCommandExecutor(
             self._cli_service,
             command_template.VLE_SHOW_FOR_NAME,
             remove_prompt=True
@@ -218,7 +251,7 @@ class MappingActions(object):
         node_1_port_key = "node_1_port"
         node_2_port_key = "node_2_port"
         status_key = "status"
-        out = CommandTemplateExecutor(
+        out = ReadCommandExecutor(
             self._cli_service,
             command_template.VLE_SHOW_FOR_NAME,
             remove_prompt=True
@@ -231,7 +264,7 @@ class MappingActions(object):
                 "Failed to delete VLE {}, see logs for more details".format(vle_name))
 
     def _validate_vlan_id_deletion(self, node_name, vlan_id):
-        out = CommandTemplateExecutor(
+        out = ReadCommandExecutor(
             self._cli_service,
             command_template.VLAN_SHOW,
             remove_prompt=True
@@ -247,61 +280,71 @@ class MappingActions(object):
             )
 
     def vlan_ids_for_port(self, node, port):
-        out = CommandTemplateExecutor(
-            self._cli_service,
-            command_template.PORT_VLAN_INFO,
-            remove_prompt=True
-        ).execute_command(node=node, port=port)
-        node_key = "node"
-        port_key = "port"
-        vlan_id_key = "vlan"
+        return self._port_vlan_index(node).vlan_ids(port)
 
-        out_table = ActionsHelper.parse_table_by_keys(
-            out, node_key, port_key, vlan_id_key
-        )
-        value = out_table[0].get(vlan_id_key)
-        if value is not None and value.lower() != "none":
-            return map(int, value.split(","))
+    def _port_vlan_index(self, node):
+        """ Port to VLAN membership index of the node, loaded on first use. """
+        index = self._port_vlan_indexes.get(node)
+        if index is None:
+            out = ReadCommandExecutor(
+                self._cli_service,
+                command_template.PORTS_VLAN_INFO,
+                remove_prompt=True
+            ).execute_command(node=node)
+            node_key = "node"
+            port_key = "port"
+            vlan_id_key = "vlan"
 
-    def _validate_port(self, node_name, port):
-        out = CommandTemplateExecutor(
-            self._cli_service,
-            command_template.PORT_STATUS_SHOW,
-            remove_prompt=True
-        ).execute_command(node_name=node_name, port=port)
-        node_key = "node"
-        port_key = "port"
-        status_key = "status"
+            out_table = ActionsHelper.parse_table_by_keys(
+                out, node_key, port_key, vlan_id_key
+            )
+            index = PortVlanIndex(
+                {record[port_key]: parse_vlan_ids(record[vlan_id_key])
+                 for record in out_table}
+            )
+            self._port_vlan_indexes[node] = index
+        return index
 
-        out_table = ActionsHelper.parse_table_by_keys(
-            out, node_key, port_key, status_key
-        )
-        if out_table:
-            status_data = out_table[0].get(status_key)
-            if status_data:
-                for status in status_data.split(","):
-                    if status.strip().lower() in FORBIDDEN_PORT_STATUS_TABLE:
-                        raise CommandExecutionException(
-                            "Port {} is not allowed to use for VLE,"
-                            "it has status {}".format((node_name, port), status))
-
-    def _remove_from_vlan(self, node_name, vlan_id, port):
-        out = CommandTemplateExecutor(
-            self._cli_service,
-            command_template.REMOVE_FROM_VLAN,
-            remove_prompt=True
-        ).execute_command(node_name=node_name, vlan_id=vlan_id, port=port)
-        if "removed" not in out.lower():
+    def _validate_port(self, node_name, port):
+        statuses = self._port_status_table(node_name).get(str(port), frozenset())
+        forbidden_statuses = statuses & FORBIDDEN_PORT_STATUS_TABLE
+        if forbidden_statuses:
             raise CommandExecutionException(
-                "Cannot remove port {} from VlanId {} on node {}".format(
-                    port,
-                    vlan_id,
-                    node_name
-                )
+                "Port {} is not allowed to use for VLE,"
+                "it has status {}".format((node_name, port),
+                                          ",".join(sorted(forbidden_statuses))))
+
+    def _port_status_table(self, node):
+        """ Port to statuses table of the node, loaded on first use. """
+        table = self._port_status_tables.get(node)
+        if table is None:
+            out = ReadCommandExecutor(
+                self._cli_service,
+                command_template.PORTS_STATUS_SHOW,
+                remove_prompt=True
+            ).execute_command(node_name=node)
+            node_key = "node"
+            port_key = "port"
+            status_key = "status"
+
+            out_table = ActionsHelper.parse_table_by_keys(
+                out, node_key, port_key, status_key
             )
+            table = {
+                record[port_key]: frozenset(
+                    status.strip().lower() for status in record[status_key].split(",")
+                ) for record in out_table
+            }
+            self._port_status_tables[node] = table
+        return table
 
     def _remove_port_from_vlans(self, node, port):
         vlan_members = self.vlan_ids_for_port(node, port)
         if vlan_members is not None:
-            for vlan_id in vlan_members:
-                self._remove_from_vlan(node, vlan_id, port)
+            out = WriteCommandExecutor(
+                self._cli_service,
+                command_template.REMOVE_FROM_VLANS,
+                remove_prompt=True
+            ).execute_command(node_name=node, port=port,
+                              vlan_ids=",".join(map(str, vlan_members)))
+            self._port_vlan_index(node).set_vlan_ids(port, [])
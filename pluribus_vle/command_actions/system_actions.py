@@ -1,9 +1,9 @@
 import re
 
 import pluribus_vle.command_templates.system as command_template
-from cloudshell.cli.command_template.command_template_executor import \
-    CommandTemplateExecutor
-from pluribus_vle.command_actions.actions_helper import ActionsHelper
+from pluribus_vle.command_actions.actions_helper import ActionsHelper, \
+    ReadCommandExecutor, WriteCommandExecutor
+from pluribus_vle.helpers.port_state import device_port_state, normalize_port_state
 
 
 class SystemActions(object):
@@ -32,7 +32,7 @@ class SystemActions(object):
 
     def _build_phys_to_logical_table(self):
         logical_to_phys_dict = {}
-        output = CommandTemplateExecutor(
+        output = ReadCommandExecutor(
             self._cli_service,
             command_template.PHYS_TO_LOGICAL
         ).execute_command()
@@ -47,6 +47,14 @@ class SystemActions(object):
             self.__phys_to_logical_table = self._build_phys_to_logical_table()
         return self.__phys_to_logical_table
 
+    def phys_to_logical_table(self, node_name):
+        """ Get physical port name to logical port id table of the node. """
+        output = ReadCommandExecutor(
+            self._cli_service,
+            command_template.PHYS_TO_LOGICAL_FOR_NODE
+        ).execute_command(node_name=node_name)
+        return dict(re.findall(r"^([\d\.]+):(\d+)$", output, flags=re.MULTILINE))
+
     def _get_logical(self, phys_name):
         logical_id = self._phys_to_logical_table.get(phys_name)
         if logical_id:
@@ -56,14 +64,14 @@ class SystemActions(object):
                             "Cannot convert physical port name to logical")
 
     def get_state_id(self):
-        state_id = CommandTemplateExecutor(
+        state_id = ReadCommandExecutor(
             self._cli_service,
             command_template.GET_STATE_ID
         ).execute_command()
         return re.split(r"\s", state_id.strip())[1]
 
     def set_state_id(self, state_id):
-        out = CommandTemplateExecutor(
+        out = WriteCommandExecutor(
             self._cli_service,
             command_template.SET_STATE_ID
         ).execute_command(state_id=state_id)
@@ -71,23 +79,24 @@ class SystemActions(object):
 
     def set_auto_negotiation(self, phys_port, node_name, value):
         logical_port_id = self._get_logical(phys_port)
-        if value.lower() == "true":
-            out = CommandTemplateExecutor(
-                self._cli_service,
-                command_template.SET_AUTO_NEG_ON
-            ).execute_command(node_name=node_name, port_id=logical_port_id)
+        self.set_ports_auto_negotiation([logical_port_id], node_name,
+                                        value.lower() == "true")
+
+    def set_ports_auto_negotiation(self, ports, node_name, is_autoneg):
+        """ Set auto-negotiation of list of logical ports with one command. """
+        if is_autoneg:
+            template = command_template.SET_AUTO_NEG_ON
         else:
-            out = CommandTemplateExecutor(
-                self._cli_service,
-                command_template.SET_AUTO_NEG_OFF
-            ).execute_command(node_name=node_name, port_id=logical_port_id)
+            template = command_template.SET_AUTO_NEG_OFF
+        WriteCommandExecutor(
+            self._cli_service,
+            template
+        ).execute_command(node_name=node_name, port_id=",".join(map(str, ports)))
 
     def set_port_state(self, port, node_name, port_state):
-        port_state = port_state.lower()
-        if port_state not in ["enable", "disable"]:
-            port_state = "enable"
+        port_state = normalize_port_state(port_state)
 
-        CommandTemplateExecutor(
+        WriteCommandExecutor(
             self._cli_service,
             command_template.SET_PORT_STATE
         ).execute_command(
@@ -96,13 +105,41 @@ class SystemActions(object):
             port_state=port_state
         )
 
+    def set_ports_state(self, ports, node_name, port_state):
+        """ Enable/Disable list of ports on the node with one command. """
+        self.set_port_state(",".join(map(str, ports)), node_name, port_state)
+
+    def ports_state_table(self, node_name):
+        """ Port to current state table of the node, from port configs. """
+        out = ReadCommandExecutor(
+            self._cli_service,
+            command_template.PORTS_STATE_SHOW,
+            remove_prompt=True
+        ).execute_command(node_name=node_name)
+        table = {}
+        for record in ActionsHelper.parse_table_by_keys(out, "port", "enable"):
+            port_state = device_port_state(record["enable"])
+            if port_state is not None:
+                table[record["port"]] = port_state
+        return table
+
     def get_fabric_info(self):
-        out = CommandTemplateExecutor(self._cli_service, command_template.FABRIC_INFO,
-                                      remove_prompt=True).execute_command()
+        out = ReadCommandExecutor(self._cli_service, command_template.FABRIC_INFO,
+                                  remove_prompt=True).execute_command()
         return ActionsHelper.parse_table(out)
 
+    def fabric_transactions(self, fabric_name):
+        """ Get last fabric transaction id of every node. """
+        out = ReadCommandExecutor(
+            self._cli_service,
+            command_template.FABRIC_TRANSACTIONS,
+            remove_prompt=True
+        ).execute_command(fabric_name=fabric_name)
+        return {record["name"]: record["fab_tid"] for record in
+                ActionsHelper.parse_table_by_keys(out, "name", "fab_tid")}
+
     def tunnels_table(self):
-        out = CommandTemplateExecutor(
+        out = ReadCommandExecutor(
             self._cli_service,
             command_template.TUNNEL_INFO,
             remove_prompt=True
@@ -133,8 +170,28 @@ class SystemActions(object):
                 tunnels_table[local_switch_name, remote_switch_name] = tunnel_name
         return tunnels_table
 
-    def get_available_vlan_id(self, min_vlan, max_vlan):
-        out = CommandTemplateExecutor(
+    def busy_vlan_ids(self):
+        return [vlan_id for vlans in self.vlans_table().values() for vlan_id in vlans]
+
+    def vlans_table(self):
+        vlans_table = {}
+        for data in self._vlan_records():
+            vxlan_id = data.get("vxlan", "")
+            vlans_table.setdefault(data.get("switch_name"), {})[int(data["vlan_id"])] = \
+                int(vxlan_id) if vxlan_id.isdigit() else 0
+        return vlans_table
+
+    def vlan_ids_by_description(self, description):
+        """ Get ids of the VLANs with the description on every node. """
+        vlan_ids = {}
+        for data in self._vlan_records():
+            if data.get("description") == description:
+                vlan_ids.setdefault(data.get("switch_name"), set()).add(
+                    int(data["vlan_id"]))
+        return vlan_ids
+
+    def _vlan_records(self):
+        out = ReadCommandExecutor(
             self._cli_service,
             command_template.VLAN_SHOW,
             remove_prompt=True
@@ -144,16 +201,10 @@ class SystemActions(object):
         vlan_id_key = "vlan_id"
         vxlan_key = "vxlan"
         description_key = "description"
-        out_list = ActionsHelper.parse_table_by_keys(
+        return ActionsHelper.parse_table_by_keys(
             out,
             switch_name_key,
             vlan_id_key,
             vxlan_key,
             description_key
         )
-
-        busy_vlans = [int(data[vlan_id_key]) for data in out_list]
-        avail_vlan_id = list(set(range(min_vlan, max_vlan + 1)) - set(busy_vlans))[0]
-        if avail_vlan_id:
-            return avail_vlan_id
-        raise Exception(self.__class__.__name__, "Cannot determine available vlan id")
@@ -9,6 +9,7 @@ SWITCH_INFO = CommandTemplate('switch "{switch_name}" switch-info-show format mo
 SWITCH_SETUP = CommandTemplate('switch-setup-show format switch-name', ACTION_MAP, ERROR_MAP)
 SOFTWARE_VERSION = CommandTemplate('software-show', ACTION_MAP, ERROR_MAP)
 PORT_SHOW = CommandTemplate('switch "{switch_name}" port-config-show format port,speed,autoneg parsable-delim ":"', ACTION_MAP, ERROR_MAP)
+PORT_SHOW_FOR_PORT = CommandTemplate('switch "{switch_name}" port-config-show port {port_id} format port,speed,autoneg parsable-delim ":"', ACTION_MAP, ERROR_MAP)
 PHYS_PORT_SHOW = CommandTemplate('switch "{switch_name}" bezel-portmap-show format port,bezel-intf parsable-delim ":"', ACTION_MAP, ERROR_MAP)
 ASSOCIATIONS = CommandTemplate('port-association-show format master-ports,slave-ports,bidir, parsable-delim ":"',
                                ACTION_MAP, ERROR_MAP)
@@ -11,10 +11,16 @@ ERROR_MAP = OrderedDict([(r'[Ee]rror:', 'Command error'), (r'[Cc]onflict', 'Port
 CREATE_VLAN = CommandTemplate(
     'switch {node_name} vlan-create id {vlan_id} scope local vxlan-mode transparent vxlan {vxlan_id} ports {port}',
     ACTION_MAP, ERROR_MAP)
+CREATE_EMPTY_VLAN = CommandTemplate(
+    'switch {node_name} vlan-create id {vlan_id} scope local vxlan-mode transparent vxlan {vxlan_id} description {description}',
+    ACTION_MAP, ERROR_MAP)
 ADD_TO_VLAN = CommandTemplate('switch {node_name} vlan-port-add vlan-id {vlan_id} ports {port}', ACTION_MAP, ERROR_MAP)
-REMOVE_FROM_VLAN = CommandTemplate('switch {node_name} vlan-port-remove vlan-id {vlan_id} ports {port}', ACTION_MAP, ERROR_MAP)
+REMOVE_FROM_VLANS = CommandTemplate('switch {node_name} port-vlan-remove port {port} vlans {vlan_ids}', ACTION_MAP,
+                                    ERROR_MAP)
 ADD_VXLAN_TO_TUNNEL = CommandTemplate('switch {node_name} tunnel-vxlan-add name {tunnel_name} vxlan {vxlan_id}',
                                       ACTION_MAP, ERROR_MAP)
+REMOVE_VXLAN_FROM_TUNNEL = CommandTemplate(
+    'switch {node_name} tunnel-vxlan-remove name {tunnel_name} vxlan {vxlan_id}', ACTION_MAP, ERROR_MAP)
 VLE_CREATE = CommandTemplate(
     'vle-create name {vle_name} node-1 {node_1} node-1-port {node_1_port} node-2 {node_2} node-2-port {node_2_port} tracking',
     ACTION_MAP, ERROR_MAP)
@@ -25,9 +31,8 @@ DELETE_VLAN = CommandTemplate('switch {node} vlan-delete id {vlan_id}', ACTION_M
 VLE_SHOW = CommandTemplate('vle-show format name,node-1,node-2,node-1-port,node-2-port, parsable-delim ":"', ACTION_MAP,
                            ERROR_MAP)
 
-PORT_VLAN_INFO = CommandTemplate(
-    'switch {node} port-vlan-show ports {port} format switch,port,vlans parsable-delim ":"',
-    ACTION_MAP, ERROR_MAP)
+PORTS_VLAN_INFO = CommandTemplate('switch {node} port-vlan-show format switch,port,vlans parsable-delim ":"', ACTION_MAP,
+                                  ERROR_MAP)
 
 VLE_SHOW_FOR_NAME = CommandTemplate(
     'vle-show name {vle_name} format name,node-1,node-2,node-1-port,node-2-port,status, parsable-delim ":"', ACTION_MAP,
@@ -38,6 +43,5 @@ VXLAN_SHOW = CommandTemplate('switch {node_name} tunnel-vxlan-show vxlan {vxlan_
 
 VLAN_SHOW = CommandTemplate('switch {node_name} vlan-show id {vlan_id} format id,switch,vxlan parsable-delim ":"',
                             ACTION_MAP, ERROR_MAP)
-PORT_STATUS_SHOW = CommandTemplate(
-    'switch {node_name} port-show port {port} hide-connections format switch,port,status, parsable-delim ":"', ACTION_MAP,
-    ERROR_MAP)
+PORTS_STATUS_SHOW = CommandTemplate(
+    'switch {node_name} port-show hide-connections format switch,port,status, parsable-delim ":"', ACTION_MAP, ERROR_MAP)
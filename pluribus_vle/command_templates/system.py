@@ -10,9 +10,15 @@ SET_STATE_ID = CommandTemplate('switch-setup-modify motd {state_id}', ACTION_MAP
 SET_AUTO_NEG_ON = CommandTemplate('switch {node_name} port-config-modify port {port_id} autoneg', ACTION_MAP, ERROR_MAP)
 SET_AUTO_NEG_OFF = CommandTemplate('switch {node_name} port-config-modify port {port_id} no-autoneg', ACTION_MAP, ERROR_MAP)
 SET_PORT_STATE = CommandTemplate('switch {node_name} port-config-modify port {port_id} {port_state}', ACTION_MAP, ERROR_MAP)
+PORTS_STATE_SHOW = CommandTemplate('switch {node_name} port-config-show format port,enable parsable-delim ":"',
+                                   ACTION_MAP, ERROR_MAP)
 PHYS_TO_LOGICAL = CommandTemplate('bezel-portmap-show format bezel-intf,port parsable-delim ":"', ACTION_MAP,
                                   ERROR_MAP)
+PHYS_TO_LOGICAL_FOR_NODE = CommandTemplate(
+    'switch {node_name} bezel-portmap-show format bezel-intf,port parsable-delim ":"', ACTION_MAP, ERROR_MAP)
 FABRIC_INFO = CommandTemplate('fabric-info parsable-delim ":"', ACTION_MAP, ERROR_MAP)
 TUNNEL_INFO = CommandTemplate(
     'tunnel-show auto-tunnel static format switch,name,local-ip,remote-ip, parsable-delim ":"', ACTION_MAP, ERROR_MAP)
 VLAN_SHOW = CommandTemplate('vlan-show format switch,id,vxlan,description, parsable-delim ":"', ACTION_MAP, ERROR_MAP)
+FABRIC_TRANSACTIONS = CommandTemplate('fabric-node-show fab-name "{fabric_name}" format name,fab-tid parsable-delim ":"',
+                                      ACTION_MAP, ERROR_MAP)
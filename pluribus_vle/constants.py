@@ -1,11 +1,11 @@
 PORTS = "ports"
 BIDIR = "bidir"
 MONITOR_PORTS = "monitor_ports"
-FORBIDDEN_PORT_STATUS_TABLE = [
+FORBIDDEN_PORT_STATUS_TABLE = frozenset([
     "pn-fabric",
     "pn-cluster",
     "pn-internal",
     "vle",
     "vxlan-loopback",
     "disabled"
-]
+])
@@ -1,6 +1,12 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 import logging
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import partial
 
 from cloudshell.layer_one.core.driver_commands_interface import DriverCommandsInterface
 from cloudshell.layer_one.core.layer_one_driver_exception import LayerOneDriverException
@@ -12,6 +18,26 @@ from pluribus_vle.cli.vw_cli_handler import VWCliHandler
 from pluribus_vle.command_actions.autoload_actions import AutoloadActions
 from pluribus_vle.command_actions.mapping_actions import MappingActions
 from pluribus_vle.command_actions.system_actions import SystemActions
+from pluribus_vle.helpers import deadline
+from pluribus_vle.helpers.attribute_snapshot import AttributeSnapshot
+from pluribus_vle.helpers.autoload_cache import AutoloadCache
+from pluribus_vle.helpers.change_probe import ChangeProbe
+from pluribus_vle.helpers.concurrency import Slots
+from pluribus_vle.helpers.deadline import with_deadline
+from pluribus_vle.helpers.ledger import MappingLedger
+from pluribus_vle.helpers.limiter import AdaptiveLimiter, RequestLimiter
+from pluribus_vle.helpers.locks import LockManager
+from pluribus_vle.helpers.pairing_store import PairingException, PairingStore
+from pluribus_vle.helpers.port_state import PortStateBatch, normalize_port_state
+from pluribus_vle.helpers.reconciler import Reconciler
+from pluribus_vle.helpers.request_stats import RequestStats
+from pluribus_vle.helpers.scheduler import CommandScheduler, scheduled
+from pluribus_vle.helpers.staging import StagingArea
+from pluribus_vle.helpers.switch_resolver import SwitchResolver
+from pluribus_vle.helpers.tunnel_index import TunnelIndex
+from pluribus_vle.helpers.vlan_allocator import VlanAllocator
+from pluribus_vle.helpers.warm_pool import WarmPool
+from pluribus_vle.helpers.work_queue import WorkQueue
 
 from pluribus_vle.rest.api_handler import PluribusRESTAPI
 from pluribus_vle.rest.actions.autoload_actions import RestAutoloadActions
@@ -21,6 +47,8 @@ from pluribus_vle.rest.actions.system_actions import RestSystemActions
 
 class DriverCommands(DriverCommandsInterface):
     """ Driver commands implementation. """
+    # Attributes served by GetAttributeValue from the autoload or the device
+    DEVICE_ATTRIBUTES = ("Port Speed", "Auto Negotiation", "Model Name")
 
     def __init__(self, logger, runtime_config):
         """
@@ -32,41 +60,159 @@ class DriverCommands(DriverCommandsInterface):
         self._vlan_max = runtime_config.read_key("DRIVER.VLAN_MAX", 4000)
         self._vle_prefix = runtime_config.read_key("DRIVER.VLE_PREFIX", "QSVLE-")
         self._map_on_set_vlan = runtime_config.read_key("DRIVER.MAP_ON_SET_VLAN", False)
+        self._speculative_staging = runtime_config.read_key(
+            "DRIVER.SPECULATIVE_STAGING", False)
+        self._concurrent_mapping = runtime_config.read_key("DRIVER.CONCURRENT_MAPPING",
+                                                           False)
+        self._deferred_teardown = runtime_config.read_key(
+            "DRIVER.DEFERRED_TEARDOWN.ENABLE", False)
+        # Seconds each command may take, by command name
+        self._deadlines = runtime_config.read_key("DRIVER.DEADLINES", {})
 
         self._rest_api_enabled = runtime_config.read_key("API.REST.ENABLE", True)
         if self._rest_api_enabled:
             self._rest_scheme = runtime_config.read_key("API.REST.TYPE", "http")
             self._rest_port = int(runtime_config.read_key("API.REST.PORT", 80))
+            # Protects the switch vRest service, shared by all the REST connections
+            self._rest_limiter = RequestLimiter(
+                AdaptiveLimiter(
+                    initial_limit=runtime_config.read_key(
+                        "API.REST.LIMITER.INITIAL_CONCURRENCY", 4),
+                    min_limit=runtime_config.read_key(
+                        "API.REST.LIMITER.MIN_CONCURRENCY", 1),
+                    max_limit=runtime_config.read_key(
+                        "API.REST.LIMITER.MAX_CONCURRENCY", 16),
+                    latency_tolerance=runtime_config.read_key(
+                        "API.REST.LIMITER.LATENCY_TOLERANCE", 2.0)
+                ),
+                node_rate=runtime_config.read_key("API.REST.LIMITER.NODE_RATE", 0),
+                node_burst=runtime_config.read_key("API.REST.LIMITER.NODE_BURST", 5)
+            )
+            self._rest_session_auth = runtime_config.read_key("API.REST.SESSION_AUTH",
+                                                              False)
+            self._rest_session_cookie = runtime_config.read_key(
+                "API.REST.SESSION_COOKIE", "JSESSIONID")
+            self._rest_stats = RequestStats()
+            self._switch_refresh_interval = runtime_config.read_key(
+                "DRIVER.SWITCH_RESOLVER.REFRESH_INTERVAL", 30)
+            self._switch_strict = runtime_config.read_key(
+                "DRIVER.SWITCH_RESOLVER.STRICT", False)
         self._rest_api = None
+        # Separate connection used to provision the destination node concurrently
+        self._dst_rest_api = None
         self._switch_mapping = None
 
-        self._cli_handler = VWCliHandler(self._logger)
+        # A mapping command holds up to two sessions if mapping is concurrent.
+        # The mapping commands using sessions at once are limited to the pool
+        # size, so the second session of a command is never taken by another
+        # one waiting for its own second session.
+        cli_sessions = int(runtime_config.read_key("API.CLI.SESSION_POOL_SIZE", 1))
+        self._cli_handler = VWCliHandler(
+            self._logger,
+            max_pool_size=cli_sessions * (2 if self._concurrent_mapping else 1)
+        )
+        self._cli_mapping_slots = Slots(cli_sessions)
 
         self._fabric_name = None
         self._fabric_id = None
         self._fabric_nodes = None
-        self._tunnels_table = {}
+        # Tunnels added after login are found by reloading the table on miss
+        self._tunnel_index = TunnelIndex(
+            self._load_tunnels_table,
+            refresh_interval=runtime_config.read_key("DRIVER.TUNNELS.REFRESH_INTERVAL",
+                                                     30)
+        )
+        self._tunnel_monitor_interval = runtime_config.read_key(
+            "DRIVER.TUNNELS.MONITOR_INTERVAL", 0)
+        self._tunnel_monitor_started = False
+        # Fabric transaction ids tell when cached fabric state is stale
+        self._state_probe_enabled = runtime_config.read_key("DRIVER.STATE_PROBE.ENABLE",
+                                                            False)
+        self._state_probe = ChangeProbe(
+            self._read_fabric_state,
+            min_interval=runtime_config.read_key("DRIVER.STATE_PROBE.MIN_INTERVAL", 5)
+        )
+        self._state_probe.subscribe(self._invalidate_caches)
+        # State id set by CloudShell and the fabric state id it was set for
+        self._synced_state = None
+        # Physical port name to logical port id tables by node, read on first
+        # use and dropped when the fabric is changed by someone else
+        self._phys_to_logical = {}
+        # Attributes of the autoloaded resources, served by GetAttributeValue
+        self._attribute_snapshot = AttributeSnapshot()
+        self._attribute_max_age = runtime_config.read_key(
+            "DRIVER.ATTRIBUTE_SNAPSHOT.PORT_MAX_AGE", 0)
+        self._autoload_cache = None
+        if runtime_config.read_key("DRIVER.AUTOLOAD_CACHE.ENABLE", False):
+            self._autoload_cache = AutoloadCache()
 
         self.__mapping_actions = None
         self.__system_actions = None
+        self._state_lock = threading.Lock()
+
+        self._scheduler = CommandScheduler(
+            high_concurrency=runtime_config.read_key("DRIVER.SCHEDULER.HIGH_CONCURRENCY",
+                                                     8),
+            low_concurrency=runtime_config.read_key("DRIVER.SCHEDULER.LOW_CONCURRENCY",
+                                                    1)
+        )
+
+        # Serialise commands touching the same fabric nodes
+        self._locks = LockManager()
+        self._vlan_allocator = VlanAllocator(self._vlan_min, self._vlan_max)
 
-        # Used to store map requests
-        self._map_requests = {}
-        # Used to store vlanId"s attached to port
-        self._vlan_table = {}
+        # Used to pair map requests with vlanId"s attached to ports
+        pairing_ttl = runtime_config.read_key("DRIVER.PAIRING.TTL", 3600)
+        self._pairing_store = PairingStore(
+            ttl=pairing_ttl,
+            max_size=runtime_config.read_key("DRIVER.PAIRING.MAX_SIZE", 1000)
+        )
+        # Mappings provisioned while waiting for the partner port vlanId
+        self._staging_area = StagingArea(ttl=pairing_ttl)
+        # VLANs of cleared connections deleted in background
+        self._teardown_queue = WorkQueue(
+            self._logger,
+            retries=runtime_config.read_key("DRIVER.DEFERRED_TEARDOWN.RETRIES", 3),
+            retry_delay=runtime_config.read_key("DRIVER.DEFERRED_TEARDOWN.RETRY_DELAY",
+                                                5)
+        )
+        # VLAN ids attached to the tunnels ahead of multi-node mappings
+        self._warm_pool = WarmPool(runtime_config.read_key("DRIVER.WARM_POOL.SIZE", 0))
+        # Marks warm VLANs on the fabric, adopted once by a new driver process
+        self._warm_vlan_description = self._vle_prefix + "WARM"
+        self._warm_vlans_adopted = False
+        # Mappings made by the driver, to clear them without reading the device
+        self._ledger = None
+        if runtime_config.read_key("DRIVER.LEDGER.ENABLE", False):
+            self._ledger = MappingLedger(
+                path=runtime_config.read_key("DRIVER.LEDGER.PATH", None),
+                compact_threshold=runtime_config.read_key(
+                    "DRIVER.LEDGER.COMPACT_THRESHOLD", 1000)
+            )
+        # Cleanup of driver VLEs and VLANs left by failed mappings
+        self._reconciler = Reconciler(self._vle_prefix, self._vlan_min, self._vlan_max)
+        self._reconcile_interval = runtime_config.read_key("DRIVER.RECONCILER.INTERVAL",
+                                                           0)
+        self._reconcile_max_deletions = runtime_config.read_key(
+            "DRIVER.RECONCILER.MAX_DELETIONS", 10)
+        self._reconciler_started = False
 
     @property
     def _mapping_actions(self):
-        if not self.__mapping_actions:
-            self.__mapping_actions = MappingActions(None, self._logger)
-        return self.__mapping_actions
+        with self._state_lock:
+            if not self.__mapping_actions:
+                self.__mapping_actions = MappingActions(None, self._logger)
+            return self.__mapping_actions
 
     @property
     def _system_actions(self):
-        if not self.__system_actions:
-            self.__system_actions = SystemActions(None, self._logger)
-        return self.__system_actions
+        with self._state_lock:
+            if not self.__system_actions:
+                self.__system_actions = SystemActions(None, self._logger)
+            return self.__system_actions
 
+    @with_deadline("LOGIN")
+    @scheduled(CommandScheduler.HIGH)
     def login(self, address, username, password):
         """ Perform login operation on the device.
 
@@ -87,13 +233,20 @@ class DriverCommands(DriverCommandsInterface):
         """
         # REST Implementation
         if self._rest_api_enabled:
+            self._logger.debug("REST requests: {}".format(self._rest_stats.report))
             self._rest_api = PluribusRESTAPI(
                 address=address,
                 username=username,
                 password=password,
                 scheme=self._rest_scheme,
                 port=self._rest_port,
+                limiter=self._rest_limiter,
+                session_auth=self._rest_session_auth,
+                session_cookie=self._rest_session_cookie,
+                stats=self._rest_stats
             )
+            if self._concurrent_mapping:
+                self._dst_rest_api = self._rest_api.new_connection()
 
             system_actions = RestSystemActions(api=self._rest_api, logger=self._logger)
             fabric_info = system_actions.get_fabric_info()
@@ -103,8 +256,16 @@ class DriverCommands(DriverCommandsInterface):
             if not self._fabric_name:
                 raise LayerOneDriverException("Fabric is not defined")
             self._logger.info("Fabric name: " + self._fabric_name)
-            self._tunnels_table = system_actions.tunnels_table()
-            self._switch_mapping = system_actions.get_switch_mapping()
+            self._tunnel_index.update(system_actions.tunnels_table())
+            if self._switch_mapping:
+                self._logger.debug(
+                    "Switch resolver: {}".format(self._switch_mapping.metrics))
+            self._switch_mapping = SwitchResolver(
+                system_actions.get_switch_mapping,
+                refresh_interval=self._switch_refresh_interval,
+                strict=self._switch_strict
+            )
+            self._start_background_tasks()
             return
 
         # CLI Implementation
@@ -117,14 +278,19 @@ class DriverCommands(DriverCommandsInterface):
             if not self._fabric_name:
                 raise LayerOneDriverException("Fabric is not defined")
             self._logger.info("Fabric name: " + self._fabric_name)
-            self._tunnels_table = system_actions.tunnels_table()
-            self.__mapping_actions = None
-            self.__system_actions = None
-
+            self._tunnel_index.update(system_actions.tunnels_table())
+            with self._state_lock:
+                self.__mapping_actions = None
+                self.__system_actions = None
+        self._start_background_tasks()
+
+    @with_deadline("GET_RESOURCE_DESCRIPTION")
+    @scheduled(CommandScheduler.LOW)
     def get_resource_description(self, address):
         """ Auto-load function to retrieve all information from the device.
 
-        :param address: resource address, "192.168.42.240"
+        :param address: resource address, "192.168.42.240", or
+            "192.168.42.240/leaf1" to describe the leaf1 node only
         :type address: str
         :return: resource description
         :rtype: cloudshell.layer_one.core.response.response_info.ResourceDescriptionResponseInfo
@@ -156,31 +322,70 @@ class DriverCommands(DriverCommandsInterface):
         """
         self._logger.info("GetResourceDescription for: {}".format(address))
 
+        # "<fabric address>/<node>" describes the node only
+        address, _, node = address.partition("/")
+        node_names = [node] if node else None
+        autoload_cache = None if node else self._autoload_cache
+
+        state = None
+        if autoload_cache:
+            if self._state_probe_enabled:
+                # A stale state id would serve the structure of the old state
+                state = self._state_probe.check(force=True)
+            structure = autoload_cache.lookup(address, state)
+            if structure:
+                self._logger.debug("Autoload cache: {}".format(autoload_cache.metrics))
+                return ResourceDescriptionResponseInfo(structure)
+
         # REST Implementation
         if self._rest_api_enabled and self._rest_api:
             autoload_actions = RestAutoloadActions(
                 api=self._rest_api,
                 switch_mapping=self._switch_mapping,
                 logger=self._logger)
-            nodes_table = autoload_actions.fabric_nodes_table(self._fabric_name)
-            ports_table = {node: autoload_actions.ports_table(node) for node in
-                           nodes_table}
+        # CLI Implementation
+        else:
+            autoload_actions = AutoloadActions(None, self._logger)
+
+        with self._session(autoload_actions):
+            nodes_table = autoload_actions.fabric_nodes_table(self._fabric_name,
+                                                              node_names)
+        ports_table = {}
+        for node_name in nodes_table:
+            # Let mapping commands go first, the CLI session is released for
+            # them in between
+            self._scheduler.checkpoint()
+            with self._session(autoload_actions):
+                ports_table[node_name] = autoload_actions.ports_table(node_name)
+        self._scheduler.checkpoint()
+        with self._session(autoload_actions):
             associations_table = autoload_actions.associations_table()
 
-        else:
-            # CLI Implementation
-            with self._cli_handler.default_mode_service() as session:
-                autoload_actions = AutoloadActions(session, self._logger)
-                nodes_table = autoload_actions.fabric_nodes_table(self._fabric_name)
-                ports_table = {node: autoload_actions.ports_table(node) for node in
-                               nodes_table}
-                associations_table = autoload_actions.associations_table()
-
-        autoload_helper = Autoload(address, self._fabric_name, self._fabric_id,
-                                   nodes_table, ports_table,
-                                   associations_table,
-                                   self._logger)
-        return ResourceDescriptionResponseInfo(autoload_helper.build_structure())
+        if node:
+            if node not in nodes_table:
+                raise LayerOneDriverException(
+                    "Node {0} is not found in fabric {1}".format(node, self._fabric_name))
+            # Mappings to ports of other nodes are not part of the node description
+            associations_table = {
+                port: peer_port for port, peer_port in associations_table.items()
+                if port[0] == node and peer_port[0] == node}
+
+        self._attribute_snapshot.update(address, self._fabric_name, self._fabric_id,
+                                        nodes_table, ports_table)
+
+        def build():
+            return Autoload(address, self._fabric_name, self._fabric_id,
+                            nodes_table, ports_table,
+                            associations_table,
+                            self._logger)
+
+        if not autoload_cache:
+            return ResourceDescriptionResponseInfo(build().build_structure())
+
+        structure = autoload_cache.structure(address, nodes_table, ports_table,
+                                             associations_table, build, state)
+        self._logger.debug("Autoload cache: {}".format(autoload_cache.metrics))
+        return ResourceDescriptionResponseInfo(structure)
 
     def map_uni(self, src_port, dst_ports):
         """ Unidirectional mapping of two ports.
@@ -199,6 +404,8 @@ class DriverCommands(DriverCommandsInterface):
         """
         raise LayerOneDriverException("This driver does not support MapUni command")
 
+    @with_deadline("MAP_BIDI")
+    @scheduled(CommandScheduler.HIGH)
     def map_bidi(self, src_port, dst_port, vlan_id=None):
         """ Create a bidirectional connection between source and destination ports.
 
@@ -219,91 +426,586 @@ class DriverCommands(DriverCommandsInterface):
         """
         if self._map_on_set_vlan is True:
             if vlan_id is None:
-                self._map_requests[src_port] = dst_port
-                self._map_requests[dst_port] = src_port
+                self._pairing_store.add_map_request(src_port, dst_port)
+                self._logger.debug(
+                    "Pairing store: {}".format(self._pairing_store.metrics))
                 return
 
         self._logger.info(
             "MapBidi, SrcPort: {0}, DstPort: {1}".format(src_port, dst_port))
+        self._map_ports(src_port, dst_port, vlan_id)
+
+    def _map_ports(self, src_port, dst_port, vlan_id, stage=None, staging=False):
+        """ Map ports, or the part of the mapping defined by the stage.
 
+        If staging, only the part of the mapping on the stage node is executed
+        and the VLAN id stays reserved for the rest of it.
+        """
         src_node, src_port = self._convert_port_address(src_port)
         dst_node, dst_port = self._convert_port_address(dst_port)
 
-        # REST Implementation
-        if self._rest_api_enabled and self._rest_api:
-            system_actions = RestSystemActions(api=self._rest_api, logger=self._logger)
-            mapping_actions = RestMappingActions(
-                api=self._rest_api,
-                switch_mapping=self._switch_mapping,
-                logger=self._logger)
-
-            if vlan_id is None:
-                vlan_id = system_actions.get_available_vlan_id(self._vlan_min,
-                                                               self._vlan_max)
-            else:
-                vlan_id = system_actions.get_available_vlan_id(int(vlan_id),
-                                                               int(vlan_id))
+        warm = False
+        if vlan_id is None and stage is None and src_node != dst_node:
+            vlan_id = self._warm_pool.take(src_node, dst_node)
+            warm = vlan_id is not None
+
+        try:
+            with self._locks.acquire(LockManager.node(src_node),
+                                     LockManager.node(dst_node)):
+                # REST Implementation
+                if self._rest_api_enabled and self._rest_api:
+                    vlan_id = self._rest_map_bidi(src_node, src_port, dst_node,
+                                                  dst_port, vlan_id, stage, staging,
+                                                  warm)
+                # CLI Implementation
+                else:
+                    with self._cli_mapping_slots.slot():
+                        vlan_id = self._cli_map_bidi(src_node, src_port, dst_node,
+                                                     dst_port, vlan_id, stage,
+                                                     staging, warm)
+            if self._ledger and not staging:
+                tunnels = None
+                if src_node != dst_node:
+                    tunnels = self._tunnels(src_node, dst_node)
+                self._ledger.add(self._vle_prefix + str(vlan_id), vlan_id,
+                                 (src_node, src_port), (dst_node, dst_port), tunnels)
+            self._rebase_state()
+        finally:
+            if warm:
+                self._in_background(self._replenish_warm_pool,
+                                    [WarmPool.pair(src_node, dst_node)])
+
+    def _rest_map_bidi(self, src_node, src_port, dst_node, dst_port, vlan_id,
+                       stage=None, staging=False, warm=False):
+        system_actions = RestSystemActions(api=self._rest_api, logger=self._logger)
+        mapping_actions = RestMappingActions(
+            api=self._rest_api,
+            switch_mapping=self._switch_mapping,
+            logger=self._logger)
+
+        vlan_id = self._reserve_vlan_id(system_actions, vlan_id, stage, staging, warm)
+        succeeded = False
+        try:
             vle_name = self._vle_prefix + str(vlan_id)
+            plan_options = self._plan_options(stage, staging)
 
-            system_actions.set_port_state(
-                src_port,
-                self._switch_mapping.get(src_node, "fabric"),
-                "enable"
-            )
-            system_actions.set_port_state(
-                dst_port,
-                self._switch_mapping.get(dst_node, "fabric"),
-                "enable"
-            )
+            port_states = PortStateBatch()
+            port_states.add(src_node, src_port, "enable")
+            if not staging:
+                port_states.add(dst_node, dst_port, "enable")
+            port_states.apply(self._rest_ports_state_setter(system_actions),
+                              self._ports_state_table(system_actions))
 
             if src_node == dst_node:
                 mapping_actions.map_bidi_single_node(src_node, src_port, dst_port,
-                                                     vlan_id, vle_name)
+                                                     vlan_id, vle_name, **plan_options)
+            elif warm:
+                mapping_actions.map_bidi_warm_multi_node(src_node, dst_node,
+                                                         src_port, dst_port,
+                                                         vlan_id, vle_name)
             else:
-                src_tunnel = self._tunnels_table.get((src_node, dst_node))
-                dst_tunnel = self._tunnels_table.get((dst_node, src_node))
-                if src_tunnel and dst_tunnel:
+                src_tunnel, dst_tunnel = self._tunnels(src_node, dst_node)
+                mapping_actions.map_bidi_multi_node(src_node, dst_node,
+                                                    src_port, dst_port,
+                                                    src_tunnel, dst_tunnel,
+                                                    vlan_id, vle_name,
+                                                    dst_api=self._dst_rest_api,
+                                                    **plan_options)
+            succeeded = True
+            return vlan_id
+        finally:
+            if not staging:
+                if not succeeded:
+                    self._disable_failed_ports(
+                        self._rest_ports_state_setter(system_actions),
+                        src_node, src_port, dst_node, dst_port)
+                    if warm:
+                        self._delete_failed_warm_vlan(mapping_actions, src_node,
+                                                      dst_node, vlan_id)
+                self._vlan_allocator.release(vlan_id)
+
+    def _cli_map_bidi(self, src_node, src_port, dst_node, dst_port, vlan_id,
+                      stage=None, staging=False, warm=False):
+        with self._cli_handler.default_mode_service() as session:
+            system_actions = SystemActions(session, self._logger)
+            mapping_actions = MappingActions(session, self._logger)
+
+            vlan_id = self._reserve_vlan_id(system_actions, vlan_id, stage, staging,
+                                             warm)
+            succeeded = False
+            try:
+                vle_name = self._vle_prefix + str(vlan_id)
+                plan_options = self._plan_options(stage, staging)
+
+                port_states = PortStateBatch()
+                port_states.add(src_node, src_port, "enable")
+                if not staging:
+                    port_states.add(dst_node, dst_port, "enable")
+                port_states.apply(system_actions.set_ports_state,
+                                  system_actions.ports_state_table)
+
+                if src_node == dst_node:
+                    mapping_actions.map_bidi_single_node(src_node, src_port, dst_port,
+                                                         vlan_id, vle_name,
+                                                         **plan_options)
+                elif warm:
+                    mapping_actions.map_bidi_warm_multi_node(src_node, dst_node,
+                                                             src_port, dst_port,
+                                                             vlan_id, vle_name)
+                elif self._concurrent_mapping and not staging:
+                    src_tunnel, dst_tunnel = self._tunnels(src_node, dst_node,
+                                                           system_actions)
+                    with self._cli_handler.default_mode_service() as dst_session:
+                        mapping_actions.map_bidi_multi_node(
+                            src_node, dst_node,
+                            src_port, dst_port,
+                            src_tunnel, dst_tunnel,
+                            vlan_id, vle_name,
+                            dst_cli_service=dst_session,
+                            **plan_options
+                        )
+                else:
+                    src_tunnel, dst_tunnel = self._tunnels(src_node, dst_node,
+                                                           system_actions)
                     mapping_actions.map_bidi_multi_node(src_node, dst_node,
                                                         src_port, dst_port,
                                                         src_tunnel, dst_tunnel,
-                                                        vlan_id, vle_name)
-                else:
-                    raise LayerOneDriverException(
-                        "Cannot find the appropriate tunnel"
-                    )
+                                                        vlan_id, vle_name,
+                                                        **plan_options)
+                succeeded = True
+                return vlan_id
+            finally:
+                if not staging:
+                    if not succeeded:
+                        self._disable_failed_ports(system_actions.set_ports_state,
+                                                   src_node, src_port,
+                                                   dst_node, dst_port)
+                        if warm:
+                            self._delete_failed_warm_vlan(mapping_actions, src_node,
+                                                          dst_node, vlan_id)
+                    self._vlan_allocator.release(vlan_id)
+
+    def _disable_failed_ports(self, set_ports_state, src_node, src_port, dst_node,
+                              dst_port):
+        """ Disable ports of the mapping rolled back. """
+        port_states = PortStateBatch()
+        port_states.add(src_node, src_port, "disable")
+        port_states.add(dst_node, dst_port, "disable")
+        try:
+            with deadline.suspended():
+                port_states.apply(set_ports_state)
+        except Exception:
+            self._logger.exception("Failed to disable ports of the failed mapping")
+
+    def _delete_failed_warm_vlan(self, mapping_actions, src_node, dst_node, vlan_id):
+        """ Delete warm VLAN of the failed mapping, its id is released after it. """
+        for node in (src_node, dst_node):
+            try:
+                with deadline.suspended():
+                    mapping_actions.release_vlan(node, vlan_id)
+            except Exception:
+                self._logger.exception(
+                    "Failed to delete warm vlan {0} on {1}".format(vlan_id, node))
+
+    def _reserve_vlan_id(self, system_actions, vlan_id, stage, staging, warm):
+        """ Reserve VLAN id for the mapping.
+
+        Stages and the warm pool keep the reservations of their ids.
+        """
+        if warm:
+            return vlan_id
+        if stage is not None and stage.reserved:
+            return stage.vlan_id
+        vlan_id = self._vlan_allocator.reserve(system_actions.busy_vlan_ids(), vlan_id)
+        if staging:
+            stage.reserved = True
+        return vlan_id
+
+    @staticmethod
+    def _plan_options(stage, staging):
+        """ Mapping plan filtering for the stage. """
+        if stage is None:
+            return {}
+        if staging:
+            return {"plan_filter": stage.staging_plan, "completed": stage.completed,
+                    "compensate": False}
+        # Staged operations are rolled back as well if the mapping fails
+        return {"plan_filter": stage.remaining_plan, "completed": stage.completed}
+
+    def _stage(self, port, vlan_id):
+        """ Start provisioning the port side of the mapping in background. """
+        peer_port = self._pairing_store.peer(port)
+        if peer_port is None:
+            return
+        node, node_port = self._convert_port_address(port)
+        stage, replaced = self._staging_area.create(port, peer_port, vlan_id, node,
+                                                    node_port)
+        if replaced:
+            self._in_background(self._discard_stage, replaced)
+        self._logger.debug("Stage mapping {0}-{1}, VlanID: {2}".format(
+            port, peer_port, vlan_id))
+        self._in_background(self._run_stage, stage)
+
+    @with_deadline("SET_ATTRIBUTE_VALUE")
+    def _run_stage(self, stage):
+        """ Provision the stage, under a deadline of its own so it always ends.
+
+        Speculative work, it yields to the commands waiting for the fabric.
+        """
+        try:
+            with self._scheduler.slot(CommandScheduler.LOW):
+                self._map_ports(stage.port, stage.peer_port, stage.vlan_id,
+                                stage=stage, staging=True)
+        except Exception as e:
+            self._logger.warning(
+                "Staging of {0} failed, it will be mapped on pairing: {1}".format(
+                    stage.port, e))
+            stage.finish(e)
+        else:
+            stage.finish()
+
+    def _wait_stage(self, stage):
+        """ Wait for the staging to finish within the command deadline.
+
+        :raises LayerOneDriverException: if it did not finish in time
+        """
+        try:
+            finished = stage.wait(deadline.bounded_timeout(None))
+        except deadline.DeadlineExceeded:
+            finished = False
+        if not finished:
+            raise LayerOneDriverException(
+                "Staging of {} did not finish within the command deadline".format(
+                    stage.port))
+
+    def _discard_stage(self, stage):
+        """ Remove the stage provisioning, its partner port never came.
+
+        Runs in background, waiting for the staging which ends by its deadline.
+        """
+        stage.wait()
+        self._logger.info("Discard stage of {0}, VlanID: {1}".format(
+            stage.port, stage.vlan_id))
+        try:
+            if stage.completed:
+                with self._locks.acquire(LockManager.node(stage.node)):
+                    if self._rest_api_enabled and self._rest_api:
+                        RestMappingActions(
+                            api=self._rest_api,
+                            switch_mapping=self._switch_mapping,
+                            logger=self._logger
+                        ).release_vlan(stage.node, stage.vlan_id)
+                    else:
+                        with self._cli_handler.default_mode_service() as session:
+                            MappingActions(session, self._logger).release_vlan(
+                                stage.node, stage.vlan_id)
+                self._rebase_state()
+        except Exception:
+            self._logger.exception("Failed to discard stage of {}".format(stage.port))
+        finally:
+            if stage.reserved:
+                self._vlan_allocator.release(stage.vlan_id)
+
+    def _start_background_tasks(self):
+        self._start_warm_pool()
+        with self._state_lock:
+            if self._reconcile_interval > 0 and not self._reconciler_started:
+                self._reconciler_started = True
+                self._in_background(self._reconcile_periodically)
+            if self._tunnel_monitor_interval > 0 and not self._tunnel_monitor_started:
+                self._tunnel_monitor_started = True
+                self._in_background(self._monitor_tunnels)
+
+    def _start_warm_pool(self):
+        """ Keep warm VLAN ids for the node pairs connected by tunnels. """
+        if not self._warm_pool.enabled:
+            return
+        dropped = self._warm_pool.set_pairs(self._tunnel_index.pairs())
+        with self._state_lock:
+            adopt = not self._warm_vlans_adopted
+            self._warm_vlans_adopted = True
+        self._in_background(self._replenish_warm_pool, None, adopt, dropped)
+
+    def _replenish_warm_pool(self, pairs=None, adopt=False, dropped=()):
+        """ Fill the warm pool, yielding to mapping commands.
+
+        The dropped warm VLANs, of node pairs not connected anymore, are deleted
+        first. If adopt, the warm VLANs already on the fabric are pooled then.
+        """
+        changed = adopt or bool(dropped)
+        with self._scheduler.slot(CommandScheduler.LOW):
+            if dropped:
+                self._logger.info("Deleting warm vlans of dropped node pairs {}".format(
+                    dropped))
+                self._delete_warm_vlans(dropped)
+            if adopt:
+                try:
+                    self._adopt_warm_vlans()
+                except Exception:
+                    self._logger.exception("Failed to adopt warm vlans")
+            for node_1, node_2 in pairs or self._warm_pool.pairs:
+                try:
+                    with self._locks.acquire(("warm_pool", node_1, node_2)):
+                        for _ in range(self._warm_pool.missing(node_1, node_2)):
+                            self._scheduler.checkpoint()
+                            changed = True
+                            self._warm_up(node_1, node_2)
+                except Exception:
+                    self._logger.exception(
+                        "Failed to warm up vlan on {0} <-> {1}".format(node_1, node_2))
+        if changed:
+            self._rebase_state()
+
+    def _adopt_warm_vlans(self):
+        """ Pool warm VLANs left on the fabric, e.g. by a previous driver process.
+
+        Warm VLANs used by driver VLEs are mappings and stay as they are,
+        the ones which are not pooled are deleted.
+        """
+        system_actions, mapping_actions = self._new_actions()
+        with self._session(system_actions):
+            warm_vlans = system_actions.vlan_ids_by_description(
+                self._warm_vlan_description)
+        # Held before reading the VLEs, ids of mappings in progress are not held
+        held = set(vlan_id for vlan_id in set(vlan_id for vlan_ids in warm_vlans.values()
+                                              for vlan_id in vlan_ids)
+                   if self._vlan_allocator.hold(vlan_id))
+        with self._session(mapping_actions):
+            vle_names = set(vle_name for _, vle_name
+                            in mapping_actions.connection_table().values())
+        for vlan_id in list(held):
+            if self._vle_prefix + str(vlan_id) in vle_names:
+                held.discard(vlan_id)
+                self._vlan_allocator.release(vlan_id)
+        leftovers = self._warm_pool.adopt(
+            dict((node, vlan_ids & held) for node, vlan_ids in warm_vlans.items()))
+        self._logger.info("Adopted warm vlans, deleting {} left".format(leftovers))
+        self._delete_warm_vlans(leftovers)
+
+    def _delete_warm_vlans(self, warm_vlans):
+        """ Delete warm VLANs which are not pooled, releasing their ids after it.
+
+        Ids of VLANs failed to be deleted stay reserved, they are still on the
+        fabric; the next process adopts or deletes them.
+        :param warm_vlans: (node, VLAN id) of the warm VLANs
+        """
+        _, mapping_actions = self._new_actions()
+        failed = set()
+        for node, vlan_id in warm_vlans:
+            self._scheduler.checkpoint()
+            try:
+                with self._locks.acquire(LockManager.node(node)):
+                    with self._session(mapping_actions):
+                        mapping_actions.release_vlan(node, vlan_id)
+            except Exception:
+                failed.add(vlan_id)
+                self._logger.exception(
+                    "Failed to delete warm vlan {0} on {1}".format(vlan_id, node))
+        # Ids adopted for some pair stay reserved by the pool
+        for vlan_id in set(vlan_id for _, vlan_id in warm_vlans) - failed:
+            if not self._warm_pool.contains(vlan_id):
+                self._vlan_allocator.release(vlan_id)
+
+    def _warm_up(self, node_1, node_2):
+        tunnel_1, tunnel_2 = self._tunnels(node_1, node_2)
+        with self._locks.acquire(LockManager.node(node_1), LockManager.node(node_2)):
+            if self._rest_api_enabled and self._rest_api:
+                self._warm_up_vlan(
+                    RestSystemActions(api=self._rest_api, logger=self._logger),
+                    RestMappingActions(api=self._rest_api,
+                                       switch_mapping=self._switch_mapping,
+                                       logger=self._logger),
+                    node_1, node_2, tunnel_1, tunnel_2)
+            else:
+                with self._cli_handler.default_mode_service() as session:
+                    self._warm_up_vlan(SystemActions(session, self._logger),
+                                       MappingActions(session, self._logger),
+                                       node_1, node_2, tunnel_1, tunnel_2)
+
+    def _warm_up_vlan(self, system_actions, mapping_actions, node_1, node_2, tunnel_1,
+                      tunnel_2):
+        vlan_id = self._vlan_allocator.reserve(system_actions.busy_vlan_ids())
+        try:
+            mapping_actions.warm_up(node_1, node_2, tunnel_1, tunnel_2, vlan_id,
+                                    self._warm_vlan_description)
+        except Exception:
+            for node in (node_1, node_2):
+                try:
+                    mapping_actions.release_vlan(node, vlan_id)
+                except Exception:
+                    self._logger.exception(
+                        "Failed to delete vlan {0} on {1}".format(vlan_id, node))
+            self._vlan_allocator.release(vlan_id)
+            raise
+        self._logger.debug("Warm vlan {0} on {1} <-> {2}".format(vlan_id, node_1,
+                                                                 node_2))
+        self._warm_pool.put(node_1, node_2, vlan_id)
+
+    def _reconcile_periodically(self):
+        while True:
+            time.sleep(self._reconcile_interval)
+            try:
+                self._reconcile()
+            except Exception:
+                self._logger.exception("Reconciliation failed")
+
+    def _reconcile(self):
+        """ Delete orphaned driver VLEs and VLANs, yielding to mapping commands. """
+        with self._scheduler.slot(CommandScheduler.LOW):
+            if self._reconcile_orphans():
+                self._rebase_state()
+        self._logger.info("Reconciliation report: {}".format(self._reconciler.report))
+
+    def _reconcile_orphans(self):
+        """ Delete orphans one by one, each in a session taken inside its node locks.
+
+        No session is held at checkpoints or while waiting for the locks,
+        commands take the locks before their sessions.
+        :return: True if there were orphans to delete
+        """
+        system_actions, mapping_actions = self._new_actions()
+        # Taken before the fabric state, ids reserved later are in the next scan
+        reserved = self._vlan_allocator.reserved
+        with self._session(system_actions, mapping_actions):
+            vles = {vle_name: (node, peer_node) for (node, _), ((peer_node, _), vle_name)
+                    in mapping_actions.connection_table().items()}
+            vlans_table = system_actions.vlans_table()
+        orphans = self._reconciler.scan(vles, vlans_table, reserved)
+
+        for orphan in orphans[:self._reconcile_max_deletions]:
+            self._scheduler.checkpoint()
+            kind, name, target = orphan
+            nodes = target if kind == Reconciler.VLE else [name]
+            self._logger.info("Reclaim orphaned {0} {1} {2}".format(kind, name, target))
+            try:
+                with self._locks.acquire(*[LockManager.node(node) for node in nodes]):
+                    with self._session(mapping_actions):
+                        if kind == Reconciler.VLE:
+                            mapping_actions.delete_vle(name)
+                        else:
+                            mapping_actions.release_vlan(name, target)
+            except Exception as e:
+                self._logger.exception("Failed to reclaim {}".format(orphan))
+                self._reconciler.reclaimed(orphan, e)
+            else:
+                self._reconciler.reclaimed(orphan)
+        return bool(orphans)
+
+    def _new_actions(self):
+        """ System and mapping actions, CLI ones are bound to sessions by _session. """
+        if self._rest_api_enabled and self._rest_api:
+            return (RestSystemActions(api=self._rest_api, logger=self._logger),
+                    RestMappingActions(api=self._rest_api,
+                                       switch_mapping=self._switch_mapping,
+                                       logger=self._logger))
+        return SystemActions(None, self._logger), MappingActions(None, self._logger)
+
+    @contextmanager
+    def _session(self, *actions):
+        """ Bind CLI actions to a pooled session for the duration of the context.
+
+        Lets commands hold a session only for the steps using it, e.g. not
+        while they wait for node locks. REST actions are used as they are.
+        """
+        if self._rest_api_enabled and self._rest_api:
+            yield
+            return
+        with self._cli_handler.default_mode_service() as session:
+            for action in actions:
+                action.cli_service = session
+            try:
+                yield
+            finally:
+                for action in actions:
+                    action.cli_service = None
+
+    @staticmethod
+    def _in_background(target, *args):
+        thread = threading.Thread(target=target, args=args)
+        thread.daemon = True
+        thread.start()
+
+    def _monitor_tunnels(self):
+        while True:
+            time.sleep(self._tunnel_monitor_interval)
+            self._refresh_tunnels()
+
+    def _refresh_tunnels(self):
+        try:
+            with self._scheduler.slot(CommandScheduler.LOW):
+                changed = self._tunnel_index.refresh()
+            if changed:
+                self._logger.info(
+                    "Tunnels changed: {}".format(self._tunnel_index.metrics))
+                self._start_warm_pool()
+        except Exception:
+            self._logger.exception("Tunnels refresh failed")
+
+    def _read_fabric_state(self):
+        """ Fabric state id, a checksum of the nodes last transaction ids. """
+        if self._rest_api_enabled and self._rest_api:
+            transactions = RestSystemActions(
+                api=self._rest_api,
+                logger=self._logger).fabric_transactions(self._fabric_name)
         else:
-            # CLI Implementation
             with self._cli_handler.default_mode_service() as session:
-                system_actions = SystemActions(session, self._logger)
-                mapping_actions = MappingActions(session, self._logger)
+                transactions = SystemActions(
+                    session, self._logger).fabric_transactions(self._fabric_name)
+        state = ";".join("{0}={1}".format(node, transaction_id) for node, transaction_id
+                         in sorted(transactions.items()))
+        return "{:08x}".format(zlib.crc32(state.encode("utf-8")) & 0xffffffff)
+
+    def _invalidate_caches(self):
+        """ Forget cached fabric state, the fabric was changed by someone else.
+
+        Ledger entries are verified against the device connections again, the
+        physical port maps and the tunnels table are reloaded. VLAN tables are
+        read per command.
+        """
+        if self._ledger:
+            self._ledger.invalidate()
+        with self._state_lock:
+            self._phys_to_logical.clear()
+        self._in_background(self._refresh_tunnels)
+        self._logger.debug("Fabric state changed, caches invalidated")
 
-                if vlan_id is None:
-                    vlan_id = system_actions.get_available_vlan_id(self._vlan_min,
-                                                                   self._vlan_max)
-                else:
-                    vlan_id = system_actions.get_available_vlan_id(int(vlan_id),
-                                                                   int(vlan_id))
-                vle_name = self._vle_prefix + str(vlan_id)
+    def _rebase_state(self):
+        """ Keep CloudShell in sync across the fabric changes made by the driver.
 
-                system_actions.set_port_state(src_port, src_node, "enable")
-                system_actions.set_port_state(dst_port, dst_node, "enable")
+        Called after the driver writes, without holding a CLI session.
+        """
+        if not self._state_probe_enabled or not self._fabric_name:
+            return
+        try:
+            previous, state = self._state_probe.rebase()
+        except Exception:
+            self._logger.exception("Failed to read fabric state")
+            return
+        with self._state_lock:
+            if self._synced_state and self._synced_state[1] == previous:
+                self._synced_state = (self._synced_state[0], state)
 
-                if src_node == dst_node:
-                    mapping_actions.map_bidi_single_node(src_node, src_port, dst_port,
-                                                         vlan_id, vle_name)
-                else:
-                    src_tunnel = self._tunnels_table.get((src_node, dst_node))
-                    dst_tunnel = self._tunnels_table.get((dst_node, src_node))
-                    if src_tunnel and dst_tunnel:
-                        mapping_actions.map_bidi_multi_node(src_node, dst_node,
-                                                            src_port, dst_port,
-                                                            src_tunnel, dst_tunnel,
-                                                            vlan_id, vle_name)
-                    else:
-                        raise LayerOneDriverException(
-                            "Cannot find the appropriate tunnel"
-                        )
+    def _load_tunnels_table(self):
+        if self._rest_api_enabled and self._rest_api:
+            return RestSystemActions(api=self._rest_api,
+                                     logger=self._logger).tunnels_table()
+        with self._cli_handler.default_mode_service() as session:
+            return SystemActions(session, self._logger).tunnels_table()
 
+    def _tunnels(self, src_node, dst_node, system_actions=None):
+        """ Tunnels connecting two nodes, in both directions.
+
+        The tunnels table is reloaded on miss, through system_actions if
+        passed, e.g. by a caller holding the CLI session.
+        """
+        load = system_actions.tunnels_table if system_actions else None
+        tunnels = self._tunnel_index.lookup(src_node, dst_node, load)
+        if tunnels:
+            return tunnels
+        raise LayerOneDriverException("Cannot find the appropriate tunnel")
+
+    @with_deadline("MAP_CLEAR")
+    @scheduled(CommandScheduler.HIGH)
     def map_clear(self, ports):
         """ Remove simplex/multi-cast/duplex connection ending on the destination port.
 
@@ -325,81 +1027,132 @@ class DriverCommands(DriverCommandsInterface):
         """
         self._logger.info("MapClear, Ports: {}".format(",".join(ports)))
         exception_messages = []
-
-        # REST Implementation
-        if self._rest_api_enabled and self._rest_api:
-            system_actions = RestSystemActions(api=self._rest_api, logger=self._logger)
-            mapping_actions = RestMappingActions(
-                api=self._rest_api,
-                switch_mapping=self._switch_mapping,
-                logger=self._logger)
-            for port in ports:
-                src_node, src_port = self._convert_port_address(port)
-                connection_table = mapping_actions.connection_table()
-                dst_record = connection_table.get((src_node, src_port))
-                if not dst_record:
-                    continue
-                (dst_node, dst_port), vle_name = dst_record
-                try:
-                    vlan_ids = mapping_actions.vlan_ids_for_port(src_node, src_port)
-                    vlan_id = self._valid_vlan_id(vlan_ids)
-                    if src_node == dst_node:
-                        mapping_actions.delete_single_node_vle(src_node, vle_name,
-                                                               vlan_id)
-                    else:
-                        mapping_actions.delete_multi_node_vle(src_node, dst_node,
-                                                              vle_name, vlan_id)
-
-                    system_actions.set_port_state(
-                        src_port,
-                        self._switch_mapping.get(src_node, "fabric"),
-                        "disable"
-                    )
-                    system_actions.set_port_state(
-                        dst_port,
-                        self._switch_mapping.get(dst_node, "fabric"),
-                        "disable"
-                    )
-
-                except Exception as e:
-                    if len(e.args) > 1:
-                        exception_messages.append(e.args[1])
-                    elif len(e.args) == 1:
-                        exception_messages.append(e.args[0])
-            if exception_messages:
-                raise LayerOneDriverException(", ".join(exception_messages))
-
-        # CLI Implementation
+        if self._warm_pool.enabled:
+            # Waits at checkpoints for the command to complete
+            self._in_background(self._replenish_warm_pool)
+
+        system_actions, mapping_actions = self._new_actions()
+        with self._session(mapping_actions):
+            targets = self._clear_targets(mapping_actions, ports)
+
+        port_states = PortStateBatch()
+        for src_node, src_port, dst_node, dst_port, vle_name, vlan_id in targets:
+            try:
+                with self._locks.acquire(LockManager.node(src_node),
+                                         LockManager.node(dst_node)):
+                    with self._session(mapping_actions):
+                        if vlan_id is None:
+                            vlan_ids = mapping_actions.vlan_ids_for_port(src_node,
+                                                                         src_port)
+                            vlan_id = self._valid_vlan_id(vlan_ids)
+                        self._delete_connection(mapping_actions, src_node, dst_node,
+                                                vle_name, vlan_id)
+                port_states.add(src_node, src_port, "disable")
+                port_states.add(dst_node, dst_port, "disable")
+            except Exception as e:
+                self._append_exception_message(exception_messages, e)
+        try:
+            with self._session(system_actions):
+                port_states.apply(self._ports_state_setter(system_actions),
+                                  self._ports_state_table(system_actions))
+        except Exception as e:
+            self._append_exception_message(exception_messages, e)
+        if exception_messages:
+            raise LayerOneDriverException(", ".join(exception_messages))
+        self._rebase_state()
+
+    def _clear_targets(self, mapping_actions, ports):
+        """ Connections of the ports to clear, all resolved before any is deleted.
+
+        The device connection table is read at most once. Ports of the same
+        connection, e.g. both its ends, give a single target.
+        :return: node, port, peer node, peer port, VLE name and VLAN id of
+            each connection
+        :rtype: list
+        """
+        loaded = []
+
+        def connection_table():
+            if not loaded:
+                loaded.append(mapping_actions.connection_table())
+            return loaded[0]
+
+        targets = OrderedDict()
+        for port in ports:
+            node, port = self._convert_port_address(port)
+            target = self._clear_target(connection_table, node, port)
+            if target and target[2] not in targets:
+                targets[target[2]] = (node, port) + target
+        return list(targets.values())
+
+    def _clear_target(self, connection_table, node, port):
+        """ Connection of the port to clear.
+
+        Taken from the ledger, entries loaded from the ledger file are
+        verified against the device connection table on first use.
+        :param connection_table: returns the device connection table
+        :return: peer node, peer port, VLE name and VLAN id, None if unknown;
+            None if the port is not connected
+        :rtype: tuple
+        """
+        entry = self._ledger.lookup(node, port) if self._ledger else None
+        if entry is not None and entry.verified:
+            return entry.peer(node, port) + (entry.vle_name, entry.vlan_id)
+
+        dst_record = connection_table().get((node, port))
+        if entry is not None:
+            if dst_record == (entry.peer(node, port), entry.vle_name):
+                entry.verified = True
+                return entry.peer(node, port) + (entry.vle_name, entry.vlan_id)
+            self._ledger.remove(entry.vle_name)
+        if not dst_record:
+            return None
+        (dst_node, dst_port), vle_name = dst_record
+        return dst_node, dst_port, vle_name, None
+
+    def _delete_connection(self, mapping_actions, src_node, dst_node, vle_name,
+                           vlan_id):
+        """ Delete VLE and its VLANs.
+
+        If teardown is deferred, only the VLE is deleted here and the VLANs
+        are deleted by the teardown queue.
+        """
+        if self._deferred_teardown:
+            mapping_actions.delete_vle(vle_name)
+            self._defer_vlans_deletion([src_node, dst_node], vle_name, vlan_id)
+        elif src_node == dst_node:
+            mapping_actions.delete_single_node_vle(src_node, vle_name, vlan_id)
         else:
-            with self._cli_handler.default_mode_service() as session:
-                system_actions = SystemActions(session, self._logger)
-                mapping_actions = MappingActions(session, self._logger)
-                for port in ports:
-                    src_node, src_port = self._convert_port_address(port)
-                    connection_table = mapping_actions.connection_table()
-                    dst_record = connection_table.get((src_node, src_port))
-                    if not dst_record:
-                        continue
-                    (dst_node, dst_port), vle_name = dst_record
-                    try:
-                        vlan_ids = mapping_actions.vlan_ids_for_port(src_node, src_port)
-                        vlan_id = self._valid_vlan_id(vlan_ids)
-                        if src_node == dst_node:
-                            mapping_actions.delete_single_node_vle(src_node, vle_name,
-                                                                   vlan_id)
-                        else:
-                            mapping_actions.delete_multi_node_vle(src_node, dst_node,
-                                                                  vle_name, vlan_id)
-                        system_actions.set_port_state(src_port, src_node, "disable")
-                        system_actions.set_port_state(dst_port, dst_node, "disable")
-                    except Exception as e:
-                        if len(e.args) > 1:
-                            exception_messages.append(e.args[1])
-                        elif len(e.args) == 1:
-                            exception_messages.append(e.args[0])
-                if exception_messages:
-                    raise LayerOneDriverException(", ".join(exception_messages))
+            mapping_actions.delete_multi_node_vle(src_node, dst_node, vle_name, vlan_id)
+        if self._ledger:
+            self._ledger.remove(vle_name)
+
+    def _defer_vlans_deletion(self, nodes, vle_name, vlan_id):
+        """ Queue VLANs deletion, the VLAN id is reserved until it is done. """
+        held = self._vlan_allocator.hold(vlan_id)
+        self._teardown_queue.put(
+            "delete vlan {0} of {1}".format(vlan_id, vle_name),
+            partial(self._delete_vle_vlans, nodes, vle_name, vlan_id),
+            partial(self._vlan_allocator.release, vlan_id) if held else None
+        )
 
+    def _delete_vle_vlans(self, nodes, vle_name, vlan_id):
+        with self._scheduler.slot(CommandScheduler.LOW):
+            with self._locks.acquire(*[LockManager.node(node) for node in nodes]):
+                if self._rest_api_enabled and self._rest_api:
+                    RestMappingActions(
+                        api=self._rest_api,
+                        switch_mapping=self._switch_mapping,
+                        logger=self._logger
+                    ).delete_vle_vlans(nodes, vle_name, vlan_id)
+                else:
+                    with self._cli_handler.default_mode_service() as session:
+                        MappingActions(session, self._logger).delete_vle_vlans(
+                            nodes, vle_name, vlan_id)
+        self._rebase_state()
+
+    @with_deadline("MAP_CLEAR_TO")
+    @scheduled(CommandScheduler.HIGH)
     def map_clear_to(self, src_port, dst_ports):
         """ Remove simplex/multi-cast/duplex connection ending on the destination port.
 
@@ -429,9 +1182,16 @@ class DriverCommands(DriverCommandsInterface):
     def map_tap(self, src_port, dst_ports):
         raise LayerOneDriverException("MapTap is not supported")
 
+    @with_deadline("GET_ATTRIBUTE_VALUE")
+    @scheduled(CommandScheduler.HIGH)
     def get_attribute_value(self, cs_address, attribute_name):
         """ Retrieve attribute value from the device.
 
+        Serial Number needs no device access. Port Speed, Auto Negotiation
+        and Model Name are served from the attributes of the last autoload;
+        port attributes missing from it or older than the configured max age
+        are read from the device for that port only.
+
         :param cs_address: address, "192.168.42.240/1/21"
         :type cs_address: str
         :param attribute_name: attribute name, "Port Speed"
@@ -451,9 +1211,44 @@ class DriverCommands(DriverCommandsInterface):
                 return AttributeValueResponseInfo(self._fabric_id)
             else:
                 return AttributeValueResponseInfo("NA")
-        else:
+        if attribute_name not in self.DEVICE_ATTRIBUTES:
             raise LayerOneDriverException("GetAttributeValue command is not supported")
 
+        is_port = len(cs_address.split("/")) == 3
+        attributes = self._attribute_snapshot.get(
+            cs_address, self._attribute_max_age if is_port else None)
+        if attributes is None and is_port and self._fabric_name:
+            try:
+                attributes = self._read_port_attributes(cs_address)
+            except Exception as e:
+                raise LayerOneDriverException(
+                    "Cannot read {0} of {1}: {2}".format(attribute_name, cs_address, e))
+        value = attributes.get(attribute_name) if attributes else None
+        if value is None:
+            raise LayerOneDriverException(
+                "{0} of {1} is not known, autoload the resource first".format(
+                    attribute_name, cs_address))
+        return AttributeValueResponseInfo(value)
+
+    def _read_port_attributes(self, cs_address):
+        """ Read the port config and record it in the attributes snapshot. """
+        address, node, port = cs_address.split("/")
+        if self._rest_api_enabled and self._rest_api:
+            ports_table = RestAutoloadActions(
+                api=self._rest_api,
+                switch_mapping=self._switch_mapping,
+                logger=self._logger).ports_table(node, port)
+        else:
+            with self._cli_handler.default_mode_service() as session:
+                ports_table = AutoloadActions(session, self._logger).ports_table(node,
+                                                                                 port)
+        for port_id, port_record in ports_table.items():
+            if str(port_id) == port:
+                return self._attribute_snapshot.update_port(address, node, port,
+                                                            port_record)
+
+    @with_deadline("SET_ATTRIBUTE_VALUE")
+    @scheduled(CommandScheduler.HIGH)
     def set_attribute_value(self, cs_address, attribute_name, attribute_value):
         """ Set attribute value to the device.
 
@@ -482,34 +1277,174 @@ class DriverCommands(DriverCommandsInterface):
 
         if attribute_name == "L1 VLAN ID" and self._map_on_set_vlan is True:
             vlan_id = attribute_value
-            src_port = self._vlan_table.get(vlan_id)
-            if src_port is None:
+            try:
+                ports = self._pairing_store.add_vlan(vlan_id, cs_address)
+            except PairingException as e:
+                self._logger.debug(str(e))
+                ports = False
+            self._logger.debug("Pairing store: {}".format(self._pairing_store.metrics))
+            for stage in self._staging_area.pop_expired():
+                self._in_background(self._discard_stage, stage)
+            if ports is None:
                 self._logger.debug(
                     "Add vlan record {0}-{1}".format(vlan_id, cs_address))
-                self._vlan_table[vlan_id] = cs_address
+                if self._speculative_staging:
+                    self._stage(cs_address, vlan_id)
                 return
-
-            dst_port = cs_address
-            req_dst_port = self._map_requests.get(src_port)
-            req_src_port = self._map_requests.get(dst_port)
-            self._logger.debug(
-                "Call mapping VlanID: {0}, SrcPort: {1}, DstPort: {2}".format(vlan_id,
-                                                                              src_port,
-                                                                              dst_port))
-            if all([req_src_port, req_dst_port]) and {req_src_port, req_dst_port} == {
-                src_port, dst_port}:
-                self._map_requests.pop(src_port, None)
-                self._map_requests.pop(dst_port, None)
-                self._vlan_table.pop(vlan_id, None)
-                return self.map_bidi(src_port, dst_port, int(vlan_id))
+            if ports:
+                src_port, dst_port = ports
+                self._logger.debug(
+                    "Call mapping VlanID: {0}, SrcPort: {1}, DstPort: {2}".format(
+                        vlan_id,
+                        src_port,
+                        dst_port))
+                stage = self._staging_area.pop(src_port, dst_port, vlan_id)
+                if stage is None:
+                    return self.map_bidi(src_port, dst_port, int(vlan_id))
+                try:
+                    self._wait_stage(stage)
+                except LayerOneDriverException:
+                    self._in_background(self._discard_stage, stage)
+                    raise
+                self._logger.info(
+                    "MapBidi, SrcPort: {0}, DstPort: {1}, staged: {2}".format(
+                        src_port, dst_port, len(stage.completed)))
+                return self._map_ports(src_port, dst_port, int(vlan_id), stage=stage)
+
+        if attribute_name in ("Auto Negotiation", "Port State") and \
+                len(cs_address.split("/")) == 3:
+            self._set_port_attributes([(cs_address, attribute_name, attribute_value)])
+            return AttributeValueResponseInfo(attribute_value)
 
         raise LayerOneDriverException(
             "SetAttributeValue for address {} is not supported".format(cs_address)
         )
 
+    @with_deadline("SET_ATTRIBUTE_VALUE")
+    @scheduled(CommandScheduler.HIGH)
+    def set_attribute_values(self, changes):
+        """ Set "Auto Negotiation" and "Port State" of many ports at once.
+
+        Not a part of DriverCommandsInterface, no L1 command calls it; it is
+        an entry point for callers of the driver commands in process. CLI
+        changes are applied with one command per node and value, REST ones
+        with one request per port.
+
+        :param changes: (cs_address, attribute_name, attribute_value) tuples,
+            ("192.168.42.240/leaf1/21", "Auto Negotiation", "True")
+        :type changes: list
+        """
+        self._logger.debug("SetAttributeValues, Changes: {}".format(changes))
+        self._set_port_attributes(changes)
+
+    def _set_port_attributes(self, changes):
+        self._validate_port_attributes(changes)
+        nodes = sorted(set(self._convert_port_address(cs_address)[0]
+                           for cs_address, _, _ in changes))
+        with self._locks.acquire(*[LockManager.node(node) for node in nodes]):
+            if self._rest_api_enabled and self._rest_api:
+                system_actions = RestSystemActions(api=self._rest_api,
+                                                   logger=self._logger)
+
+                def set_ports_auto_negotiation(ports, node, is_autoneg):
+                    system_actions.set_ports_auto_negotiation(
+                        ports, self._switch_mapping.hostid(node), is_autoneg)
+
+                self._apply_port_attributes(
+                    system_actions, changes,
+                    self._rest_ports_state_setter(system_actions),
+                    set_ports_auto_negotiation)
+            else:
+                with self._cli_handler.default_mode_service() as session:
+                    system_actions = SystemActions(session, self._logger)
+                    self._apply_port_attributes(
+                        system_actions, changes,
+                        system_actions.set_ports_state,
+                        system_actions.set_ports_auto_negotiation)
+        self._rebase_state()
+
+    @staticmethod
+    def _validate_port_attributes(changes):
+        """ Reject all the changes if any of them is invalid, before applying any.
+
+        :raises LayerOneDriverException: if a change is invalid
+        """
+        for cs_address, attribute_name, attribute_value in changes:
+            if attribute_name == "Port State":
+                try:
+                    normalize_port_state(attribute_value)
+                except ValueError:
+                    valid = False
+                else:
+                    valid = True
+            elif attribute_name == "Auto Negotiation":
+                valid = str(attribute_value).lower() in ("true", "false")
+            else:
+                raise LayerOneDriverException(
+                    "Attribute {0} of {1} is not supported".format(attribute_name,
+                                                                   cs_address))
+            if not valid:
+                raise LayerOneDriverException(
+                    "Invalid {0} value {1} for {2}".format(attribute_name,
+                                                          attribute_value, cs_address))
+
+    def _apply_port_attributes(self, system_actions, changes, set_ports_state,
+                               set_ports_auto_negotiation):
+        """ Apply port attribute changes grouped by node and value. """
+        port_states = PortStateBatch()
+        auto_negotiation = OrderedDict()
+        for cs_address, attribute_name, attribute_value in changes:
+            node, port = self._convert_port_address(cs_address)
+            port = self._logical_port(system_actions, node, port)
+            if attribute_name == "Port State":
+                port_states.add(node, port, attribute_value)
+            else:
+                is_autoneg = str(attribute_value).lower() == "true"
+                auto_negotiation.setdefault((node, is_autoneg), []).append(port)
+
+        port_states.apply(set_ports_state, self._ports_state_table(system_actions))
+        for (node, is_autoneg), ports in auto_negotiation.items():
+            set_ports_auto_negotiation(ports, node, is_autoneg)
+        for cs_address, attribute_name, attribute_value in changes:
+            if attribute_name == "Auto Negotiation":
+                self._attribute_snapshot.set_attribute(
+                    cs_address, attribute_name,
+                    str(str(attribute_value).lower() == "true"))
+
+    def _logical_port(self, system_actions, node, port):
+        """ Logical id of the node port addressed by logical id or physical name.
+
+        Logical ids, the ones autoloaded, take precedence over physical names.
+        Numeric ports of nodes without physical port map are logical ids.
+        """
+        with self._state_lock:
+            phys_to_logical = self._phys_to_logical.get(node)
+        if phys_to_logical is None:
+            if self._rest_api_enabled and self._rest_api:
+                phys_to_logical = system_actions.phys_to_logical_table(
+                    self._switch_mapping.hostid(node))
+            else:
+                phys_to_logical = system_actions.phys_to_logical_table(node)
+            with self._state_lock:
+                self._phys_to_logical[node] = phys_to_logical
+        if port in phys_to_logical.values() or \
+                port.isdigit() and not phys_to_logical:
+            return port
+        logical_port = phys_to_logical.get(port)
+        if not logical_port:
+            raise LayerOneDriverException(
+                "Cannot convert port {0} of {1} to logical".format(port, node))
+        return logical_port
+
+    @with_deadline("GET_STATE_ID")
+    @scheduled(CommandScheduler.HIGH)
     def get_state_id(self):
         """ Check if CS synchronized with the device.
 
+        With the state probe enabled, the state id set by CloudShell is
+        returned while the fabric transaction ids are the same as when it was
+        set, the fabric state id otherwise.
+
         :return: Synchronization ID, GetStateIdResponseInfo(-1) if not used
         :rtype: cloudshell.layer_one.core.response.response_info.GetStateIdResponseInfo
         :raises Exception: if command failed
@@ -521,7 +1456,15 @@ class DriverCommands(DriverCommandsInterface):
                 chassis_name = session.send_command("show chassis name")
                 return chassis_name
         """
-        return GetStateIdResponseInfo(-1)
+        if not self._state_probe_enabled or not self._fabric_name:
+            return GetStateIdResponseInfo(-1)
+
+        state = self._state_probe.check()
+        with self._state_lock:
+            synced = self._synced_state
+        if synced and synced[1] == state:
+            return GetStateIdResponseInfo(synced[0])
+        return GetStateIdResponseInfo(state)
 
     def set_state_id(self, state_id):
         """ Set synchronization state id to the device.
@@ -538,7 +1481,12 @@ class DriverCommands(DriverCommandsInterface):
                 # Execute command
                 session.send_command("set chassis name {}".format(state_id))
         """
-        pass
+        if not self._state_probe_enabled or not self._fabric_name:
+            return
+
+        state = self._state_probe.check()
+        with self._state_lock:
+            self._synced_state = (state_id, state)
 
     def set_speed_manual(self, src_port, dst_port, speed, duplex):
         """
@@ -551,6 +1499,38 @@ class DriverCommands(DriverCommandsInterface):
         """
         raise NotImplementedError
 
+    def _ports_state_setter(self, system_actions):
+        """ set_ports_state of the system actions, for PortStateBatch. """
+        if self._rest_api_enabled and self._rest_api:
+            return self._rest_ports_state_setter(system_actions)
+        return system_actions.set_ports_state
+
+    def _ports_state_table(self, system_actions):
+        """ ports_state_table of the system actions, for PortStateBatch. """
+        if self._rest_api_enabled and self._rest_api:
+            def ports_state_table(node):
+                return system_actions.ports_state_table(
+                    self._switch_mapping.hostid(node))
+            return ports_state_table
+        return system_actions.ports_state_table
+
+    def _rest_ports_state_setter(self, system_actions):
+        """ Adapt REST set_ports_state to node names used by PortStateBatch. """
+        def set_ports_state(ports, node, port_state):
+            system_actions.set_ports_state(
+                ports,
+                self._switch_mapping.hostid(node),
+                port_state
+            )
+        return set_ports_state
+
+    @staticmethod
+    def _append_exception_message(exception_messages, exception):
+        if len(exception.args) > 1:
+            exception_messages.append(exception.args[1])
+        elif len(exception.args) == 1:
+            exception_messages.append(exception.args[0])
+
     def _valid_vlan_id(self, vlan_ids):
         if vlan_ids:
             for vlan_id in vlan_ids:
@@ -0,0 +1,75 @@
+import threading
+import time
+
+
+class AttributeSnapshot(object):
+    """ Attributes of the autoloaded resources by resource address.
+
+    Addresses are "<fabric address>" for the fabric, "<fabric address>/<node>"
+    for nodes and "<fabric address>/<node>/<port>" for ports.
+    """
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._resources = {}
+        self._lock = threading.Lock()
+
+    def update(self, address, fabric_name, fabric_id, nodes_table, ports_table):
+        """ Record the autoload tables, nodes missing from them are kept. """
+        now = self._clock()
+        with self._lock:
+            self._resources[address] = (
+                {"Fabric Name": fabric_name, "Serial Number": fabric_id}, now)
+            for node, node_data in nodes_table.items():
+                node_address = "{0}/{1}".format(address, node)
+                prefix = node_address + "/"
+                for resource_address in [resource_address for resource_address
+                                         in self._resources
+                                         if resource_address.startswith(prefix)]:
+                    del self._resources[resource_address]
+                self._resources[node_address] = (
+                    {"Model Name": node_data.get("model"),
+                     "Serial Number": node_data.get("chassis-serial")}, now)
+                for port, port_record in ports_table.get(node, {}).items():
+                    self._put_port(address, node, port, port_record, now)
+
+    def update_port(self, address, node, port, port_record):
+        """ Record the port attributes read after autoload.
+
+        :return: the port attributes
+        """
+        with self._lock:
+            return self._put_port(address, node, port, port_record, self._clock())
+
+    def set_attribute(self, cs_address, attribute_name, value):
+        """ Record the attribute value set by the driver, if the resource is known. """
+        with self._lock:
+            resource = self._resources.get(cs_address)
+            if resource is not None:
+                resource[0][attribute_name] = value
+
+    def get(self, cs_address, max_age=None):
+        """ Attributes of the resource, None if unknown or older than max_age.
+
+        :rtype: dict
+        """
+        with self._lock:
+            attributes, updated = self._resources.get(cs_address, (None, None))
+        if attributes is not None and max_age and self._clock() - updated > max_age:
+            return None
+        return attributes
+
+    def _put_port(self, address, node, port, port_record, updated):
+        node_attributes, _ = self._resources.get("{0}/{1}".format(address, node),
+                                                 ({}, None))
+        node_model = node_attributes.get("Model Name")
+        attributes = {
+            # Not known until the node is autoloaded
+            "Model Name": "{} Port".format(node_model) if node_model else None,
+            "Serial Number": "NA",
+            "Port Speed": port_record.get("speed"),
+            "Auto Negotiation": str(port_record.get("autoneg") == "on"),
+        }
+        self._resources["{0}/{1}/{2}".format(address, node, port)] = (attributes,
+                                                                        updated)
+        return attributes
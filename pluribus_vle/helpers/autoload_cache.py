@@ -0,0 +1,75 @@
+import json
+import threading
+import zlib
+
+
+def topology_fingerprint(nodes_table, ports_table):
+    """ Checksum of the fabric nodes and their port configs. """
+    topology = json.dumps([nodes_table, ports_table], sort_keys=True)
+    return zlib.crc32(topology.encode("utf-8")) & 0xffffffff
+
+
+class _Entry(object):
+    def __init__(self, address, fingerprint, state, autoload, structure):
+        self.address = address
+        self.fingerprint = fingerprint
+        self.state = state
+        self.autoload = autoload
+        self.structure = structure
+
+
+class AutoloadCache(object):
+    """ Last autoload structure, reused while the fabric topology is the same.
+
+    Mappings created since the structure was built are added to a copy of it,
+    other association changes rebuild it.
+    """
+
+    def __init__(self):
+        self._entry = None
+        self._counters = {"hits": 0, "reuses": 0, "builds": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def metrics(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def lookup(self, address, state):
+        """ Structure built for the fabric state id, None if there is none. """
+        with self._lock:
+            entry = self._entry
+            if entry and state is not None and entry.address == address and \
+                    entry.state == state:
+                self._counters["hits"] += 1
+                return entry.structure
+
+    def structure(self, address, nodes_table, ports_table, associations_table,
+                  build, state=None):
+        """ Cached structure of the fabric tables, built again if needed.
+
+        :param build: callable returning Autoload of the tables
+        :param state: fabric state id the tables were read at
+        :rtype: list
+        """
+        fingerprint = topology_fingerprint(nodes_table, ports_table)
+        with self._lock:
+            entry = self._entry
+            if entry and entry.address == address and \
+                    entry.fingerprint == fingerprint:
+                structure = entry.autoload.patch_mappings(associations_table)
+                if structure is not None:
+                    entry.structure = structure
+                    entry.state = state
+                    self._counters["reuses"] += 1
+                    return structure
+
+            autoload = build()
+            self._entry = _Entry(address, fingerprint, state, autoload,
+                                 autoload.build_structure())
+            self._counters["builds"] += 1
+            return self._entry.structure
+
+    def invalidate(self):
+        with self._lock:
+            self._entry = None
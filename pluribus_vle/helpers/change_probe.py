@@ -0,0 +1,59 @@
+import threading
+import time
+
+
+class ChangeProbe(object):
+    """ Cheap signal of fabric state changes.
+
+    The state is read at most once per min_interval seconds, listeners are
+    called when it differs from the previous read.
+    """
+
+    def __init__(self, read, min_interval=0, clock=time.time):
+        """
+        :param read: callable returning the current fabric state id
+        """
+        self._read = read
+        self._min_interval = min_interval
+        self._clock = clock
+        self._state = None
+        self._checked = None
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener):
+        """ Call the listener without arguments when the state changes. """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def check(self, force=False):
+        """ Current state id, listeners are notified first if it changed.
+
+        :param force: read the state even if it was read less than
+            min_interval seconds ago
+        """
+        with self._lock:
+            now = self._clock()
+            if not force and self._checked is not None and \
+                    now - self._checked < self._min_interval:
+                return self._state
+            state = self._read()
+            changed = self._state is not None and state != self._state
+            self._state = state
+            self._checked = now
+            listeners = list(self._listeners) if changed else []
+        for listener in listeners:
+            listener()
+        return state
+
+    def rebase(self):
+        """ Read the state without notifying the listeners, e.g. after own changes.
+
+        :return: previous and current state ids
+        :rtype: tuple
+        """
+        with self._lock:
+            previous = self._state
+            self._state = self._read()
+            self._checked = self._clock()
+            return previous, self._state
@@ -0,0 +1,59 @@
+import sys
+import threading
+from contextlib import contextmanager
+
+from pluribus_vle.helpers import deadline
+
+
+def run_in_parallel(*tasks):
+    """ Run tasks in separate threads and wait for all of them to complete.
+
+    Tasks run under the deadline of the calling thread.
+    :param tasks: callables without arguments
+    :return: list of task results, in the order of tasks
+    :raises Exception: the first exception raised by any of the tasks
+    """
+    results = [None] * len(tasks)
+    errors = []
+    command_deadline = deadline.current()
+
+    def _run(index, task):
+        try:
+            with deadline.bound(command_deadline):
+                results[index] = task()
+        except Exception:
+            errors.append(sys.exc_info()[1])
+
+    threads = [threading.Thread(target=_run, args=(index, task))
+               for index, task in enumerate(tasks)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return results
+
+
+class Slots(object):
+    """ Counting semaphore, waiting for a free slot within the command deadline. """
+
+    def __init__(self, count):
+        self._free = int(count)
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        """ Hold a slot for the duration of the context. """
+        with self._condition:
+            while not self._free:
+                self._condition.wait(deadline.bounded_timeout(None))
+            self._free -= 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._free += 1
+                self._condition.notify()
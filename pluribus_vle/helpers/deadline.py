@@ -0,0 +1,87 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+_local = threading.local()
+
+
+class DeadlineExceeded(Exception):
+    """ Command did not complete within its deadline. """
+
+
+def current():
+    """ Deadline of the command run by the current thread, None if unlimited. """
+    return getattr(_local, "deadline", None)
+
+
+@contextmanager
+def bound(deadline):
+    """ Run the context under the absolute deadline.
+
+    Used to pass the deadline to the threads the command starts. A nested
+    deadline can only make the current one earlier.
+    """
+    previous = current()
+    if previous is not None and (deadline is None or previous < deadline):
+        deadline = previous
+    _local.deadline = deadline
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+@contextmanager
+def suspended():
+    """ Run the context without deadline, e.g. cleanup of the failed command. """
+    previous = current()
+    _local.deadline = None
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def remaining():
+    """ Seconds left until the deadline, None if unlimited. """
+    deadline = current()
+    if deadline is not None:
+        return deadline - time.time()
+
+
+def check(step):
+    """ Fail if the deadline is exceeded before the step is started. """
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Command deadline exceeded before {}".format(step))
+
+
+def bounded_timeout(timeout):
+    """ Timeout limited by the time left until the deadline.
+
+    :param timeout: timeout in seconds, None if unlimited
+    :raises DeadlineExceeded: if there is no time left
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Command deadline exceeded")
+    return left if timeout is None else min(timeout, left)
+
+
+def with_deadline(command):
+    """ Run DriverCommands method under the deadline configured for the command.
+
+    Deadlines are read from the _deadlines attribute, in seconds by command
+    name, missing or 0 for unlimited.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            timeout = self._deadlines.get(command)
+            with bound(time.time() + timeout if timeout else None):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+
+
+class LedgerEntry(object):
+    """ Mapping created by the driver. """
+
+    def __init__(self, vle_name, vlan_id, ports, tunnels=None, verified=True):
+        """
+        :param vle_name: VLE name
+        :param vlan_id: VLAN id
+        :param ports: both (node, port) endpoints
+        :param tunnels: tunnels of multi-node mapping, from both nodes
+        :param verified: entries loaded from the ledger file are verified
+            against the device on first use
+        """
+        self.vle_name = vle_name
+        self.vlan_id = int(vlan_id)
+        self.ports = tuple(tuple(port) for port in ports)
+        self.tunnels = tuple(tunnels) if tunnels else None
+        self.verified = verified
+
+    def peer(self, node, port):
+        """ The other endpoint of the mapping. """
+        src, dst = self.ports
+        return dst if src == (node, port) else src
+
+    def to_dict(self):
+        return {"vle": self.vle_name, "vlan_id": self.vlan_id,
+                "ports": self.ports, "tunnels": self.tunnels}
+
+
+class MappingLedger(object):
+    """ Mappings by endpoint port, journaled to an append-only file.
+
+    The file is replayed on start and rewritten with the live entries only
+    once compact_threshold records more than them are appended.
+    """
+
+    def __init__(self, path=None, compact_threshold=1000):
+        self._path = path
+        self._compact_threshold = int(compact_threshold)
+        self._entries = {}
+        self._vles = {}
+        self._journal_size = 0
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    def lookup(self, node, port):
+        """ Mapping of the port, None if the port is not mapped by the driver.
+
+        :rtype: LedgerEntry
+        """
+        with self._lock:
+            return self._entries.get((node, port))
+
+    def add(self, vle_name, vlan_id, src, dst, tunnels=None):
+        """ Record the mapping of src and dst (node, port) endpoints. """
+        entry = LedgerEntry(vle_name, vlan_id, (src, dst), tunnels)
+        with self._lock:
+            self._put(entry)
+            self._append(dict(entry.to_dict(), op="map"))
+
+    def remove(self, vle_name):
+        """ Forget the mapping of the VLE. """
+        with self._lock:
+            if self._drop(self._vles.get(vle_name)):
+                self._append({"op": "clear", "vle": vle_name})
+
+    def invalidate(self):
+        """ Verify all the entries against the device again on first use. """
+        with self._lock:
+            for entry in self._vles.values():
+                entry.verified = False
+
+    def _put(self, entry):
+        self._drop(self._vles.get(entry.vle_name))
+        for port in entry.ports:
+            self._drop(self._entries.get(port))
+        for port in entry.ports:
+            self._entries[port] = entry
+        self._vles[entry.vle_name] = entry
+
+    def _drop(self, entry):
+        if entry is None:
+            return False
+        for port in entry.ports:
+            self._entries.pop(port, None)
+        del self._vles[entry.vle_name]
+        return True
+
+    def _load(self):
+        with open(self._path) as ledger_file:
+            for line in ledger_file:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                self._journal_size += 1
+                if record["op"] == "map":
+                    self._put(LedgerEntry(record["vle"], record["vlan_id"],
+                                          record["ports"], record.get("tunnels"),
+                                          verified=False))
+                else:
+                    self._drop(self._vles.get(record["vle"]))
+
+    def _append(self, record):
+        if not self._path:
+            return
+        with open(self._path, "a") as ledger_file:
+            ledger_file.write(json.dumps(record) + "\n")
+        self._journal_size += 1
+        if self._journal_size - len(self._vles) > self._compact_threshold:
+            self._compact()
+
+    def _compact(self):
+        entries = list(self._vles.values())
+        temp_path = self._path + ".tmp"
+        with open(temp_path, "w") as ledger_file:
+            for entry in entries:
+                ledger_file.write(json.dumps(dict(entry.to_dict(), op="map")) + "\n")
+        if os.path.exists(self._path):
+            # os.rename does not replace existing files on Windows
+            os.remove(self._path)
+        os.rename(temp_path, self._path)
+        self._journal_size = len(entries)
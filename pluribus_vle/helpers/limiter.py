@@ -0,0 +1,119 @@
+import threading
+import time
+
+from pluribus_vle.helpers import deadline
+
+
+class AdaptiveLimiter(object):
+    """ AIMD limit of concurrent requests to a device.
+
+    The limit grows by one per limit requests completed with stable latency
+    and is halved when the device is overloaded: a request timed out or
+    failed with 5xx.
+    """
+
+    def __init__(self, initial_limit, min_limit, max_limit, latency_tolerance=2.0,
+                 clock=time.time):
+        """
+        :param latency_tolerance: latency above baseline latency multiplied by
+            it stops the limit growth
+        """
+        self._min_limit = float(min_limit)
+        self._max_limit = float(max_limit)
+        self._limit = min(max(float(initial_limit), self._min_limit), self._max_limit)
+        self._latency_tolerance = latency_tolerance
+        self._clock = clock
+        self._baseline = None
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+        with self._condition:
+            return int(self._limit)
+
+    def acquire(self):
+        """ Wait for a free request slot.
+
+        :return: request start time, to be passed to release
+        """
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait(deadline.bounded_timeout(None))
+            self._in_flight += 1
+        return self._clock()
+
+    def release(self, started, overloaded=False):
+        """ Free the request slot and adapt the limit to the request outcome. """
+        latency = self._clock() - started
+        with self._condition:
+            self._in_flight -= 1
+            if overloaded:
+                self._limit = max(self._limit / 2, self._min_limit)
+            else:
+                if self._baseline is None or latency < self._baseline:
+                    self._baseline = latency
+                else:
+                    # Follow slowly, so a burst of slow requests stands out
+                    self._baseline += (latency - self._baseline) * 0.05
+                if latency <= self._baseline * self._latency_tolerance:
+                    self._limit = min(self._limit + 1 / self._limit, self._max_limit)
+            self._condition.notify_all()
+
+
+class TokenBucket(object):
+    """ Rate limit, rate requests per second with bursts up to burst. """
+
+    def __init__(self, rate, burst, clock=time.time, sleep=time.sleep):
+        self._rate = float(rate)
+        self._burst = float(burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self._burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """ Take a token, waiting for it if the bucket is empty. """
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self._tokens + (now - self._updated) * self._rate,
+                                   self._burst)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            self._sleep(deadline.bounded_timeout(wait))
+
+
+class RequestLimiter(object):
+    """ Adaptive concurrency limit of a device with per node rate limits. """
+
+    def __init__(self, concurrency, node_rate=0, node_burst=1):
+        """
+        :type concurrency: AdaptiveLimiter
+        :param node_rate: requests per second to a single node, 0 for no limit
+        """
+        self._concurrency = concurrency
+        self._node_rate = node_rate
+        self._node_burst = node_burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, node=None):
+        if node and self._node_rate:
+            self._bucket(node).take()
+        return self._concurrency.acquire()
+
+    def release(self, started, overloaded=False):
+        self._concurrency.release(started, overloaded)
+
+    def _bucket(self, node):
+        with self._lock:
+            bucket = self._buckets.get(node)
+            if bucket is None:
+                bucket = self._buckets[node] = TokenBucket(self._node_rate,
+                                                           self._node_burst)
+            return bucket
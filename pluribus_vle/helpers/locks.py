@@ -0,0 +1,40 @@
+import threading
+from contextlib import contextmanager
+
+
+class LockManager(object):
+    """ Named locks, e.g. per fabric node.
+
+    Locks for several names are always acquired in the same order, so
+    commands touching overlapping resources serialise without deadlocks,
+    while commands touching disjoint resources run in parallel.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def _lock(self, name):
+        with self._guard:
+            lock = self._locks.get(name)
+            if lock is None:
+                lock = self._locks[name] = threading.Lock()
+            return lock
+
+    @contextmanager
+    def acquire(self, *names):
+        """ Hold the locks of all the names for the duration of the context. """
+        locks = [self._lock(name) for name in sorted(set(names), key=repr)]
+        acquired = []
+        try:
+            for lock in locks:
+                lock.acquire()
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+    @staticmethod
+    def node(node_name):
+        return "node", node_name
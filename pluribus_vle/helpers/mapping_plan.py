@@ -0,0 +1,357 @@
+import sys
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from pluribus_vle.helpers import deadline
+from pluribus_vle.helpers.concurrency import run_in_parallel
+
+
+class Operation(object):
+    """ Single typed step of a mapping plan. """
+    VALIDATE_PORT = "validate_port"
+    CREATE_VLAN = "create_vlan"
+    CREATE_EMPTY_VLAN = "create_empty_vlan"
+    ADD_PORT = "add_port"
+    REMOVE_PORT = "remove_port"
+    ADD_VXLAN = "add_vxlan"
+    REMOVE_VXLAN = "remove_vxlan"
+    VERIFY_VXLAN = "verify_vxlan"
+    CREATE_VLE = "create_vle"
+    VERIFY_VLE = "verify_vle"
+    DELETE_VLE = "delete_vle"
+    VERIFY_VLE_DELETED = "verify_vle_deleted"
+    DELETE_VLAN = "delete_vlan"
+    VERIFY_VLAN_DELETED = "verify_vlan_deleted"
+
+    READ_KINDS = frozenset([VALIDATE_PORT, VERIFY_VXLAN, VERIFY_VLE,
+                            VERIFY_VLE_DELETED, VERIFY_VLAN_DELETED])
+
+    def __init__(self, kind, node, args, depends_on):
+        """
+        :param kind: operation kind, one of the class constants
+        :param node: node the operation is executed on, None for fabric-wide ones
+        :param args: handler arguments
+        :type args: tuple
+        :param depends_on: operations which have to be completed first
+        :type depends_on: tuple
+        """
+        self.kind = kind
+        self.node = node
+        self.args = args
+        self.depends_on = depends_on
+
+    @property
+    def key(self):
+        return self.kind, self.node, self.args
+
+    @property
+    def is_read(self):
+        return self.kind in self.READ_KINDS
+
+    def __str__(self):
+        return "{0}({1})".format(self.kind, ", ".join(map(str, self.args)))
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class MappingPlan(object):
+    """ DAG of operations building or removing a connection. """
+
+    def __init__(self, name):
+        self.name = name
+        self._operations = OrderedDict()
+
+    @property
+    def operations(self):
+        """ Operations in topological order. """
+        return list(self._operations.values())
+
+    def add(self, kind, node, args, depends_on=()):
+        """ Add operation to the plan.
+
+        Identical reads with the same dependencies are coalesced into one
+        operation.
+        :rtype: Operation
+        """
+        depends_on = tuple(depends_on)
+        operation = Operation(kind, node, tuple(args), depends_on)
+        existing = self._operations.get(operation.key)
+        if existing is not None:
+            if existing.is_read and set(depends_on) <= set(existing.depends_on):
+                return existing
+            raise ValueError("Operation {} is already planned".format(operation))
+        self._operations[operation.key] = operation
+        return operation
+
+    def select(self, predicate):
+        """ Plan of the operations matching the predicate.
+
+        Dependencies on dropped operations are dropped as well.
+        :rtype: MappingPlan
+        """
+        plan = MappingPlan(self.name)
+        for operation in self.operations:
+            if predicate(operation):
+                operation = Operation(operation.kind, operation.node, operation.args,
+                                      tuple(plan._operations[dependency.key]
+                                            for dependency in operation.depends_on
+                                            if dependency.key in plan._operations))
+                plan._operations[operation.key] = operation
+        return plan
+
+    def describe(self):
+        """ Plan description used for logging. """
+        lines = ["Plan {}:".format(self.name)]
+        index = {}
+        for number, operation in enumerate(self.operations, 1):
+            index[operation] = number
+            lines.append("  {0}. [{1}] {2} after {3}".format(
+                number,
+                operation.node or "fabric",
+                operation,
+                [index[dependency] for dependency in operation.depends_on]
+            ))
+        return "\n".join(lines)
+
+    @classmethod
+    def map_single_node(cls, node, src_port, dst_port, vlan_id, vle_name):
+        plan = cls("map {0}/{1} <-> {0}/{2}".format(node, src_port, dst_port))
+        validations = (
+            plan.add(Operation.VALIDATE_PORT, node, (node, src_port)),
+            plan.add(Operation.VALIDATE_PORT, node, (node, dst_port)),
+        )
+        create_vlan = plan.add(Operation.CREATE_VLAN, node, (node, src_port, vlan_id),
+                               validations)
+        add_port = plan.add(Operation.ADD_PORT, node, (node, dst_port, vlan_id),
+                            (create_vlan,))
+        cls._add_vle_creation(plan, vle_name, node, src_port, node, dst_port,
+                              (add_port,))
+        return plan
+
+    @classmethod
+    def map_multi_node(cls, src_node, dst_node, src_port, dst_port, src_tunnel,
+                       dst_tunnel, vlan_id, vle_name):
+        plan = cls("map {0}/{1} <-> {2}/{3}".format(src_node, src_port,
+                                                    dst_node, dst_port))
+        validations = (
+            plan.add(Operation.VALIDATE_PORT, src_node, (src_node, src_port)),
+            plan.add(Operation.VALIDATE_PORT, dst_node, (dst_node, dst_port)),
+        )
+        verifications = []
+        for node, port, tunnel in [(src_node, src_port, src_tunnel),
+                                   (dst_node, dst_port, dst_tunnel)]:
+            create_vlan = plan.add(Operation.CREATE_VLAN, node, (node, port, vlan_id),
+                                   validations)
+            add_vxlan = plan.add(Operation.ADD_VXLAN, node, (node, tunnel, vlan_id),
+                                 (create_vlan,))
+            verifications.append(
+                plan.add(Operation.VERIFY_VXLAN, node, (node, vlan_id, tunnel),
+                         (add_vxlan,))
+            )
+        cls._add_vle_creation(plan, vle_name, src_node, src_port, dst_node, dst_port,
+                              verifications)
+        return plan
+
+    @classmethod
+    def map_multi_node_warm(cls, src_node, dst_node, src_port, dst_port, vlan_id,
+                            vle_name):
+        """ Map ports on VLAN already attached to the tunnels, see warm_up. """
+        plan = cls("map {0}/{1} <-> {2}/{3} on warm vlan {4}".format(
+            src_node, src_port, dst_node, dst_port, vlan_id))
+        validations = (
+            plan.add(Operation.VALIDATE_PORT, src_node, (src_node, src_port)),
+            plan.add(Operation.VALIDATE_PORT, dst_node, (dst_node, dst_port)),
+        )
+        add_ports = [
+            plan.add(Operation.ADD_PORT, node, (node, port, vlan_id), validations)
+            for node, port in [(src_node, src_port), (dst_node, dst_port)]
+        ]
+        cls._add_vle_creation(plan, vle_name, src_node, src_port, dst_node, dst_port,
+                              add_ports)
+        return plan
+
+    @classmethod
+    def warm_up(cls, src_node, dst_node, src_tunnel, dst_tunnel, vlan_id, description):
+        """ Create VLAN without ports on both nodes and attach it to the tunnels.
+
+        The description marks the VLAN as warm, to find it after restart.
+        """
+        plan = cls("warm up vlan {0} on {1} <-> {2}".format(vlan_id, src_node,
+                                                            dst_node))
+        for node, tunnel in [(src_node, src_tunnel), (dst_node, dst_tunnel)]:
+            create_vlan = plan.add(Operation.CREATE_EMPTY_VLAN, node,
+                                   (node, vlan_id, description))
+            add_vxlan = plan.add(Operation.ADD_VXLAN, node, (node, tunnel, vlan_id),
+                                 (create_vlan,))
+            plan.add(Operation.VERIFY_VXLAN, node, (node, vlan_id, tunnel),
+                     (add_vxlan,))
+        return plan
+
+    @classmethod
+    def clear(cls, nodes, vle_name, vlan_id):
+        plan = cls("clear {}".format(vle_name))
+        delete_vle = plan.add(Operation.DELETE_VLE, None, (vle_name,))
+        vle_deleted = plan.add(Operation.VERIFY_VLE_DELETED, None, (vle_name,),
+                               (delete_vle,))
+        for node in OrderedDict.fromkeys(nodes):
+            delete_vlan = plan.add(Operation.DELETE_VLAN, node, (node, vlan_id),
+                                   (vle_deleted,))
+            plan.add(Operation.VERIFY_VLAN_DELETED, node, (node, vlan_id),
+                     (delete_vlan,))
+        return plan
+
+    @classmethod
+    def release_vlan(cls, node, vlan_id):
+        plan = cls("release vlan {0} on {1}".format(vlan_id, node))
+        delete_vlan = plan.add(Operation.DELETE_VLAN, node, (node, vlan_id))
+        plan.add(Operation.VERIFY_VLAN_DELETED, node, (node, vlan_id), (delete_vlan,))
+        return plan
+
+    @classmethod
+    def compensation(cls, keys):
+        """ Plan undoing completed operations of a failed mapping.
+
+        :param keys: keys of the completed operations
+        """
+        plan = cls("rollback")
+        delete_vles = [plan.add(Operation.DELETE_VLE, None, (args[0],))
+                       for kind, _, args in keys if kind == Operation.CREATE_VLE]
+        deleted_vlans = set((node, args[2]) for kind, node, args in keys
+                            if kind == Operation.CREATE_VLAN)
+        node_operations = {}
+        for kind, node, args in sorted(key for key in keys if key[1] is not None):
+            if kind == Operation.ADD_VXLAN:
+                operation = plan.add(Operation.REMOVE_VXLAN, node, args, delete_vles)
+            elif kind == Operation.ADD_PORT and (node, args[2]) not in deleted_vlans:
+                operation = plan.add(Operation.REMOVE_PORT, node, args, delete_vles)
+            else:
+                continue
+            node_operations.setdefault(node, []).append(operation)
+        for node, vlan_id in sorted(deleted_vlans):
+            plan.add(Operation.DELETE_VLAN, node, (node, vlan_id),
+                     delete_vles + node_operations.get(node, []))
+        return plan
+
+    @staticmethod
+    def _add_vle_creation(plan, vle_name, node_1, node_1_port, node_2, node_2_port,
+                          depends_on):
+        create_vle = plan.add(Operation.CREATE_VLE, None,
+                              (vle_name, node_1, node_1_port, node_2, node_2_port),
+                              depends_on)
+        return plan.add(Operation.VERIFY_VLE, None, (vle_name,), (create_vle,))
+
+
+class PlanBackend(object):
+    """ Mixin for actions able to execute mapping plan operations.
+
+    OPERATION_HANDLERS maps operation kinds to names of handler methods.
+    CONCURRENT backends may execute operations of different nodes at once,
+    e.g. REST ones; a CLI backend uses a single session and may not.
+    """
+    OPERATION_HANDLERS = {}
+    CONCURRENT = False
+
+    def execute_operation(self, operation):
+        handler = getattr(self, self.OPERATION_HANDLERS[operation.kind])
+        return handler(*operation.args)
+
+
+class PlanExecutor(object):
+    """ Execute mapping plan with dependency-aware parallelism.
+
+    Operations are split into lanes by the backend executing them. Each lane
+    runs its operations sequentially in its own thread, waiting only for the
+    operations it depends on. Rollbacks are also split by node on concurrent
+    backends, whatever backends the mapping used.
+    """
+
+    def __init__(self, default_backend, logger, node_backends=None):
+        """
+        :param default_backend: backend for fabric-wide operations and nodes
+            without dedicated backend
+        :type default_backend: PlanBackend
+        :param node_backends: node name to backend mapping
+        :type node_backends: dict
+        """
+        self._default_backend = default_backend
+        self._node_backends = node_backends or {}
+        self._logger = logger
+
+    def _backend(self, operation):
+        return self._node_backends.get(operation.node, self._default_backend)
+
+    def execute(self, plan, completed=None, compensate=False):
+        """ Execute all plan operations.
+
+        :type plan: MappingPlan
+        :param completed: set the keys of successfully executed operations
+            are added to
+        :type completed: set
+        :param compensate: if True, the completed operations, including ones
+            already in completed, are undone when an operation fails
+        :raises Exception: the first failed operation exception
+        """
+        if completed is None:
+            completed = set()
+        succeeded = False
+        try:
+            self._execute(plan, completed)
+            succeeded = True
+        finally:
+            if compensate and not succeeded:
+                self._compensate(completed)
+
+    def _compensate(self, completed):
+        rollback = MappingPlan.compensation(completed)
+        if not rollback.operations:
+            return
+        self._logger.warning("Roll back {} completed operations".format(len(completed)))
+        try:
+            # Rollback of the command failed by its deadline must still run
+            with deadline.suspended():
+                self._execute(rollback, set(), node_lanes=True)
+        except Exception:
+            self._logger.exception("Rollback failed")
+
+    def _execute(self, plan, completed, node_lanes=False):
+        self._logger.debug(plan.describe())
+        lanes = OrderedDict()
+        for operation in plan.operations:
+            backend = self._backend(operation)
+            node = operation.node if node_lanes and backend.CONCURRENT else None
+            lanes.setdefault((id(backend), node), []).append(operation)
+
+        if len(lanes) == 1:
+            for operation in plan.operations:
+                self._execute_operation(operation)
+                completed.add(operation.key)
+            return
+
+        done = {operation: threading.Event() for operation in plan.operations}
+        errors = []
+
+        def _run_lane(operations):
+            for position, operation in enumerate(operations):
+                for dependency in operation.depends_on:
+                    done[dependency].wait()
+                try:
+                    if errors:
+                        raise errors[0]
+                    self._execute_operation(operation)
+                    completed.add(operation.key)
+                except Exception:
+                    errors.append(sys.exc_info()[1])
+                    for cancelled in operations[position:]:
+                        done[cancelled].set()
+                    raise
+                done[operation].set()
+
+        run_in_parallel(*[partial(_run_lane, operations)
+                          for operations in lanes.values()])
+
+    def _execute_operation(self, operation):
+        deadline.check(operation)
+        self._logger.debug("Execute {}".format(operation))
+        self._backend(operation).execute_operation(operation)
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PairingException(Exception):
+    """ VLAN id is set on ports which were not requested to be mapped. """
+
+
+class PairingStore(object):
+    """ Pending halves of MAP_ON_SET_VLAN mapping requests.
+
+    Keeps map requests (port to peer port, in both directions) and VLAN ids
+    set on a single port until the partner arrives. Entries older than ttl
+    seconds expire and the oldest ones are evicted above max_size.
+    """
+
+    def __init__(self, ttl, max_size, clock=time.time):
+        self._ttl = ttl
+        self._max_size = max_size
+        self._clock = clock
+        self._map_requests = OrderedDict()
+        self._vlans = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"matched": 0, "expired": 0, "evicted": 0}
+
+    @property
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self._counters)
+            metrics["pending_map_requests"] = len(self._map_requests)
+            metrics["pending_vlans"] = len(self._vlans)
+            return metrics
+
+    def add_map_request(self, src_port, dst_port):
+        """ Register the request to map two ports. """
+        with self._lock:
+            self._expire()
+            for port in (src_port, dst_port):
+                # A port paired again leaves its old peer without a partner
+                old_peer = self._peer(port)
+                if old_peer is not None and self._peer(old_peer) == port:
+                    del self._map_requests[old_peer]
+            now = self._clock()
+            self._put(self._map_requests, src_port, dst_port, now)
+            self._put(self._map_requests, dst_port, src_port, now)
+
+    def add_vlan(self, vlan_id, port):
+        """ Register VLAN id set on the port.
+
+        :return: (src_port, dst_port) pair to map with the VLAN id, None if the
+            partner port is not known yet
+        :raises PairingException: if the partner port is known but the ports
+            were not requested to be mapped
+        """
+        with self._lock:
+            self._expire()
+            record = self._vlans.get(vlan_id)
+            if record is None:
+                self._put(self._vlans, vlan_id, port, self._clock())
+                return None
+
+            src_port, dst_port = record[0], port
+            if (self._peer(src_port) != dst_port or
+                    self._peer(dst_port) != src_port):
+                raise PairingException(
+                    "Ports {0} and {1} were not requested to be mapped".format(
+                        src_port, dst_port)
+                )
+            del self._vlans[vlan_id]
+            del self._map_requests[src_port]
+            del self._map_requests[dst_port]
+            self._counters["matched"] += 1
+            return src_port, dst_port
+
+    def peer(self, port):
+        """ Port the port is requested to be mapped to, None if not requested. """
+        with self._lock:
+            self._expire()
+            return self._peer(port)
+
+    def _peer(self, port):
+        record = self._map_requests.get(port)
+        if record:
+            return record[0]
+
+    def _put(self, table, key, value, timestamp):
+        table.pop(key, None)
+        table[key] = (value, timestamp)
+        while len(table) > self._max_size:
+            evicted, (peer, _) = table.popitem(last=False)
+            self._counters["evicted"] += 1
+            if table is self._map_requests and self._peer(peer) == evicted:
+                # Map request halves are evicted together
+                del table[peer]
+                self._counters["evicted"] += 1
+
+    def _expire(self):
+        expiration_time = self._clock() - self._ttl
+        for table in (self._map_requests, self._vlans):
+            while table and next(iter(table.values()))[1] < expiration_time:
+                table.popitem(last=False)
+                self._counters["expired"] += 1
@@ -0,0 +1,64 @@
+from collections import OrderedDict
+
+PORT_STATES = ("enable", "disable")
+
+
+def normalize_port_state(port_state):
+    """ Port state in the device form, "Enable" gives "enable".
+
+    :raises ValueError: if the state is neither enable nor disable
+    """
+    normalized = str(port_state).lower()
+    if normalized not in PORT_STATES:
+        raise ValueError("Unknown port state {}".format(port_state))
+    return normalized
+
+
+def device_port_state(value):
+    """ Port state from the enable field of the device port config.
+
+    :return: "enable", "disable" or None if the value is not known
+    """
+    normalized = str(value).strip().lower()
+    if normalized in ("enable", "on", "yes", "true"):
+        return "enable"
+    if normalized in ("disable", "off", "no", "false"):
+        return "disable"
+    return None
+
+
+class PortStateBatch(object):
+    """ Collect port state changes and apply them with one call per node.
+
+    Ports already in the requested state on the device are skipped, the state
+    is read from the device at apply, not remembered from earlier writes.
+    """
+
+    def __init__(self):
+        self._changes = OrderedDict()
+
+    def add(self, node, port, port_state):
+        self._changes[node, port] = normalize_port_state(port_state)
+
+    def apply(self, set_ports_state, ports_state_table=None):
+        """ Apply collected changes.
+
+        :param set_ports_state: callable(ports, node, port_state) changing state
+            of the list of ports on the node
+        :param ports_state_table: callable(node) returning port to current
+            state table of the node, read once per node; every change is sent
+            if not passed
+        """
+        current_states = {}
+        groups = OrderedDict()
+        for (node, port), port_state in self._changes.items():
+            if ports_state_table is not None:
+                if node not in current_states:
+                    current_states[node] = ports_state_table(node)
+                if current_states[node].get(str(port)) == port_state:
+                    continue
+            groups.setdefault((node, port_state), []).append(port)
+        self._changes.clear()
+
+        for (node, port_state), ports in groups.items():
+            set_ports_state(ports, node, port_state)
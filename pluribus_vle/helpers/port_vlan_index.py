@@ -0,0 +1,44 @@
+def parse_vlan_ids(value):
+    """ Parse VLAN list like "1,100-102" into the set of VLAN ids. """
+    vlan_ids = set()
+    if not value or value.strip().lower() == "none":
+        return vlan_ids
+    for item in value.split(","):
+        item = item.strip()
+        if "-" in item:
+            first, last = item.split("-", 1)
+            vlan_ids.update(range(int(first), int(last) + 1))
+        elif item:
+            vlan_ids.add(int(item))
+    return vlan_ids
+
+
+class PortVlanIndex(object):
+    """ Port to VLAN membership of a single node.
+
+    Loaded with one read and kept up to date from the driver's own writes.
+    """
+
+    def __init__(self, memberships=None):
+        """
+        :param memberships: port to VLAN ids mapping
+        :type memberships: dict
+        """
+        self._memberships = {str(port): set(vlan_ids) for port, vlan_ids in
+                             (memberships or {}).items()}
+
+    def vlan_ids(self, port):
+        """ VLAN ids the port is a member of, None if there are no any. """
+        vlan_ids = self._memberships.get(str(port))
+        if vlan_ids:
+            return sorted(vlan_ids)
+
+    def set_vlan_ids(self, port, vlan_ids):
+        self._memberships[str(port)] = set(map(int, vlan_ids))
+
+    def discard(self, port, vlan_id):
+        self._memberships.get(str(port), set()).discard(int(vlan_id))
+
+    def remove_vlan(self, vlan_id):
+        for vlan_ids in self._memberships.values():
+            vlan_ids.discard(int(vlan_id))
@@ -0,0 +1,84 @@
+import threading
+from collections import deque
+
+
+class Reconciler(object):
+    """ Find driver VLEs and VLANs which no mapping uses.
+
+    Driver VLEs are named VLE prefix + VLAN id. Driver VLANs are in the
+    driver's range and carry the VXLAN with the same id. Orphans are reported
+    only when two consecutive scans find them, so resources of mappings in
+    progress are not taken for orphans.
+    """
+    VLE = "vle"
+    VLAN = "vlan"
+
+    def __init__(self, vle_prefix, vlan_min, vlan_max, history_size=100):
+        self._vle_prefix = vle_prefix
+        self._vlan_min = int(vlan_min)
+        self._vlan_max = int(vlan_max)
+        self._suspects = set()
+        self._counters = {"scans": 0, "reclaimed": 0, "failed": 0}
+        self._history = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+
+    @property
+    def report(self):
+        """ Counters and the latest reclaimed orphans. """
+        with self._lock:
+            report = dict(self._counters)
+            report["history"] = list(self._history)
+            return report
+
+    def scan(self, vles, vlans_table, reserved):
+        """ Find orphans in the fabric state.
+
+        :param vles: VLE name to its nodes table
+        :type vles: dict
+        :param vlans_table: node to {VLAN id: VXLAN id} table
+        :type vlans_table: dict
+        :param reserved: VLAN ids in use by the driver, taken before the state
+        :return: orphans found by this and the previous scan, VLEs first;
+            (VLE, vle_name, nodes) and (VLAN, node, vlan_id) tuples
+        :rtype: list
+        """
+        orphans = []
+        used = set()
+        for vle_name, nodes in sorted(vles.items()):
+            vlan_id = self._vle_vlan_id(vle_name)
+            if vlan_id is None or vlan_id in reserved:
+                continue
+            if all(vlan_id in vlans_table.get(node, {}) for node in nodes):
+                used.update((node, vlan_id) for node in nodes)
+            else:
+                orphans.append((self.VLE, vle_name, tuple(nodes)))
+
+        for node, vlans in sorted(vlans_table.items()):
+            for vlan_id, vxlan_id in sorted(vlans.items()):
+                if (self._vlan_min <= vlan_id <= self._vlan_max and
+                        vlan_id == vxlan_id and
+                        vlan_id not in reserved and
+                        (node, vlan_id) not in used):
+                    orphans.append((self.VLAN, node, vlan_id))
+
+        with self._lock:
+            self._counters["scans"] += 1
+            confirmed = [orphan for orphan in orphans if orphan in self._suspects]
+            self._suspects = set(orphans)
+        return confirmed
+
+    def reclaimed(self, orphan, error=None):
+        """ Record the orphan cleanup result. """
+        with self._lock:
+            self._suspects.discard(orphan)
+            if error is None:
+                self._counters["reclaimed"] += 1
+                self._history.append(orphan)
+            else:
+                self._counters["failed"] += 1
+
+    def _vle_vlan_id(self, vle_name):
+        if vle_name.startswith(self._vle_prefix):
+            vlan_id = vle_name[len(self._vle_prefix):]
+            if vlan_id.isdigit():
+                return int(vlan_id)
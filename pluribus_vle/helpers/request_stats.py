@@ -0,0 +1,21 @@
+import threading
+
+
+class RequestStats(object):
+    """ Number and mean latency of device requests by label. """
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @property
+    def report(self):
+        with self._lock:
+            return {label: {"requests": count,
+                            "mean_latency": round(total / count, 4)}
+                    for label, (count, total) in self._stats.items()}
+
+    def record(self, label, seconds):
+        with self._lock:
+            count, total = self._stats.get(label, (0, 0.0))
+            self._stats[label] = (count + 1, total + seconds)
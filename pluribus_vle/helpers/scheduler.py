@@ -0,0 +1,76 @@
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from pluribus_vle.helpers import deadline
+
+
+class CommandScheduler(object):
+    """ Admit driver commands by priority class.
+
+    Every class has its own concurrency limit. Low priority commands are not
+    started while high priority ones wait, and they pause at checkpoints
+    while high priority commands are running.
+    """
+    HIGH = "high"
+    LOW = "low"
+
+    def __init__(self, high_concurrency, low_concurrency):
+        self._limits = {self.HIGH: int(high_concurrency),
+                        self.LOW: int(low_concurrency)}
+        self._running = {self.HIGH: 0, self.LOW: 0}
+        self._waiting = {self.HIGH: 0, self.LOW: 0}
+        self._condition = threading.Condition()
+        self._local = threading.local()
+
+    def _can_start(self, priority):
+        if self._running[priority] >= self._limits[priority]:
+            return False
+        return priority == self.HIGH or not self._waiting[self.HIGH]
+
+    @contextmanager
+    def slot(self, priority):
+        """ Run the context as a command of the priority class.
+
+        Nested commands, e.g. MapClearTo calling MapClear, reuse the slot of
+        the outer command.
+        """
+        if getattr(self._local, "priority", None):
+            yield
+            return
+
+        with self._condition:
+            self._waiting[priority] += 1
+            try:
+                while not self._can_start(priority):
+                    self._condition.wait(deadline.bounded_timeout(None))
+            finally:
+                self._waiting[priority] -= 1
+            self._running[priority] += 1
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = None
+            with self._condition:
+                self._running[priority] -= 1
+                self._condition.notify_all()
+
+    def checkpoint(self):
+        """ Preemption point, low priority commands wait for high ones here. """
+        if getattr(self._local, "priority", None) != self.LOW:
+            return
+        with self._condition:
+            while self._running[self.HIGH] or self._waiting[self.HIGH]:
+                self._condition.wait(deadline.bounded_timeout(None))
+
+
+def scheduled(priority):
+    """ Run DriverCommands method through its command scheduler. """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self._scheduler.slot(priority):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
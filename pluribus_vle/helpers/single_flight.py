@@ -0,0 +1,77 @@
+import threading
+
+from pluribus_vle.helpers import deadline
+
+
+class _Call(object):
+    def __init__(self, writes):
+        self.writes = writes
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.expired = False
+
+
+class SingleFlight(object):
+    """ Identical concurrent calls share one execution.
+
+    The first caller of a key executes the function, callers of the same key
+    arriving before it returns wait for its result or exception. A call is
+    joined only if no write completed since it started, so a caller never
+    gets a result older than its own writes. A call failed by the deadline
+    of its caller is executed again by the waiting callers.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._coalesced = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def coalesced(self):
+        """ Number of calls served by the execution of another caller. """
+        with self._lock:
+            return self._coalesced
+
+    def wrote(self):
+        """ Record a completed write, calls in flight are not joined anymore. """
+        with self._lock:
+            self._writes += 1
+
+    def do(self, key, function, *args, **kwargs):
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None or call.writes != self._writes
+                if leader:
+                    call = self._calls[key] = _Call(self._writes)
+                else:
+                    self._coalesced += 1
+
+            if leader:
+                return self._execute(key, call, function, *args, **kwargs)
+
+            while not call.done.wait(deadline.bounded_timeout(None)):
+                pass
+            if call.expired:
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+    def _execute(self, key, call, function, *args, **kwargs):
+        try:
+            call.result = function(*args, **kwargs)
+        except Exception as err:
+            call.error = err
+            remaining = deadline.remaining()
+            call.expired = isinstance(err, deadline.DeadlineExceeded) or \
+                (remaining is not None and remaining <= 0)
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+        return call.result
@@ -0,0 +1,104 @@
+import threading
+import time
+
+from pluribus_vle.helpers.mapping_plan import Operation
+
+
+class Stage(object):
+    """ Side of a MAP_ON_SET_VLAN mapping provisioned before its partner port
+    gets the VLAN id.
+
+    Holds the keys of the mapping plan operations already executed, so the
+    mapping itself only executes the rest of them.
+    """
+    PORT_KINDS = frozenset([Operation.VALIDATE_PORT, Operation.CREATE_VLAN,
+                            Operation.ADD_PORT])
+
+    def __init__(self, port, peer_port, vlan_id, node, node_port, created):
+        """
+        :param port: staged port address, "192.168.42.240/node/21"
+        :param peer_port: address of the port it is requested to be mapped to
+        :param vlan_id: VLAN id set on the staged port
+        :param node: node of the staged port
+        :param node_port: port id of the staged port on the node, "21"
+        :param created: staging start time
+        """
+        self.port = port
+        self.peer_port = peer_port
+        self.vlan_id = int(vlan_id)
+        self.node = node
+        self.node_port = str(node_port)
+        self.created = created
+        self.reserved = False
+        self.completed = set()
+        self.error = None
+        self._done = threading.Event()
+
+    def staging_plan(self, plan):
+        """ Part of the mapping plan executed ahead of time.
+
+        The staged port operations with the VLAN and tunnel of its node, never
+        the peer port ones: the peer may be on the same node and must stay in
+        its VLAN until it gets the VLAN id as well.
+        """
+        return plan.select(self._is_staged)
+
+    def _is_staged(self, operation):
+        if operation.node != self.node:
+            return False
+        if operation.kind in self.PORT_KINDS:
+            return str(operation.args[1]) == self.node_port
+        return True
+
+    def remaining_plan(self, plan):
+        """ Part of the mapping plan left for the mapping itself. """
+        return plan.select(lambda operation: operation.key not in self.completed)
+
+    def finish(self, error=None):
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """ Wait for the staging to finish.
+
+        :return: False if it did not finish within timeout seconds
+        """
+        return self._done.wait(timeout)
+
+
+class StagingArea(object):
+    """ Stages by staged port, expiring after ttl seconds. """
+
+    def __init__(self, ttl, clock=time.time):
+        self._ttl = ttl
+        self._clock = clock
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def create(self, port, peer_port, vlan_id, node, node_port):
+        """ Register a new stage of the port.
+
+        :return: the new stage and the stage it replaced, if any
+        :rtype: tuple
+        """
+        stage = Stage(port, peer_port, vlan_id, node, node_port, self._clock())
+        with self._lock:
+            replaced = self._stages.get(port)
+            self._stages[port] = stage
+        return stage, replaced
+
+    def pop(self, port, peer_port, vlan_id):
+        """ Take the stage matching the mapping request out of the area. """
+        with self._lock:
+            stage = self._stages.get(port)
+            if (stage is not None and stage.peer_port == peer_port and
+                    stage.vlan_id == int(vlan_id)):
+                return self._stages.pop(port)
+
+    def pop_expired(self):
+        """ Take the stages older than ttl out of the area. """
+        expiration_time = self._clock() - self._ttl
+        with self._lock:
+            expired = [port for port, stage in self._stages.items()
+                       if stage.created < expiration_time]
+            return [self._stages.pop(port) for port in expired]
@@ -0,0 +1,72 @@
+import threading
+import time
+
+
+class SwitchResolveException(Exception):
+    """ Switch name is not known to the fabric. """
+
+
+class SwitchResolver(object):
+    """ Switch name to hostid resolution.
+
+    The switch mapping is reloaded when a name is missing from it, at once on
+    the first miss and then at most once per refresh_interval seconds;
+    concurrent misses share one reload.
+    Unknown switches are an error unless strict is off, then requests fall
+    back to fabric scope.
+    """
+    FABRIC = "fabric"
+
+    def __init__(self, load, refresh_interval=30, strict=False, clock=time.time):
+        """
+        :param load: callable returning switch name to hostid table
+        """
+        self._load = load
+        self._refresh_interval = refresh_interval
+        self._strict = strict
+        self._clock = clock
+        self._counters = {"refreshes": 0, "fallbacks": 0}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._hostids = dict(load())
+        # Not refreshed yet, a switch added since the load is found at once
+        self._refreshed = None
+
+    @property
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self._counters)
+            metrics["switches"] = len(self._hostids)
+            return metrics
+
+    def hostid(self, switch_name):
+        """ Hostid of the switch, for api.switch scoped requests.
+
+        :raises SwitchResolveException: if the switch is unknown in strict mode
+        """
+        hostid = self._hostids.get(switch_name)
+        if hostid is None:
+            hostid = self._refresh(switch_name)
+        if hostid is not None:
+            return hostid
+
+        if self._strict:
+            raise SwitchResolveException(
+                "Cannot find hostid of the switch {}".format(switch_name))
+        with self._lock:
+            self._counters["fallbacks"] += 1
+        return self.FABRIC
+
+    def _refresh(self, switch_name):
+        with self._refresh_lock:
+            # Another caller could have reloaded the mapping while we waited
+            hostid = self._hostids.get(switch_name)
+            if hostid is not None or self._refreshed is not None and \
+                    self._clock() - self._refreshed < self._refresh_interval:
+                return hostid
+            hostids = dict(self._load())
+            with self._lock:
+                self._hostids = hostids
+                self._refreshed = self._clock()
+                self._counters["refreshes"] += 1
+            return hostids.get(switch_name)
@@ -0,0 +1,85 @@
+import threading
+import time
+
+
+class TunnelIndex(object):
+    """ Tunnel names by (local node, remote node).
+
+    The table is reloaded when a tunnel is missing from it, at most once per
+    refresh_interval seconds; concurrent misses share one reload.
+    """
+
+    def __init__(self, load, refresh_interval=30, clock=time.time):
+        """
+        :param load: callable returning (local node, remote node) to tunnel
+            name table
+        """
+        self._load = load
+        self._refresh_interval = refresh_interval
+        self._clock = clock
+        self._table = {}
+        self._refreshed = None
+        self._refreshes = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def metrics(self):
+        with self._lock:
+            return {"tunnels": len(self._table), "refreshes": self._refreshes}
+
+    def update(self, table):
+        """ Replace the table with the one just read from the device.
+
+        :return: True if the table changed
+        """
+        with self._lock:
+            changed = table != self._table
+            self._table = dict(table)
+            self._refreshed = self._clock()
+            return changed
+
+    def pairs(self):
+        """ Node pairs connected by tunnels in both directions. """
+        with self._lock:
+            return [(node_1, node_2) for node_1, node_2 in self._table
+                    if (node_2, node_1) in self._table]
+
+    def lookup(self, src_node, dst_node, load=None):
+        """ Tunnels connecting two nodes, in both directions.
+
+        :param load: callable used instead of the default one if the table
+            has to be reloaded
+        :return: (src tunnel, dst tunnel), None if the nodes are not connected
+        """
+        tunnels = self._get(src_node, dst_node)
+        if tunnels is None:
+            with self._refresh_lock:
+                # Another caller could have reloaded the table while we waited
+                tunnels = self._get(src_node, dst_node)
+                if tunnels is None and self._refresh_due():
+                    self.refresh(load)
+                    tunnels = self._get(src_node, dst_node)
+        return tunnels
+
+    def refresh(self, load=None):
+        """ Reload the table.
+
+        :return: True if the table changed
+        """
+        table = (load or self._load)()
+        with self._lock:
+            self._refreshes += 1
+        return self.update(table)
+
+    def _refresh_due(self):
+        with self._lock:
+            return self._refreshed is None or \
+                self._clock() - self._refreshed >= self._refresh_interval
+
+    def _get(self, src_node, dst_node):
+        with self._lock:
+            src_tunnel = self._table.get((src_node, dst_node))
+            dst_tunnel = self._table.get((dst_node, src_node))
+        if src_tunnel and dst_tunnel:
+            return src_tunnel, dst_tunnel
@@ -0,0 +1,55 @@
+import threading
+
+
+class VlanAllocator(object):
+    """ Allocate VLAN ids from the driver's range.
+
+    Allocated ids stay reserved until released, so concurrent commands never
+    get the same id even before it appears on the device.
+    """
+
+    def __init__(self, vlan_min, vlan_max):
+        self._vlan_min = int(vlan_min)
+        self._vlan_max = int(vlan_max)
+        self._reserved = set()
+        self._lock = threading.Lock()
+
+    @property
+    def reserved(self):
+        with self._lock:
+            return frozenset(self._reserved)
+
+    def reserve(self, busy_vlan_ids, vlan_id=None):
+        """ Reserve the requested VLAN id or the first available one.
+
+        :param busy_vlan_ids: VLAN ids already used on the device
+        :param vlan_id: requested VLAN id, any id from the range if None
+        :rtype: int
+        """
+        busy_vlan_ids = set(map(int, busy_vlan_ids))
+        if vlan_id is None:
+            candidates = range(self._vlan_min, self._vlan_max + 1)
+        else:
+            candidates = [int(vlan_id)]
+
+        with self._lock:
+            for candidate in candidates:
+                if candidate not in busy_vlan_ids and candidate not in self._reserved:
+                    self._reserved.add(candidate)
+                    return candidate
+        raise Exception("Cannot determine available vlan id")
+
+    def hold(self, vlan_id):
+        """ Reserve the VLAN id, e.g. one still used on the device.
+
+        :return: True if the id was not reserved yet
+        """
+        with self._lock:
+            if int(vlan_id) in self._reserved:
+                return False
+            self._reserved.add(int(vlan_id))
+            return True
+
+    def release(self, vlan_id):
+        with self._lock:
+            self._reserved.discard(int(vlan_id))
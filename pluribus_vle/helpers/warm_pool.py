@@ -0,0 +1,87 @@
+import threading
+from collections import deque
+
+
+class WarmPool(object):
+    """ VLAN ids already attached to the tunnels between node pairs.
+
+    Holds up to size ids per node pair, handed out to multi-node mappings
+    in the order they were warmed up.
+    """
+
+    def __init__(self, size):
+        self._size = int(size)
+        self._pairs = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self._size > 0
+
+    @staticmethod
+    def pair(node_1, node_2):
+        """ Node pair key, the same in both directions. """
+        return tuple(sorted((node_1, node_2)))
+
+    @property
+    def pairs(self):
+        with self._lock:
+            return list(self._pairs)
+
+    def set_pairs(self, pairs):
+        """ Define node pairs to keep warm VLAN ids for.
+
+        :return: (node, VLAN id) of the warm VLANs of the pairs which are not
+            defined anymore, on both nodes of the pair
+        :rtype: list
+        """
+        pairs = set(self.pair(*pair) for pair in pairs)
+        with self._lock:
+            dropped = []
+            for pair in sorted(self._pairs):
+                if pair not in pairs:
+                    dropped.extend((node, vlan_id) for vlan_id in self._pairs.pop(pair)
+                                   for node in pair)
+            for pair in pairs:
+                self._pairs.setdefault(pair, deque())
+            return dropped
+
+    def take(self, node_1, node_2):
+        """ Take warm VLAN id of the node pair, None if there is none. """
+        with self._lock:
+            vlan_ids = self._pairs.get(self.pair(node_1, node_2))
+            if vlan_ids:
+                return vlan_ids.popleft()
+
+    def put(self, node_1, node_2, vlan_id):
+        with self._lock:
+            self._pairs.setdefault(self.pair(node_1, node_2), deque()).append(vlan_id)
+
+    def adopt(self, warm_vlans):
+        """ Pool warm VLAN ids found on the fabric, e.g. left by a previous process.
+
+        Ids present on both nodes of a pair are pooled up to the pool size.
+        :param warm_vlans: node to ids of the warm VLANs on it
+        :return: (node, VLAN id) of the warm VLANs not pooled
+        :rtype: list
+        """
+        adopted = set()
+        with self._lock:
+            for (node_1, node_2), vlan_ids in sorted(self._pairs.items()):
+                candidates = sorted(set(warm_vlans.get(node_1, ())) &
+                                    set(warm_vlans.get(node_2, ())) - adopted)
+                for vlan_id in candidates[:max(self._size - len(vlan_ids), 0)]:
+                    vlan_ids.append(vlan_id)
+                    adopted.add(vlan_id)
+        return [(node, vlan_id) for node, vlan_ids in sorted(warm_vlans.items())
+                for vlan_id in sorted(vlan_ids) if vlan_id not in adopted]
+
+    def contains(self, vlan_id):
+        with self._lock:
+            return any(vlan_id in vlan_ids for vlan_ids in self._pairs.values())
+
+    def missing(self, node_1, node_2):
+        """ Number of ids to warm up to fill the node pair pool. """
+        with self._lock:
+            return max(self._size - len(self._pairs.get(self.pair(node_1, node_2), ())),
+                       0)
@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import deque
+
+
+class WorkQueue(object):
+    """ Tasks executed one by one by a background worker thread.
+
+    A failed task is retried after retry_delay seconds, up to retries times.
+    """
+
+    def __init__(self, logger, retries, retry_delay, sleep=time.sleep):
+        self._logger = logger
+        self._retries = int(retries)
+        self._retry_delay = retry_delay
+        self._sleep = sleep
+        self._tasks = deque()
+        self._condition = threading.Condition()
+        self._worker = None
+
+    @property
+    def pending(self):
+        """ Number of tasks not finished yet. """
+        with self._condition:
+            return len(self._tasks)
+
+    def put(self, name, task, finished=None):
+        """ Queue the task.
+
+        :param name: task name used for logging
+        :param task: callable without arguments
+        :param finished: callable without arguments, called once the task
+            succeeded or ran out of retries
+        """
+        with self._condition:
+            self._tasks.append((name, task, finished))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work)
+                self._worker.daemon = True
+                self._worker.start()
+            self._condition.notify_all()
+
+    def join(self):
+        """ Wait for all the queued tasks to finish. """
+        with self._condition:
+            while self._tasks:
+                self._condition.wait()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._tasks:
+                    self._condition.wait()
+                name, task, finished = self._tasks[0]
+            self._run(name, task, finished)
+            with self._condition:
+                self._tasks.popleft()
+                self._condition.notify_all()
+
+    def _run(self, name, task, finished):
+        for attempt in range(self._retries + 1):
+            try:
+                task()
+                break
+            except Exception:
+                self._logger.exception("Task {0} failed, attempt {1}".format(
+                    name, attempt + 1))
+                if attempt < self._retries:
+                    self._sleep(self._retry_delay)
+        else:
+            self._logger.error("Task {} is given up".format(name))
+
+        if finished:
+            try:
+                finished()
+            except Exception:
+                self._logger.exception("Task {} finalization failed".format(name))
@@ -6,15 +6,17 @@ class RestAutoloadActions(object):
         self._switch_mapping = switch_mapping
         self._logger = logger
 
-    def ports_table(self, switch_name):
-        """ Get ports table. """
+    def ports_table(self, switch_name, port_id=None):
+        """ Get ports table, of the given port only if port_id passed. """
         port_table = {}
         data = self._api.get_port_config(
-            hostid=self._switch_mapping.get(switch_name, "fabric")
+            hostid=self._switch_mapping.hostid(switch_name),
+            port=port_id
         )
 
         for port in data:
-            port_table[port["port"]] = {
+            # Port ids are strings, as in the associations table and CLI tables
+            port_table[str(port["port"])] = {
                 "speed": str(port.get("speed", "")),
                 "autoneg": port.get("autoneg")
             }
@@ -37,14 +39,16 @@ class RestAutoloadActions(object):
             )
         return associations_table
 
-    def fabric_nodes_table(self, fabric_name):
-        """ Get fabric nodes data. """
+    def fabric_nodes_table(self, fabric_name, node_names=None):
+        """ Get fabric nodes data, of the given nodes only if node_names passed. """
         data = self._api.get_fabric_nodes(fabric_name=fabric_name)
 
         nodes_table = {}
 
         for node in data:
             node_name = node["name"]
+            if node_names is not None and node_name not in node_names:
+                continue
             node_id = node["id"]
             nodes_table[node_name] = self._switch_info_table(node_id)
 
@@ -1,9 +1,30 @@
-from pluribus_vle.rest.api_handler import PluribusApiException
 from pluribus_vle.constants import FORBIDDEN_PORT_STATUS_TABLE
+from pluribus_vle.helpers.mapping_plan import MappingPlan, Operation, PlanBackend, \
+    PlanExecutor
+from pluribus_vle.helpers.port_vlan_index import PortVlanIndex, parse_vlan_ids
+from pluribus_vle.rest.api_handler import PluribusApiException
 
 
-class RestMappingActions(object):
+class RestMappingActions(PlanBackend):
     """ Mapping actions. """
+    CONCURRENT = True
+    OPERATION_HANDLERS = {
+        Operation.VALIDATE_PORT: "_validate_port",
+        Operation.CREATE_VLAN: "_create_vlan",
+        Operation.CREATE_EMPTY_VLAN: "_create_empty_vlan",
+        Operation.ADD_PORT: "_add_to_vlan",
+        Operation.REMOVE_PORT: "_remove_from_vlan",
+        Operation.ADD_VXLAN: "_add_vxlan",
+        Operation.REMOVE_VXLAN: "_remove_vxlan",
+        Operation.VERIFY_VXLAN: "_validate_vxlan_add",
+        Operation.CREATE_VLE: "_create_vle",
+        Operation.VERIFY_VLE: "_validate_vle_creation",
+        Operation.DELETE_VLE: "_delete_vle",
+        Operation.VERIFY_VLE_DELETED: "_validate_vle_deletion",
+        Operation.DELETE_VLAN: "_delete_vlan",
+        Operation.VERIFY_VLAN_DELETED: "_validate_vlan_id_deletion",
+    }
+
     def __init__(self, api, switch_mapping, logger):
         self._api = api
         self._switch_mapping = switch_mapping
@@ -11,102 +32,80 @@ class RestMappingActions(object):
 
         self.__associations_table = None
         self.__phys_to_logical_table = None
+        self._port_vlan_indexes = {}
+        self._port_status_tables = {}
 
     def map_bidi_multi_node(self, src_node, dst_node, src_port, dst_port, src_tunnel,
-                            dst_tunnel, vlan_id, vle_name):
-        """ Create BiDirectional connection on multiple nodes. """
-        src_node_id = self._switch_mapping.get(src_node, "fabric")
-        dst_node_id = self._switch_mapping.get(dst_node, "fabric")
-        self._validate_port(src_node, src_port)
-        self._validate_port(dst_node, dst_port)
-
-        self._create_vlan(src_node, src_port, vlan_id)
-        self._api.add_vxlan_to_tunnel(
-            tunnel_name=src_tunnel,
-            vxlan_id=vlan_id,
-            hostid=src_node_id
-        )
-        self._validate_vxlan_add(src_node, vlan_id, src_tunnel)
-
-        self._create_vlan(dst_node, dst_port, vlan_id)
-        self._api.add_vxlan_to_tunnel(
-            tunnel_name=dst_tunnel,
-            vxlan_id=vlan_id,
-            hostid=dst_node_id
-        )
-        self._validate_vxlan_add(dst_node, vlan_id, dst_tunnel)
-
-        self._api.create_vles(
-            vle_name=vle_name,
-            node_1=src_node_id,
-            node_1_port=src_port,
-            node_2=dst_node_id,
-            node_2_port=dst_port
-        )
-        if not self._validate_is_vle_exists(vle_name):
-            raise PluribusApiException(
-                "VLE {} creation failed, see logs for more details".format(vle_name)
-            )
-
-    def map_bidi_single_node(self, node, src_port, dst_port, vlan_id, vle_name):
+                            dst_tunnel, vlan_id, vle_name, dst_api=None,
+                            plan_filter=None, completed=None, compensate=True):
+        """ Create BiDirectional connection on multiple nodes.
+
+        If dst_api is passed, the destination node is provisioned through it
+        concurrently with the source node. plan_filter selects the part of the
+        mapping plan to execute, keys of executed operations are added to
+        completed.
+        """
+        node_backends = {}
+        if dst_api:
+            node_backends[dst_node] = RestMappingActions(
+                api=dst_api,
+                switch_mapping=self._switch_mapping,
+                logger=self._logger)
+        plan = MappingPlan.map_multi_node(src_node, dst_node, src_port, dst_port,
+                                          src_tunnel, dst_tunnel, vlan_id, vle_name)
+        if plan_filter:
+            plan = plan_filter(plan)
+        PlanExecutor(self, self._logger, node_backends).execute(plan, completed,
+                                                                compensate)
+
+    def map_bidi_warm_multi_node(self, src_node, dst_node, src_port, dst_port,
+                                 vlan_id, vle_name):
+        """ Create BiDirectional connection on VLAN prepared by warm_up. """
+        plan = MappingPlan.map_multi_node_warm(src_node, dst_node, src_port, dst_port,
+                                               vlan_id, vle_name)
+        PlanExecutor(self, self._logger).execute(plan, compensate=True)
+
+    def warm_up(self, src_node, dst_node, src_tunnel, dst_tunnel, vlan_id,
+                description):
+        """ Attach VLAN without ports to the tunnels between two nodes. """
+        plan = MappingPlan.warm_up(src_node, dst_node, src_tunnel, dst_tunnel, vlan_id,
+                                   description)
+        PlanExecutor(self, self._logger).execute(plan)
+
+    def map_bidi_single_node(self, node, src_port, dst_port, vlan_id, vle_name,
+                             plan_filter=None, completed=None, compensate=True):
         """ Create BiDirectional connection on single node. """
-        node_id = self._switch_mapping.get(node, "fabric")
-        self._validate_port(node, src_port)
-        self._validate_port(node, dst_port)
-        self._create_vlan(node, src_port, vlan_id)
-        self._add_to_vlan(node, dst_port, vlan_id)
-
-        self._api.create_vles(
-            vle_name=vle_name,
-            node_1=node_id,
-            node_1_port=src_port,
-            node_2=node_id,
-            node_2_port=dst_port
-        )
+        plan = MappingPlan.map_single_node(node, src_port, dst_port, vlan_id, vle_name)
+        if plan_filter:
+            plan = plan_filter(plan)
+        PlanExecutor(self, self._logger).execute(plan, completed, compensate)
 
-        if not self._validate_is_vle_exists(vle_name):
-            raise PluribusApiException(
-                "VLE {} creation failed, see logs for more details".format(vle_name)
-            )
+    def release_vlan(self, node, vlan_id):
+        """ Delete VLAN created for a mapping which has not been completed. """
+        PlanExecutor(self, self._logger).execute(MappingPlan.release_vlan(node, vlan_id))
 
     def delete_single_node_vle(self, node, vle_name, vlan_id):
         """ Delete VLE on single node. """
         if self._validate_is_vle_exists(vle_name):
-            self._api.delete_vles(vle_name=vle_name)
-            if self._validate_is_vle_exists(vle_name):
-                raise PluribusApiException(
-                    "Failed to delete VLE {}, see logs for more details".format(vle_name)
-                )
-
-            self._api.delete_vlan(
-                vlan_id=vlan_id,
-                hostid=self._switch_mapping.get(node, "fabric")
-            )
-
-            if self._validate_vlan_exists(node, vlan_id):
-                raise PluribusApiException(
-                    "Failed to delete vlan {} on node {}".format(vlan_id, node)
-                )
+            plan = MappingPlan.clear([node], vle_name, vlan_id)
+            PlanExecutor(self, self._logger).execute(plan)
 
     def delete_multi_node_vle(self, src_node, dst_node, vle_name, vlan_id):
         """ Delete VLE on multiple nodes. """
         if self._validate_is_vle_exists(vle_name):
-            self._api.delete_vles(vle_name=vle_name)
-            if self._validate_is_vle_exists(vle_name):
-                raise PluribusApiException(
-                    "Failed to delete VLE {}, see logs for more details".format(vle_name)
-                )
-
-            for node_name in [src_node, dst_node]:
-                if self._validate_vlan_exists(node_name, vlan_id):
-                    self._api.delete_vlan(
-                        vlan_id=vlan_id,
-                        hostid=self._switch_mapping.get(node_name, "fabric")
-                    )
-                    if self._validate_vlan_exists(node_name, vlan_id):
-                        raise PluribusApiException(
-                            "Failed to delete vlan {} on node {}".format(vlan_id, node_name)
-                        )
+            plan = MappingPlan.clear([src_node, dst_node], vle_name, vlan_id)
+            PlanExecutor(self, self._logger).execute(plan)
+
+    def delete_vle(self, vle_name):
+        """ Delete VLE only, its VLANs are left to delete_vle_vlans. """
+        if self._validate_is_vle_exists(vle_name):
+            self._delete_vle(vle_name)
+
+    def delete_vle_vlans(self, nodes, vle_name, vlan_id):
+        """ Delete VLANs of the deleted VLE. """
+        plan = MappingPlan.clear(nodes, vle_name, vlan_id).select(
+            lambda operation: operation.kind != Operation.DELETE_VLE)
+        PlanExecutor(self, self._logger).execute(plan)
 
     def connection_table(self):
         """ Build connection table. """
@@ -126,49 +125,87 @@ class RestMappingActions(object):
     def _create_vlan(self, node, port, vlan_id):
         """ Create VLAN. """
         self._remove_port_from_vlans(node, port)
-        self._validate_port_is_not_a_member(node, port)
 
         self._api.create_vlan(
             vlan_id=vlan_id,
             vxlan_id=vlan_id,
             port=port,
-            hostid=self._switch_mapping.get(node, "fabric")
+            hostid=self._switch_mapping.hostid(node)
+        )
+        self._port_vlan_index(node).set_vlan_ids(port, [vlan_id])
+
+    def _create_empty_vlan(self, node, vlan_id, description):
+        """ Create VLAN without ports. """
+        self._api.create_vlan(
+            vlan_id=vlan_id,
+            vxlan_id=vlan_id,
+            hostid=self._switch_mapping.hostid(node),
+            description=description
         )
-        self._validate_port_is_a_member(node, port, vlan_id)
 
     def _add_to_vlan(self, node, port, vlan_id):
         """ Add port to VLAN. """
         self._remove_port_from_vlans(node, port)
-        self._validate_port_is_not_a_member(node, port)
 
         self._api.add_ports_to_vlan(
             vlan_id=vlan_id,
             port=port,
-            hostid=self._switch_mapping.get(node, "fabric")
+            hostid=self._switch_mapping.hostid(node)
         )
-        self._validate_port_is_a_member(node, port, vlan_id)
+        self._port_vlan_index(node).set_vlan_ids(port, [vlan_id])
 
-    def _validate_port_is_not_a_member(self, node, port):
-        """  """
-        vlan_members = self.vlan_ids_for_port(node, port)
-        if vlan_members and len(set(vlan_members) - {1}) > 0:
-            raise PluribusApiException(
-                "Port {} already a member of vlan_id {}".format(
-                    (node, port),
-                    vlan_members)
-            )
+    def _remove_from_vlan(self, node, port, vlan_id):
+        """ Remove port from VLAN. """
+        self._api.remove_port_from_vlans(
+            port=port,
+            vlan_ids=str(vlan_id),
+            hostid=self._switch_mapping.hostid(node)
+        )
+        self._port_vlan_index(node).discard(port, vlan_id)
 
-    def _validate_port_is_a_member(self, node, port, vlan_id):
-        """  """
-        vlan_members = self.vlan_ids_for_port(node, port)
-        if not vlan_members or int(vlan_id) not in vlan_members:
-            raise PluribusApiException(
-                "Cannot add port {} to vlan {}".format((node, port), vlan_id)
+    def _add_vxlan(self, node, tunnel, vlan_id):
+        """ Add VXLAN to the tunnel. """
+        self._api.add_vxlan_to_tunnel(
+            tunnel_name=tunnel,
+            vxlan_id=vlan_id,
+            hostid=self._switch_mapping.hostid(node)
+        )
+
+    def _remove_vxlan(self, node, tunnel, vlan_id):
+        """ Remove VXLAN from the tunnel. """
+        self._api.remove_vxlan_from_tunnel(
+            tunnel_name=tunnel,
+            vxlan_id=vlan_id,
+            hostid=self._switch_mapping.hostid(node)
+        )
+
+    def _create_vle(self, vle_name, node_1, node_1_port, node_2, node_2_port):
+        """ Create VLE. """
+        self._api.create_vles(
+            vle_name=vle_name,
+            node_1=self._switch_mapping.hostid(node_1),
+            node_1_port=node_1_port,
+            node_2=self._switch_mapping.hostid(node_2),
+            node_2_port=node_2_port
+        )
+
+    def _delete_vle(self, vle_name):
+        """ Delete VLE. """
+        self._api.delete_vles(vle_name=vle_name)
+
+    def _delete_vlan(self, node, vlan_id):
+        """ Delete VLAN if it exists. """
+        if self._validate_vlan_exists(node, vlan_id):
+            self._api.delete_vlan(
+                vlan_id=vlan_id,
+                hostid=self._switch_mapping.hostid(node)
             )
+        if node in self._port_vlan_indexes:
+            self._port_vlan_indexes[node].remove_vlan(vlan_id)
 
     def _validate_vxlan_add(self, node_name, vxlan_id, tunnel):
         """ Validate VXLAN is exists. """
-        node_id = self._switch_mapping.get(node_name, "fabric")
+        node_id = self._switch_mapping.hostid(node_name)
         data = self._api.get_tunnel_vxlans(tunnel=tunnel, hostid=node_id)
 
         for vxlan in data:
@@ -190,9 +227,30 @@ class RestMappingActions(object):
 
         return False
 
+    def _validate_vle_creation(self, vle_name):
+        """ Validate VLE is created. """
+        if not self._validate_is_vle_exists(vle_name):
+            raise PluribusApiException(
+                "VLE {} creation failed, see logs for more details".format(vle_name)
+            )
+
+    def _validate_vle_deletion(self, vle_name):
+        """ Validate VLE is deleted. """
+        if self._validate_is_vle_exists(vle_name):
+            raise PluribusApiException(
+                "Failed to delete VLE {}, see logs for more details".format(vle_name)
+            )
+
+    def _validate_vlan_id_deletion(self, node_name, vlan_id):
+        """ Validate VLAN is deleted. """
+        if self._validate_vlan_exists(node_name, vlan_id):
+            raise PluribusApiException(
+                "Failed to delete vlan {} on node {}".format(vlan_id, node_name)
+            )
+
     def _validate_vlan_exists(self, node_name, vlan_id):
         """ Validate is VLAN deleted successfully. """
-        node_id = self._switch_mapping.get(node_name, "fabric")
+        node_id = self._switch_mapping.hostid(node_name)
         data = self._api.get_vlans(hostid=node_id)
         if data:
             for vlan in data:
@@ -202,48 +260,54 @@ class RestMappingActions(object):
 
     def vlan_ids_for_port(self, node, port):
         """ Get all VLANs for port. """
-        node_id = self._switch_mapping.get(node, "fabric")
-        data = self._api.get_port_vlan_info(port=port, hostid=node_id)
-
-        if data and data[0].get("vlans", ""):
-            return map(int, data[0].get("vlans", "").split(","))
+        return self._port_vlan_index(node).vlan_ids(port)
+
+    def _port_vlan_index(self, node):
+        """ Port to VLAN membership index of the node, loaded on first use. """
+        index = self._port_vlan_indexes.get(node)
+        if index is None:
+            node_id = self._switch_mapping.hostid(node)
+            data = self._api.get_ports_vlan_info(hostid=node_id)
+            index = PortVlanIndex(
+                {str(record.get("port")): parse_vlan_ids(record.get("vlans", ""))
+                 for record in data}
+            )
+            self._port_vlan_indexes[node] = index
+        return index
 
     def _validate_port(self, node_name, port):
         """ Validate port. """
-        node_id = self._switch_mapping.get(node_name, "fabric")
-        data = self._api.get_port_status(port=port, hostid=node_id)
-
-        if data:
-            status_data = data[0].get("status")
-            if status_data:
-                for status in status_data.split(","):
-                    if status.strip().lower() in FORBIDDEN_PORT_STATUS_TABLE:
-                        raise PluribusApiException(
-                            "Port {} is not allowed to use for VLE,"
-                            "it has status {}".format((node_name, port), status)
-                        )
-
-    def _remove_from_vlan(self, node_name, vlan_id, port):
-        """ Remove port from VLAN. """
-        node_id = self._switch_mapping.get(node_name, "fabric")
-        data = self._api.delete_ports_from_vlan(
-            vlan_id=vlan_id,
-            ports=port,
-            hostid=node_id
-        )
-
-        if "removed" not in data.lower():
+        statuses = self._port_status_table(node_name).get(str(port), frozenset())
+        forbidden_statuses = statuses & FORBIDDEN_PORT_STATUS_TABLE
+        if forbidden_statuses:
             raise PluribusApiException(
-                "Cannot remove port {} from VlanId {} on node {}".format(
-                    port,
-                    vlan_id,
-                    node_name
-                )
+                "Port {} is not allowed to use for VLE,"
+                "it has status {}".format((node_name, port),
+                                          ",".join(sorted(forbidden_statuses)))
             )
 
+    def _port_status_table(self, node):
+        """ Port to statuses table of the node, loaded on first use. """
+        table = self._port_status_tables.get(node)
+        if table is None:
+            node_id = self._switch_mapping.hostid(node)
+            data = self._api.get_ports_status(hostid=node_id)
+            table = {
+                str(record.get("port")): frozenset(
+                    status.strip().lower()
+                    for status in (record.get("status") or "").split(",")
+                ) for record in data
+            }
+            self._port_status_tables[node] = table
+        return table
+
     def _remove_port_from_vlans(self, node, port):
         """ Remove port from VLANs. """
         vlan_members = self.vlan_ids_for_port(node, port)
         if vlan_members is not None:
-            for vlan_id in vlan_members:
-                self._remove_from_vlan(node, vlan_id, port)
+            self._api.remove_port_from_vlans(
+                port=port,
+                vlan_ids=",".join(map(str, vlan_members)),
+                hostid=self._switch_mapping.hostid(node)
+            )
+            self._port_vlan_index(node).set_vlan_ids(port, [])
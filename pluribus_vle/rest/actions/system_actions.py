@@ -1,3 +1,6 @@
+from pluribus_vle.helpers.port_state import device_port_state, normalize_port_state
+
+
 class RestSystemActions(object):
     """ System actions. """
 
@@ -22,6 +25,11 @@ class RestSystemActions(object):
             self.__phys_to_logical_table = self._build_phys_to_logical_table()
         return self.__phys_to_logical_table
 
+    def phys_to_logical_table(self, node_id):
+        """ Get physical port name to logical port id table of the node. """
+        return {str(portmap["bezel-intf"]): str(portmap["port"])
+                for portmap in self._api.get_bezel_portmaps(hostid=node_id)}
+
     def _get_logical(self, phys_name):
         logical_id = self._phys_to_logical_table.get(phys_name)
         if logical_id:
@@ -43,19 +51,42 @@ class RestSystemActions(object):
             is_autoneg = True
         else:
             is_autoneg = False
-        self._api.set_autoneg(
-            port_id=logical_port_id,
-            hostid=node_id,
-            is_autoneg=is_autoneg
-        )
+        self.set_ports_auto_negotiation([logical_port_id], node_id, is_autoneg)
+
+    def set_ports_auto_negotiation(self, ports, node_id, is_autoneg):
+        """ Set auto-negotiation of list of logical ports.
+
+        port-configs/{port} takes a single port, one request is sent per port.
+        """
+        for port in ports:
+            self._api.set_autoneg(
+                port_id=port,
+                hostid=node_id,
+                is_autoneg=is_autoneg
+            )
 
     def set_port_state(self, port, node_id, port_state):
         """ Enable/Disable port. """
-        port_state = port_state.lower()
-        if port_state not in ["enable", "disable"]:
-            port_state = "enable"
+        port_state = normalize_port_state(port_state)
         self._api.set_port_state(port_id=port, hostid=node_id, port_state=port_state)
 
+    def set_ports_state(self, ports, node_id, port_state):
+        """ Enable/Disable list of ports on the node.
+
+        port-configs/{port} takes a single port, one request is sent per port.
+        """
+        for port in ports:
+            self.set_port_state(port, node_id, port_state)
+
+    def ports_state_table(self, node_id):
+        """ Port to current state table of the node, from port configs. """
+        table = {}
+        for record in self._api.get_port_config(hostid=node_id):
+            port_state = device_port_state(record.get("enable"))
+            if port_state is not None:
+                table[str(record.get("port"))] = port_state
+        return table
+
     def get_fabric_info(self):
         """ Get fabric information."""
         data = self._api.get_fabric_info()
@@ -82,14 +113,32 @@ class RestSystemActions(object):
                 tunnels_table[local_switch_name, remote_switch_name] = tunnel_name
         return tunnels_table
 
-    def get_available_vlan_id(self, min_vlan, max_vlan):
-        """ Get available VLAN. """
+    def busy_vlan_ids(self):
+        """ Get VLAN ids used on the fabric. """
         data = self._api.get_vlans()
-        busy_vlans = [int(vlan["id"]) for vlan in data]
-        available_vlan_ids = list(set(range(min_vlan, max_vlan + 1)) - set(busy_vlans))
-        if available_vlan_ids:
-            return available_vlan_ids[0]
-        raise Exception("Cannot determine available vlan id")
+        return [int(vlan["id"]) for vlan in data]
+
+    def vlans_table(self):
+        """ Get VLAN id to VXLAN id table of every node. """
+        vlans_table = {}
+        for vlan in self._api.get_vlans():
+            vlans_table.setdefault(vlan.get("api.switch-name"), {})[int(vlan["id"])] = \
+                int(vlan.get("vxlan") or 0)
+        return vlans_table
+
+    def vlan_ids_by_description(self, description):
+        """ Get ids of the VLANs with the description on every node. """
+        vlan_ids = {}
+        for vlan in self._api.get_vlans():
+            if vlan.get("description") == description:
+                vlan_ids.setdefault(vlan.get("api.switch-name"), set()).add(
+                    int(vlan["id"]))
+        return vlan_ids
+
+    def fabric_transactions(self, fabric_name):
+        """ Get last fabric transaction id of every node. """
+        data = self._api.get_fabric_nodes(fabric_name=fabric_name)
+        return {node["name"]: str(node.get("fab-tid", "")) for node in data}
 
     def get_switch_mapping(self):
         """ Get switch name to switch hostid mapping. """
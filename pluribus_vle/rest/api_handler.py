@@ -1,9 +1,16 @@
+import re
 import ssl
+import threading
+import time
 from abc import abstractmethod
 
 import requests
 import urllib3
 
+from pluribus_vle.helpers import deadline
+from pluribus_vle.helpers.request_stats import RequestStats
+from pluribus_vle.helpers.single_flight import SingleFlight
+
 
 class PluribusApiException(Exception):
     """Base vSphere API Exception."""
@@ -31,6 +38,8 @@ class PluribusApiNonFound(PluribusApiException):
 
 
 class BaseAPIClient:
+    NODE_PATTERN = re.compile(r"[?&]api\.switch=([^&]+)")
+
     def __init__(
             self,
             address,
@@ -38,15 +47,37 @@ class BaseAPIClient:
             password,
             scheme="http",
             port=80,
-            session=requests.Session(),
-            verify_ssl=ssl.CERT_NONE
+            session=None,
+            verify_ssl=ssl.CERT_NONE,
+            limiter=None,
+            reads=None,
+            session_auth=False,
+            session_cookie="JSESSIONID",
+            stats=None
     ):
+        """
+        :param limiter: requests limiter shared by the clients of the device
+        :type limiter: pluribus_vle.helpers.limiter.RequestLimiter
+        :param reads: GET requests in flight, shared by the clients of the device
+        :type reads: SingleFlight
+        :param session_auth: send credentials only until the device issues
+            a session cookie, and again once it expires
+        :param session_cookie: name of the vRest session cookie
+        :param stats: requests latency by authentication method
+        :type stats: RequestStats
+        """
         self.address = address
         self.username = username
         self.password = password
-        self.session = session
+        self.session = session or requests.Session()
         self.scheme = scheme
         self.port = port
+        self.limiter = limiter
+        self.reads = reads or SingleFlight()
+        self.session_auth = session_auth
+        self.session_cookie = session_cookie
+        self.stats = stats or RequestStats()
+        self._auth_lock = threading.Lock()
 
         self.session.verify = verify_ssl
         if self.username and self.password:
@@ -57,6 +88,22 @@ class BaseAPIClient:
     def _base_url(self):
         pass
 
+    def new_connection(self):
+        """ Create a client for the same device with its own HTTP session. """
+        return self.__class__(
+            address=self.address,
+            username=self.username,
+            password=self.password,
+            scheme=self.scheme,
+            port=self.port,
+            verify_ssl=self.session.verify,
+            limiter=self.limiter,
+            reads=self.reads,
+            session_auth=self.session_auth,
+            session_cookie=self.session_cookie,
+            stats=self.stats
+        )
+
     def _do_request(
         self,
         method,
@@ -69,7 +116,11 @@ class BaseAPIClient:
             http_error_map = {}
 
         url = "{base_url}/{path}".format(base_url=self._base_url(), path=path)
-        result = method(url=url, **kwargs)
+        renewable = self.session_auth and self.password and self.session.auth is None
+        result = self._do_limited_request(method, url, path, **kwargs)
+        if result.status_code == 401 and renewable:
+            self._renew_session()
+            result = self._do_limited_request(method, url, path, **kwargs)
         try:
             raise_for_status and result.raise_for_status()
         except requests.exceptions.HTTPError as caught_err:
@@ -78,29 +129,82 @@ class BaseAPIClient:
             raise err
         return result
 
+    def _do_limited_request(self, method, url, path, **kwargs):
+        """ Send the request within the limits, timeouts and 5xx responses
+        signal device overload to the limiter. """
+        if self.limiter is None:
+            return self._send(method, url, **kwargs)
+
+        match = self.NODE_PATTERN.search(path)
+        node = match.group(1) if match and match.group(1) != "fabric" else None
+        started = self.limiter.acquire(node)
+        overloaded = False
+        try:
+            result = self._send(method, url, **kwargs)
+            overloaded = result.status_code >= 500
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            overloaded = True
+            raise
+        finally:
+            self.limiter.release(started, overloaded)
+        return result
+
+    def _send(self, method, url, **kwargs):
+        auth = "basic" if self.session.auth else "session"
+        kwargs["timeout"] = deadline.bounded_timeout(kwargs.get("timeout"))
+        started = time.time()
+        result = method(url=url, **kwargs)
+        self.stats.record(auth, time.time() - started)
+        if self.session_auth and self.session.auth and result.ok and \
+                self.session_cookie in self.session.cookies:
+            # The device issued a session cookie, it replaces the credentials
+            self.session.auth = None
+        return result
+
+    def _renew_session(self):
+        """ Send credentials again, the session cookie is expired. """
+        with self._auth_lock:
+            if self.session.auth is None:
+                self.session.cookies.clear()
+                self.session.auth = (self.username, self.password)
+
     def _do_get(self, path, raise_for_status=True, http_error_map=None, **kwargs):
-        """Basic GET request client method."""
-        return self._do_request(
+        """Basic GET request client method.
+
+        Identical GET requests in flight are sent to the device once, unless
+        a write completed since the request in flight was sent.
+        """
+        return self.reads.do(
+            (path, raise_for_status), self._do_request,
             self.session.get, path, raise_for_status, http_error_map, **kwargs
         )
 
     def _do_post(self, path, raise_for_status=True, http_error_map=None, **kwargs):
         """Basic POST request client method."""
-        return self._do_request(
-            self.session.post, path, raise_for_status, http_error_map, **kwargs
-        )
+        try:
+            return self._do_request(
+                self.session.post, path, raise_for_status, http_error_map, **kwargs
+            )
+        finally:
+            self.reads.wrote()
 
     def _do_put(self, path, raise_for_status=True, http_error_map=None, **kwargs):
         """Basic PUT request client method."""
-        return self._do_request(
-            self.session.put, path, raise_for_status, http_error_map, **kwargs
-        )
+        try:
+            return self._do_request(
+                self.session.put, path, raise_for_status, http_error_map, **kwargs
+            )
+        finally:
+            self.reads.wrote()
 
     def _do_delete(self, path, raise_for_status=True, http_error_map=None, **kwargs):
         """Basic DELETE request client method."""
-        return self._do_request(
-            self.session.delete, path, raise_for_status, http_error_map, **kwargs
-        )
+        try:
+            return self._do_request(
+                self.session.delete, path, raise_for_status, http_error_map, **kwargs
+            )
+        finally:
+            self.reads.wrote()
 
 
 class PluribusRESTAPI(BaseAPIClient):
@@ -186,10 +290,15 @@ class PluribusRESTAPI(BaseAPIClient):
             )
 
     @Decorators.get_data
-    def get_port_config(self, hostid="fabric"):
+    def get_port_config(self, hostid="fabric", port=None):
 
+        if port is None:
+            path = "port-configs?api.switch={hostid}".format(hostid=hostid)
+        else:
+            path = "port-configs?port={port}&api.switch={hostid}".format(port=port,
+                                                                        hostid=hostid)
         return self._do_get(
-            path="port-configs?api.switch={hostid}".format(hostid=hostid),
+            path=path,
             http_error_map=self.ERROR_MAP
             )
 
@@ -256,15 +365,20 @@ class PluribusRESTAPI(BaseAPIClient):
             )
 
     @Decorators.get_result_msg
-    def create_vlan(self, vlan_id, vxlan_id, port, hostid="fabric"):
-
+    def create_vlan(self, vlan_id, vxlan_id, port=None, hostid="fabric",
+                    description=None):
+
+        json = {"id": vlan_id,
+                "scope": "local",
+                "vxlan-mode": "transparent",
+                "vxlan": vxlan_id}
+        if port is not None:
+            json["ports"] = port
+        if description is not None:
+            json["description"] = description
         return self._do_post(
             path="vlans?api.switch={hostid}".format(hostid=hostid),
-            json={"id": vlan_id,
-                  "scope": "local",
-                  "vxlan-mode": "transparent",
-                  "vxlan": vxlan_id,
-                  "ports": port},
+            json=json,
             http_error_map=self.ERROR_MAP
             )
 
@@ -330,6 +444,18 @@ class PluribusRESTAPI(BaseAPIClient):
             http_error_map=self.ERROR_MAP
             )
 
+    @Decorators.get_result_msg
+    def remove_vxlan_from_tunnel(self, tunnel_name, vxlan_id, hostid="fabric"):
+
+        return self._do_delete(
+            path="tunnels/{tunnel_name}/vxlans/{vxlan_id}?api.switch={hostid}".format(
+                tunnel_name=tunnel_name,
+                vxlan_id=vxlan_id,
+                hostid=hostid
+            ),
+            http_error_map=self.ERROR_MAP
+            )
+
     @Decorators.get_data
     def get_port_vlan_info(self, port, hostid="fabric"):
 
@@ -341,6 +467,24 @@ class PluribusRESTAPI(BaseAPIClient):
             http_error_map=self.ERROR_MAP
             )
 
+    @Decorators.get_data
+    def get_ports_vlan_info(self, hostid="fabric"):
+
+        return self._do_get(
+            path="port-vlans?api.switch={hostid}".format(hostid=hostid),
+            http_error_map=self.ERROR_MAP
+            )
+
+    @Decorators.get_result_msg
+    def remove_port_from_vlans(self, port, vlan_ids, hostid="fabric"):
+
+        return self._do_post(
+            path="port-vlans/remove?api.switch={hostid}".format(hostid=hostid),
+            json={"ports": port,
+                  "vlans": vlan_ids},
+            http_error_map=self.ERROR_MAP
+            )
+
     @Decorators.get_data
     def get_port_status(self, port, hostid="fabric"):
 
@@ -352,6 +496,16 @@ class PluribusRESTAPI(BaseAPIClient):
             http_error_map=self.ERROR_MAP
             )
 
+    @Decorators.get_data
+    def get_ports_status(self, hostid="fabric"):
+
+        return self._do_get(
+            path="ports?hide-connections=true&api.switch={hostid}".format(
+                hostid=hostid
+            ),
+            http_error_map=self.ERROR_MAP
+            )
+
     @Decorators.get_data
     def get_tunnel_info(self, hostid="fabric"):
 
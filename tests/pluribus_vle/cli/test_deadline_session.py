@@ -0,0 +1,56 @@
+import time
+from unittest import TestCase
+
+from pluribus_vle.cli.deadline_session import DeadlineSessionMixin
+from pluribus_vle.helpers import deadline
+
+
+class FakeSession(object):
+    def __init__(self, error=None):
+        self._timeout = 30
+        self._active = True
+        self._error = error
+        self.timeouts = []
+
+    def set_active(self, state):
+        self._active = state
+
+    def active(self):
+        return self._active
+
+    def _receive_all(self, timeout, logger):
+        self.timeouts.append(timeout)
+        if self._error:
+            raise self._error
+        return "output"
+
+
+class DeadlineSession(DeadlineSessionMixin, FakeSession):
+    pass
+
+
+class TestDeadlineSession(TestCase):
+    def test_timeout_is_bounded_by_deadline(self):
+        session = DeadlineSession()
+        with deadline.bound(time.time() + 10):
+            self.assertEqual(session._receive_all(None, None), "output")
+        self.assertLessEqual(session.timeouts[0], 10)
+        self.assertTrue(session.active())
+
+    def test_session_is_deactivated_when_deadline_is_exceeded(self):
+        session = DeadlineSession()
+        with deadline.bound(time.time() - 1):
+            self.assertRaises(deadline.DeadlineExceeded, session._receive_all, 5, None)
+        self.assertFalse(session.active())
+
+    def test_session_timed_out_by_deadline_is_deactivated(self):
+        session = DeadlineSession(Exception("Socket closed by timeout"))
+        with deadline.bound(time.time() + 1):
+            self.assertRaises(Exception, session._receive_all, 5, None)
+        self.assertFalse(session.active())
+
+    def test_session_timed_out_by_its_timeout_stays_active(self):
+        session = DeadlineSession(Exception("Socket closed by timeout"))
+        with deadline.bound(time.time() + 10):
+            self.assertRaises(Exception, session._receive_all, 5, None)
+        self.assertTrue(session.active())
@@ -0,0 +1,291 @@
+from collections import OrderedDict
+
+from pluribus_vle.helpers.port_vlan_index import parse_vlan_ids
+from pluribus_vle.rest.api_handler import PluribusApiException
+
+
+class FakeRuntimeConfig(object):
+    """ Runtime configuration with the given keys, defaults for the others. """
+
+    def __init__(self, values=None):
+        self._values = values or {}
+
+    def read_key(self, key, default=None):
+        return self._values.get(key, default)
+
+
+class FakeFabric(object):
+    """ In-memory Pluribus fabric served through the PluribusRESTAPI methods.
+
+    Writes bump the transaction id of the switch and are recorded in writes;
+    fail() makes the next calls of a method raise PluribusApiException.
+    """
+
+    def __init__(self, name="fabric-1"):
+        self.name = name
+        self.hostids = OrderedDict()
+        self.models = {}
+        self.ips = {}
+        self.ports = {}
+        self.vlans = {}
+        self.tunnels = OrderedDict()
+        self.vles = OrderedDict()
+        self.transactions = {}
+        self.bezel_portmaps = {}
+        self.writes = []
+        self.reads = []
+        self._failures = {}
+
+    def add_switch(self, name, hostid, ports=4, model="F64"):
+        self.hostids[name] = hostid
+        self.models[name] = model
+        self.ips[name] = "10.0.0.{}".format(len(self.ips) + 1)
+        self.transactions[name] = 0
+        for port in range(1, ports + 1):
+            self.ports[name, port] = {"speed": 10000, "autoneg": "on",
+                                      "enable": "enable", "status": "up"}
+
+    def connect(self, switch_1, switch_2):
+        """ Create the tunnels between two switches. """
+        for local, remote in [(switch_1, switch_2), (switch_2, switch_1)]:
+            self.tunnels[local, "{0}-to-{1}".format(local, remote)] = {
+                "local-ip": self.ips[local], "remote-ip": self.ips[remote],
+                "vxlans": set()}
+
+    def disconnect(self, switch_1, switch_2):
+        for local, remote in [(switch_1, switch_2), (switch_2, switch_1)]:
+            del self.tunnels[local, "{0}-to-{1}".format(local, remote)]
+
+    def fail(self, method, error=None):
+        self._failures[method] = error or PluribusApiException(
+            "{} failed".format(method))
+
+    def recover(self, method):
+        self._failures.pop(method, None)
+
+    def vlan_ports(self, switch, vlan_id):
+        vlan = self.vlans.get((switch, vlan_id))
+        return None if vlan is None else sorted(vlan["ports"])
+
+    def tunnel_vxlans(self, switch):
+        vxlans = set()
+        for (local, _), tunnel in self.tunnels.items():
+            if local == switch:
+                vxlans |= tunnel["vxlans"]
+        return vxlans
+
+    def new_connection(self):
+        return self
+
+    def _switch(self, hostid):
+        for name, switch_hostid in self.hostids.items():
+            if switch_hostid == hostid:
+                return name
+        raise PluribusApiException("Unknown switch {}".format(hostid))
+
+    def _switches(self, hostid):
+        return list(self.hostids) if hostid == "fabric" else [self._switch(hostid)]
+
+    def _read(self, method):
+        self._check(method)
+        self.reads.append(method)
+
+    def _write(self, method, switch, *args):
+        self._check(method)
+        self.writes.append((method, switch) + args)
+        if switch is not None:
+            self.transactions[switch] += 1
+
+    def _check(self, method):
+        error = self._failures.get(method)
+        if error is not None:
+            raise error
+
+    def _tunnel(self, switch, tunnel_name):
+        tunnel = self.tunnels.get((switch, tunnel_name))
+        if tunnel is None:
+            raise PluribusApiException("Unknown tunnel {}".format(tunnel_name))
+        return tunnel
+
+    # Fabric
+
+    def get_fabric_info(self):
+        self._read("get_fabric_info")
+        return [{"name": self.name, "id": self.name + "-id"}]
+
+    def get_fabric_nodes(self, fabric_name):
+        self._read("get_fabric_nodes")
+        return [{"name": name, "id": hostid, "fab-tid": self.transactions[name]}
+                for name, hostid in self.hostids.items()]
+
+    def get_switch_setup(self, fabric=False):
+        self._read("get_switch_setup")
+        return [{"switch-name": name, "hostid": hostid}
+                for name, hostid in self.hostids.items()]
+
+    def get_switch_info(self, hostid="fabric"):
+        self._read("get_switch_info")
+        return [{"model": self.models[switch], "chassis-serial": switch + "-serial"}
+                for switch in self._switches(hostid)]
+
+    def get_tunnel_info(self, hostid="fabric"):
+        self._read("get_tunnel_info")
+        return [{"api.switch-name": local, "name": name,
+                 "local-ip": tunnel["local-ip"], "remote-ip": tunnel["remote-ip"]}
+                for (local, name), tunnel in self.tunnels.items()]
+
+    def get_phy_to_logical(self):
+        self._read("get_phy_to_logical")
+        return [{"bezel-intf": phys, "port": port}
+                for switch in self.hostids
+                for phys, port in sorted(self.bezel_portmaps.get(switch, {}).items())]
+
+    def get_bezel_portmaps(self, hostid="fabric"):
+        self._read("get_bezel_portmaps")
+        return [{"bezel-intf": phys, "port": port}
+                for switch in self._switches(hostid)
+                for phys, port in sorted(self.bezel_portmaps.get(switch, {}).items())]
+
+    # Ports
+
+    def get_port_config(self, hostid="fabric", port=None):
+        self._read("get_port_config")
+        return [{"port": port_id, "speed": config["speed"],
+                 "autoneg": config["autoneg"], "enable": config["enable"]}
+                for (switch, port_id), config in sorted(self.ports.items())
+                if switch in self._switches(hostid) and
+                (port is None or str(port_id) == str(port))]
+
+    def get_ports_status(self, hostid="fabric"):
+        self._read("get_ports_status")
+        return [{"port": port_id, "status": config["status"],
+                 "api.switch-name": switch}
+                for (switch, port_id), config in sorted(self.ports.items())
+                if switch in self._switches(hostid)]
+
+    def set_port_state(self, port_id, hostid, port_state="enable"):
+        switch = self._switch(hostid)
+        self._write("set_port_state", switch, int(port_id), port_state)
+        self.ports[switch, int(port_id)]["enable"] = port_state
+        return "Success"
+
+    def set_autoneg(self, port_id, hostid, is_autoneg=True):
+        switch = self._switch(hostid)
+        self._write("set_autoneg", switch, int(port_id), is_autoneg)
+        self.ports[switch, int(port_id)]["autoneg"] = "on" if is_autoneg else "off"
+        return "Success"
+
+    # VLANs
+
+    def get_vlans(self, hostid="fabric"):
+        self._read("get_vlans")
+        switches = self._switches(hostid)
+        return [{"id": vlan_id, "vxlan": vlan["vxlan"],
+                 "description": vlan["description"], "api.switch-name": switch}
+                for (switch, vlan_id), vlan in sorted(self.vlans.items())
+                if switch in switches]
+
+    def get_ports_vlan_info(self, hostid="fabric"):
+        self._read("get_ports_vlan_info")
+        switch = self._switch(hostid)
+        return [{"port": port_id,
+                 "vlans": ",".join(str(vlan_id) for (vlan_switch, vlan_id), vlan
+                                   in sorted(self.vlans.items())
+                                   if vlan_switch == switch and
+                                   port_id in vlan["ports"]) or "none"}
+                for (port_switch, port_id) in sorted(self.ports)
+                if port_switch == switch]
+
+    def create_vlan(self, vlan_id, vxlan_id, port=None, hostid="fabric",
+                    description=None):
+        switch = self._switch(hostid)
+        self._write("create_vlan", switch, vlan_id, port)
+        if (switch, vlan_id) in self.vlans:
+            raise PluribusApiException("Vlan {} exists".format(vlan_id))
+        self.vlans[switch, vlan_id] = {
+            "vxlan": vxlan_id, "description": description,
+            "ports": set() if port is None else {int(port)}}
+        return "Success"
+
+    def delete_vlan(self, vlan_id, hostid="fabric"):
+        switch = self._switch(hostid)
+        self._write("delete_vlan", switch, vlan_id)
+        vlan = self.vlans.pop((switch, vlan_id), None)
+        if vlan is None:
+            raise PluribusApiException("Vlan {} does not exist".format(vlan_id))
+        for (local, _), tunnel in self.tunnels.items():
+            if local == switch:
+                tunnel["vxlans"].discard(vlan["vxlan"])
+        return "Success"
+
+    def add_ports_to_vlan(self, vlan_id, port, hostid="fabric"):
+        switch = self._switch(hostid)
+        self._write("add_ports_to_vlan", switch, vlan_id, port)
+        if (switch, vlan_id) not in self.vlans:
+            raise PluribusApiException("Vlan {} does not exist".format(vlan_id))
+        self.vlans[switch, vlan_id]["ports"].add(int(port))
+        return "Success"
+
+    def remove_port_from_vlans(self, port, vlan_ids, hostid="fabric"):
+        switch = self._switch(hostid)
+        self._write("remove_port_from_vlans", switch, port, vlan_ids)
+        for vlan_id in parse_vlan_ids(str(vlan_ids)):
+            vlan = self.vlans.get((switch, vlan_id))
+            if vlan is not None:
+                vlan["ports"].discard(int(port))
+        return "Success"
+
+    # Tunnels
+
+    def add_vxlan_to_tunnel(self, tunnel_name, vxlan_id, hostid="fabric"):
+        switch = self._switch(hostid)
+        self._write("add_vxlan_to_tunnel", switch, tunnel_name, vxlan_id)
+        self._tunnel(switch, tunnel_name)["vxlans"].add(vxlan_id)
+        return "Success"
+
+    def remove_vxlan_from_tunnel(self, tunnel_name, vxlan_id, hostid="fabric"):
+        switch = self._switch(hostid)
+        self._write("remove_vxlan_from_tunnel", switch, tunnel_name, vxlan_id)
+        self._tunnel(switch, tunnel_name)["vxlans"].discard(vxlan_id)
+        return "Success"
+
+    def get_tunnel_vxlans(self, tunnel, hostid="fabric"):
+        self._read("get_tunnel_vxlans")
+        return [{"vxlan": vxlan} for vxlan
+                in sorted(self._tunnel(self._switch(hostid), tunnel)["vxlans"])]
+
+    # VLEs
+
+    def get_vles(self):
+        self._read("get_vles")
+        return list(self.vles.values())
+
+    def create_vles(self, vle_name, node_1, node_2, node_1_port, node_2_port):
+        self._write("create_vles", None, vle_name)
+        if vle_name in self.vles:
+            raise PluribusApiException("VLE {} exists".format(vle_name))
+        self.vles[vle_name] = {"name": vle_name,
+                               "node1-name": self._switch(node_1),
+                               "node2-name": self._switch(node_2),
+                               "node-1-port": int(node_1_port),
+                               "node-2-port": int(node_2_port)}
+        return "Success"
+
+    def delete_vles(self, vle_name):
+        self._write("delete_vles", None, vle_name)
+        if self.vles.pop(vle_name, None) is None:
+            raise PluribusApiException("VLE {} does not exist".format(vle_name))
+
+    def add_vle(self, vle_name, switch_1, port_1, switch_2, port_2, vlan_id):
+        """ Create a connection as if made by another driver process. """
+        for switch, port in [(switch_1, port_1), (switch_2, port_2)]:
+            self.vlans.setdefault((switch, vlan_id), {
+                "vxlan": vlan_id, "description": None, "ports": set()}
+            )["ports"].add(port)
+        if switch_1 != switch_2:
+            for (local, _), tunnel in self.tunnels.items():
+                if local in (switch_1, switch_2):
+                    tunnel["vxlans"].add(vlan_id)
+        self.vles[vle_name] = {"name": vle_name,
+                               "node1-name": switch_1, "node2-name": switch_2,
+                               "node-1-port": port_1, "node-2-port": port_2}
@@ -0,0 +1,61 @@
+from unittest import TestCase
+
+from pluribus_vle.helpers.attribute_snapshot import AttributeSnapshot
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAttributeSnapshot(TestCase):
+    NODES = {"leaf-1": {"model": "S4048", "chassis-serial": "SN1"}}
+    PORTS = {"leaf-1": {21: {"speed": "10g", "autoneg": "on"}}}
+
+    def setUp(self):
+        self._clock = FakeClock()
+        self._snapshot = AttributeSnapshot(clock=self._clock)
+        self._snapshot.update("10.0.0.1", "fabric-1", "0x1", self.NODES, self.PORTS)
+
+    def test_resource_attributes(self):
+        self.assertEqual(self._snapshot.get("10.0.0.1")["Serial Number"], "0x1")
+        self.assertEqual(self._snapshot.get("10.0.0.1/leaf-1")["Serial Number"], "SN1")
+        self.assertEqual(self._snapshot.get("10.0.0.1/leaf-1/21"), {
+            "Model Name": "S4048 Port",
+            "Serial Number": "NA",
+            "Port Speed": "10g",
+            "Auto Negotiation": "True",
+        })
+
+    def test_unknown_resource(self):
+        self.assertIsNone(self._snapshot.get("10.0.0.1/leaf-1/22"))
+
+    def test_max_age(self):
+        self._clock.now += 60
+        self.assertIsNone(self._snapshot.get("10.0.0.1/leaf-1/21", max_age=30))
+        attributes = self._snapshot.update_port("10.0.0.1", "leaf-1", "21",
+                                                {"speed": "25g", "autoneg": "off"})
+        self.assertEqual(attributes["Port Speed"], "25g")
+        self.assertEqual(self._snapshot.get("10.0.0.1/leaf-1/21", max_age=30),
+                         attributes)
+
+    def test_port_model_of_unknown_node_is_not_known(self):
+        attributes = self._snapshot.update_port("10.0.0.1", "leaf-2", "21",
+                                                {"speed": "25g", "autoneg": "off"})
+        self.assertIsNone(attributes["Model Name"])
+
+    def test_node_update_replaces_its_ports(self):
+        self._snapshot.update("10.0.0.1", "fabric-1", "0x1", self.NODES,
+                              {"leaf-1": {22: {"speed": "10g", "autoneg": "on"}}})
+        self.assertIsNone(self._snapshot.get("10.0.0.1/leaf-1/21"))
+        self.assertIsNotNone(self._snapshot.get("10.0.0.1/leaf-1/22"))
+
+    def test_set_attribute(self):
+        self._snapshot.set_attribute("10.0.0.1/leaf-1/21", "Auto Negotiation", "False")
+        self._snapshot.set_attribute("10.0.0.1/leaf-1/22", "Auto Negotiation", "False")
+        self.assertEqual(
+            self._snapshot.get("10.0.0.1/leaf-1/21")["Auto Negotiation"], "False")
+        self.assertIsNone(self._snapshot.get("10.0.0.1/leaf-1/22"))
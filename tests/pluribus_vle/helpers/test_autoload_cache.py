@@ -0,0 +1,69 @@
+from unittest import TestCase
+
+from pluribus_vle.helpers.autoload_cache import AutoloadCache
+
+
+class FakeAutoload(object):
+    def __init__(self, associations_table):
+        self.associations_table = associations_table
+        self.structure = None
+
+    def build_structure(self):
+        self.structure = [dict(self.associations_table)]
+        return self.structure
+
+    def patch_mappings(self, associations_table):
+        if any(associations_table.get(port) != peer
+               for port, peer in self.associations_table.items()):
+            return None
+        if associations_table != self.associations_table:
+            self.structure = [dict(associations_table)]
+        self.associations_table = associations_table
+        return self.structure
+
+
+class TestAutoloadCache(TestCase):
+    NODES = {"leaf-1": {"model": "S4048", "chassis-serial": "1"}}
+    PORTS = {"leaf-1": {1: {"speed": "10g", "autoneg": "off"},
+                        2: {"speed": "10g", "autoneg": "off"}}}
+
+    def setUp(self):
+        self._cache = AutoloadCache()
+        self._builds = []
+
+    def _structure(self, associations_table, ports_table=None, state=None):
+        def build():
+            self._builds.append(associations_table)
+            return FakeAutoload(associations_table)
+        return self._cache.structure("10.0.0.1", self.NODES, ports_table or self.PORTS,
+                                     associations_table, build, state)
+
+    def test_same_topology_is_reused(self):
+        structure = self._structure({})
+        self.assertIs(self._structure({}), structure)
+        self.assertEqual(len(self._builds), 1)
+
+    def test_added_mapping_is_patched(self):
+        structure = self._structure({})
+        mapped = {("leaf-1", 1): ("leaf-1", 2), ("leaf-1", 2): ("leaf-1", 1)}
+        patched = self._structure(mapped, state="0b")
+        self.assertEqual(patched, [mapped])
+        self.assertEqual(structure, [{}])
+        self.assertIs(self._cache.lookup("10.0.0.1", "0b"), patched)
+        self.assertEqual(self._cache.metrics, {"hits": 1, "reuses": 1, "builds": 1})
+
+    def test_removed_mapping_rebuilds(self):
+        self._structure({("leaf-1", 1): ("leaf-1", 2), ("leaf-1", 2): ("leaf-1", 1)})
+        self._structure({})
+        self.assertEqual(len(self._builds), 2)
+
+    def test_port_config_change_rebuilds(self):
+        self._structure({})
+        self._structure({}, {"leaf-1": {1: {"speed": "25g", "autoneg": "off"}}})
+        self.assertEqual(len(self._builds), 2)
+
+    def test_lookup_by_state(self):
+        structure = self._structure({}, state="0a")
+        self.assertIs(self._cache.lookup("10.0.0.1", "0a"), structure)
+        self.assertIsNone(self._cache.lookup("10.0.0.1", "0b"))
+        self.assertIsNone(self._cache.lookup("10.0.0.1", None))
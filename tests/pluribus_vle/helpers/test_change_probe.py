@@ -0,0 +1,67 @@
+from unittest import TestCase
+
+from pluribus_vle.helpers.change_probe import ChangeProbe
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeFabric(object):
+    def __init__(self):
+        self.state = "a"
+        self.reads = 0
+
+    def __call__(self):
+        self.reads += 1
+        return self.state
+
+
+class TestChangeProbe(TestCase):
+    def setUp(self):
+        self._clock = FakeClock()
+        self._fabric = FakeFabric()
+        self._changes = []
+        self._probe = ChangeProbe(self._fabric, min_interval=5, clock=self._clock)
+        self._probe.subscribe(lambda: self._changes.append(self._fabric.state))
+
+    def test_first_read_is_not_a_change(self):
+        self.assertEqual(self._probe.check(), "a")
+        self.assertEqual(self._changes, [])
+
+    def test_forced_check_ignores_min_interval(self):
+        self._probe.check()
+        self._fabric.state = "b"
+        self.assertEqual(self._probe.check(), "a")
+        self.assertEqual(self._probe.check(force=True), "b")
+        self.assertEqual(self._changes, ["b"])
+
+    def test_change_notifies_listeners(self):
+        self._probe.check()
+        self._fabric.state = "b"
+        self._clock.now += 5
+        self.assertEqual(self._probe.check(), "b")
+        self.assertEqual(self._changes, ["b"])
+        self._clock.now += 5
+        self._probe.check()
+        self.assertEqual(self._changes, ["b"])
+
+    def test_result_is_reused_within_interval(self):
+        self._probe.check()
+        self._fabric.state = "b"
+        self._clock.now += 4
+        self.assertEqual(self._probe.check(), "a")
+        self.assertEqual(self._fabric.reads, 1)
+
+    def test_rebase_does_not_notify_listeners(self):
+        self._probe.check()
+        self._fabric.state = "b"
+        self.assertEqual(self._probe.rebase(), ("a", "b"))
+        self.assertEqual(self._probe.check(), "b")
+        self._clock.now += 5
+        self.assertEqual(self._probe.check(), "b")
+        self.assertEqual(self._changes, [])
@@ -0,0 +1,50 @@
+import time
+from unittest import TestCase
+
+from pluribus_vle.helpers import deadline
+from pluribus_vle.helpers.concurrency import Slots, run_in_parallel
+
+
+class TestDeadline(TestCase):
+    def test_unlimited(self):
+        self.assertIsNone(deadline.remaining())
+        self.assertEqual(deadline.bounded_timeout(30), 30)
+        deadline.check("step")
+
+    def test_nested_deadline_is_not_extended(self):
+        with deadline.bound(time.time() + 10):
+            with deadline.bound(time.time() + 100):
+                self.assertLessEqual(deadline.remaining(), 10)
+            with deadline.bound(None):
+                self.assertLessEqual(deadline.remaining(), 10)
+        self.assertIsNone(deadline.current())
+
+    def test_timeouts_are_bounded(self):
+        with deadline.bound(time.time() + 10):
+            self.assertLessEqual(deadline.bounded_timeout(None), 10)
+            self.assertEqual(deadline.bounded_timeout(1), 1)
+
+    def test_exceeded(self):
+        with deadline.bound(time.time() - 1):
+            self.assertRaises(deadline.DeadlineExceeded, deadline.check, "step")
+            self.assertRaises(deadline.DeadlineExceeded, deadline.bounded_timeout, 1)
+            with deadline.suspended():
+                deadline.check("cleanup")
+
+    def test_deadline_is_passed_to_parallel_tasks(self):
+        with deadline.bound(time.time() + 10):
+            expected = deadline.current()
+            self.assertEqual(run_in_parallel(deadline.current, deadline.current),
+                             [expected, expected])
+
+    def test_slots_wait_within_deadline(self):
+        slots = Slots(1)
+
+        def take_slot():
+            with slots.slot():
+                pass
+
+        with slots.slot():
+            with deadline.bound(time.time() + 0.05):
+                self.assertRaises(deadline.DeadlineExceeded, take_slot)
+        take_slot()
@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pluribus_vle.helpers.ledger import MappingLedger
+
+
+class TestMappingLedger(TestCase):
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._path = os.path.join(self._directory, "ledger.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_lookup_by_both_ports(self):
+        ledger = MappingLedger()
+        ledger.add("QSVLE-100", 100, ("n1", "1"), ("n2", "2"), ("t1", "t2"))
+        entry = ledger.lookup("n2", "2")
+        self.assertEqual(entry.vle_name, "QSVLE-100")
+        self.assertEqual(entry.peer("n2", "2"), ("n1", "1"))
+        self.assertIs(ledger.lookup("n1", "1"), entry)
+        ledger.remove("QSVLE-100")
+        self.assertIsNone(ledger.lookup("n1", "1"))
+
+    def test_remapped_port_replaces_entry(self):
+        ledger = MappingLedger()
+        ledger.add("QSVLE-100", 100, ("n1", "1"), ("n2", "2"))
+        ledger.add("QSVLE-101", 101, ("n1", "1"), ("n2", "3"))
+        self.assertIsNone(ledger.lookup("n2", "2"))
+        self.assertEqual(ledger.lookup("n1", "1").vlan_id, 101)
+
+    def test_invalidated_entries_are_unverified(self):
+        ledger = MappingLedger()
+        ledger.add("QSVLE-100", 100, ("n1", "1"), ("n2", "2"))
+        ledger.invalidate()
+        self.assertFalse(ledger.lookup("n2", "2").verified)
+
+    def test_entries_are_replayed_unverified(self):
+        ledger = MappingLedger(self._path)
+        ledger.add("QSVLE-100", 100, ("n1", "1"), ("n2", "2"))
+        ledger.add("QSVLE-101", 101, ("n1", "3"), ("n1", "4"))
+        ledger.remove("QSVLE-100")
+        entry = MappingLedger(self._path).lookup("n1", "4")
+        self.assertEqual(entry.peer("n1", "4"), ("n1", "3"))
+        self.assertFalse(entry.verified)
+        self.assertIsNone(MappingLedger(self._path).lookup("n1", "1"))
+
+    def test_journal_is_compacted(self):
+        ledger = MappingLedger(self._path, compact_threshold=2)
+        for vlan_id in range(100, 105):
+            ledger.add("QSVLE-{}".format(vlan_id), vlan_id, ("n1", "1"), ("n1", "2"))
+        with open(self._path) as ledger_file:
+            self.assertLessEqual(len(ledger_file.readlines()), 3)
+        self.assertEqual(MappingLedger(self._path).lookup("n1", "1").vlan_id, 104)
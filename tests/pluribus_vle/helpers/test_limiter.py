@@ -0,0 +1,78 @@
+from unittest import TestCase
+
+from pluribus_vle.helpers.limiter import AdaptiveLimiter, RequestLimiter, TokenBucket
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestAdaptiveLimiter(TestCase):
+    def setUp(self):
+        self._clock = FakeClock()
+        self._limiter = AdaptiveLimiter(initial_limit=2, min_limit=1, max_limit=4,
+                                        clock=self._clock)
+
+    def _request(self, latency, overloaded=False):
+        started = self._limiter.acquire()
+        self._clock.now += latency
+        self._limiter.release(started, overloaded)
+
+    def test_limit_grows_while_latency_is_stable(self):
+        for _ in range(4):
+            self._request(0.1)
+        self.assertEqual(self._limiter.limit, 3)
+
+    def test_limit_is_capped(self):
+        for _ in range(100):
+            self._request(0.1)
+        self.assertEqual(self._limiter.limit, 4)
+
+    def test_limit_does_not_grow_with_latency(self):
+        self._request(0.1)
+        limit = self._limiter.limit
+        for _ in range(4):
+            self._request(1)
+        self.assertEqual(self._limiter.limit, limit)
+
+    def test_overload_halves_limit(self):
+        for _ in range(100):
+            self._request(0.1)
+        self._request(0.1, overloaded=True)
+        self.assertEqual(self._limiter.limit, 2)
+        self._request(0.1, overloaded=True)
+        self._request(0.1, overloaded=True)
+        self.assertEqual(self._limiter.limit, 1)
+
+
+class TestTokenBucket(TestCase):
+    def test_burst_then_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, burst=3, clock=clock, sleep=clock.sleep)
+        started = clock.now
+        for _ in range(3):
+            bucket.take()
+        self.assertEqual(clock.now, started)
+        bucket.take()
+        bucket.take()
+        self.assertAlmostEqual(clock.now - started, 1.0)
+
+
+class TestRequestLimiter(TestCase):
+    def test_nodes_have_own_buckets(self):
+        limiter = RequestLimiter(AdaptiveLimiter(1, 1, 1), node_rate=1, node_burst=1)
+        limiter.release(limiter.acquire("node-1"))
+        limiter.release(limiter.acquire("node-2"))
+        self.assertEqual(sorted(limiter._buckets), ["node-1", "node-2"])
+
+    def test_fabric_requests_are_not_rate_limited(self):
+        limiter = RequestLimiter(AdaptiveLimiter(1, 1, 1), node_rate=1, node_burst=1)
+        limiter.release(limiter.acquire())
+        self.assertEqual(limiter._buckets, {})
@@ -0,0 +1,167 @@
+import threading
+from unittest import TestCase
+
+from pluribus_vle.helpers.mapping_plan import MappingPlan, Operation, PlanBackend, \
+    PlanExecutor
+
+
+class FakeLogger(object):
+    def debug(self, message):
+        pass
+
+    def warning(self, message):
+        pass
+
+    def exception(self, message):
+        pass
+
+
+class RecordingBackend(PlanBackend):
+    OPERATION_HANDLERS = {kind: "_record" for kind in [
+        Operation.VALIDATE_PORT, Operation.CREATE_VLAN, Operation.ADD_PORT,
+        Operation.REMOVE_PORT, Operation.REMOVE_VXLAN, Operation.CREATE_EMPTY_VLAN, Operation.ADD_VXLAN, Operation.VERIFY_VXLAN,
+        Operation.CREATE_VLE, Operation.VERIFY_VLE, Operation.DELETE_VLE,
+        Operation.VERIFY_VLE_DELETED, Operation.DELETE_VLAN,
+        Operation.VERIFY_VLAN_DELETED]}
+
+    def __init__(self, journal, fail_on=None):
+        self._journal = journal
+        self._fail_on = fail_on
+
+    def _record(self, *args):
+        if args == self._fail_on:
+            raise Exception("Failed", args)
+        self._journal.append(args)
+
+
+class ConcurrentBackend(RecordingBackend):
+    CONCURRENT = True
+
+    def __init__(self, journal, fail_on=None):
+        super(ConcurrentBackend, self).__init__(journal, fail_on)
+        self.threads = {}
+
+    def _record(self, *args):
+        super(ConcurrentBackend, self)._record(*args)
+        self.threads[args] = threading.current_thread()
+
+
+class TestMappingPlan(TestCase):
+    def test_identical_reads_are_coalesced(self):
+        plan = MappingPlan("test")
+        first = plan.add(Operation.VALIDATE_PORT, "node", ("node", "1"))
+        second = plan.add(Operation.VALIDATE_PORT, "node", ("node", "1"))
+        self.assertIs(first, second)
+        self.assertEqual(len(plan.operations), 1)
+
+    def test_duplicate_write_is_rejected(self):
+        plan = MappingPlan("test")
+        plan.add(Operation.DELETE_VLE, None, ("vle",))
+        self.assertRaises(ValueError, plan.add, Operation.DELETE_VLE, None, ("vle",))
+
+    def test_clear_deduplicates_nodes(self):
+        plan = MappingPlan.clear(["node", "node"], "QSVLE-100", 100)
+        kinds = [operation.kind for operation in plan.operations]
+        self.assertEqual(kinds.count(Operation.DELETE_VLAN), 1)
+
+    def test_warm_mapping_only_adds_ports(self):
+        warm_up = MappingPlan.warm_up("src", "dst", "t1", "t2", 100, "QSVLE-WARM")
+        self.assertEqual(set(operation.node for operation in warm_up.operations),
+                         {"src", "dst"})
+        plan = MappingPlan.map_multi_node_warm("src", "dst", "1", "2", 100,
+                                               "QSVLE-100")
+        kinds = set(operation.kind for operation in plan.operations)
+        self.assertNotIn(Operation.ADD_VXLAN, kinds)
+        self.assertNotIn(Operation.CREATE_VLAN, kinds)
+
+    def test_select_drops_dependencies_on_dropped_operations(self):
+        plan = MappingPlan.map_multi_node("src", "dst", "1", "2", "t1", "t2", 100,
+                                          "QSVLE-100")
+        selected = plan.select(lambda operation: operation.node == "src")
+        self.assertEqual([operation.kind for operation in selected.operations],
+                         [Operation.VALIDATE_PORT, Operation.CREATE_VLAN,
+                          Operation.ADD_VXLAN, Operation.VERIFY_VXLAN])
+        create_vlan = selected.operations[1]
+        self.assertEqual([dependency.args for dependency in create_vlan.depends_on],
+                         [("src", "1")])
+
+
+class TestPlanExecutor(TestCase):
+    def test_single_backend_executes_in_plan_order(self):
+        journal = []
+        plan = MappingPlan.map_single_node("node", "1", "2", 100, "QSVLE-100")
+        PlanExecutor(RecordingBackend(journal), FakeLogger()).execute(plan)
+        self.assertEqual(journal, [operation.args for operation in plan.operations])
+
+    def test_node_backends_respect_dependencies(self):
+        journal = []
+        plan = MappingPlan.map_multi_node("src", "dst", "1", "2", "t1", "t2", 100,
+                                          "QSVLE-100")
+        PlanExecutor(RecordingBackend(journal), FakeLogger(),
+                     {"dst": RecordingBackend(journal)}).execute(plan)
+        self.assertEqual(len(journal), len(plan.operations))
+        for operation in plan.operations:
+            for dependency in operation.depends_on:
+                self.assertLess(journal.index(dependency.args),
+                                journal.index(operation.args))
+
+    def test_failure_stops_dependent_operations(self):
+        journal = []
+        plan = MappingPlan.map_multi_node("src", "dst", "1", "2", "t1", "t2", 100,
+                                          "QSVLE-100")
+        executor = PlanExecutor(RecordingBackend(journal), FakeLogger(),
+                                {"dst": RecordingBackend(journal, ("dst", "2"))})
+        self.assertRaises(Exception, executor.execute, plan)
+        self.assertNotIn(("QSVLE-100", "src", "1", "dst", "2"), journal)
+
+    def test_completed_operations_are_recorded(self):
+        completed = set()
+        plan = MappingPlan.map_single_node("node", "1", "2", 100, "QSVLE-100")
+        executor = PlanExecutor(RecordingBackend([], ("node", "2", 100)), FakeLogger())
+        self.assertRaises(Exception, executor.execute, plan, completed)
+        self.assertEqual(completed, {(Operation.VALIDATE_PORT, "node", ("node", "1")),
+                                     (Operation.VALIDATE_PORT, "node", ("node", "2")),
+                                     (Operation.CREATE_VLAN, "node", ("node", "1", 100))})
+
+    def test_failure_is_compensated(self):
+        journal = []
+        plan = MappingPlan.map_multi_node("src", "dst", "1", "2", "t1", "t2", 100,
+                                          "QSVLE-100")
+        executor = PlanExecutor(RecordingBackend(journal, ("dst", 100, "t2")),
+                                FakeLogger())
+        self.assertRaises(Exception, executor.execute, plan, compensate=True)
+        self.assertEqual(journal[-4:], [("dst", "t2", 100), ("src", "t1", 100),
+                                        ("dst", 100), ("src", 100)])
+
+    def test_rollback_runs_nodes_in_parallel_on_concurrent_backend(self):
+        journal = []
+        backend = ConcurrentBackend(journal, ("dst", 100, "t2"))
+        plan = MappingPlan.map_multi_node("src", "dst", "1", "2", "t1", "t2", 100,
+                                          "QSVLE-100")
+        executor = PlanExecutor(backend, FakeLogger())
+        self.assertRaises(Exception, executor.execute, plan, compensate=True)
+        self.assertIn(("dst", 100), journal)
+        self.assertIsNot(backend.threads[("src", 100)], backend.threads[("dst", 100)])
+
+
+class TestCompensation(TestCase):
+    def test_vlans_are_deleted_after_vle_and_vxlans(self):
+        plan = MappingPlan.compensation([
+            (Operation.CREATE_VLAN, "src", ("src", "1", 100)),
+            (Operation.ADD_VXLAN, "src", ("src", "t1", 100)),
+            (Operation.CREATE_VLE, None, ("QSVLE-100", "src", "1", "dst", "2")),
+            (Operation.VALIDATE_PORT, "src", ("src", "1")),
+        ])
+        self.assertEqual([operation.kind for operation in plan.operations],
+                         [Operation.DELETE_VLE, Operation.REMOVE_VXLAN,
+                          Operation.DELETE_VLAN])
+        delete_vlan = plan.operations[-1]
+        self.assertEqual(len(delete_vlan.depends_on), 2)
+
+    def test_ports_added_to_existing_vlan_are_removed(self):
+        plan = MappingPlan.compensation([
+            (Operation.ADD_PORT, "src", ("src", "1", 100)),
+        ])
+        self.assertEqual([(operation.kind, operation.args)
+                          for operation in plan.operations],
+                         [(Operation.REMOVE_PORT, ("src", "1", 100))])
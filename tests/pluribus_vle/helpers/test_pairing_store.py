@@ -0,0 +1,64 @@
+from unittest import TestCase
+
+from pluribus_vle.helpers.pairing_store import PairingException, PairingStore
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.time = 0
+
+    def __call__(self):
+        return self.time
+
+
+class TestPairingStore(TestCase):
+    def setUp(self):
+        self._clock = FakeClock()
+        self._store = PairingStore(ttl=60, max_size=4, clock=self._clock)
+
+    def test_pair_is_matched_and_consumed(self):
+        self._store.add_map_request("f/n1/1", "f/n2/2")
+        self.assertIsNone(self._store.add_vlan("100", "f/n2/2"))
+        self.assertEqual(self._store.add_vlan("100", "f/n1/1"), ("f/n2/2", "f/n1/1"))
+        metrics = self._store.metrics
+        self.assertEqual(metrics["matched"], 1)
+        self.assertEqual(metrics["pending_map_requests"], 0)
+        self.assertEqual(metrics["pending_vlans"], 0)
+
+    def test_not_requested_ports(self):
+        self._store.add_map_request("f/n1/1", "f/n2/2")
+        self._store.add_vlan("100", "f/n1/1")
+        self.assertRaises(PairingException, self._store.add_vlan, "100", "f/n1/3")
+
+    def test_repairing_drops_old_peer(self):
+        self._store.add_map_request("f/n1/1", "f/n2/2")
+        self._store.add_map_request("f/n1/1", "f/n2/3")
+        self.assertEqual(self._store.peer("f/n1/1"), "f/n2/3")
+        self.assertEqual(self._store.peer("f/n2/3"), "f/n1/1")
+        self.assertIsNone(self._store.peer("f/n2/2"))
+        self.assertEqual(self._store.metrics["pending_map_requests"], 2)
+        self._store.add_vlan("100", "f/n2/2")
+        self.assertRaises(PairingException, self._store.add_vlan, "100", "f/n1/1")
+
+    def test_entries_expire(self):
+        self._store.add_map_request("f/n1/1", "f/n2/2")
+        self._store.add_vlan("100", "f/n1/1")
+        self._clock.time = 61
+        self.assertIsNone(self._store.add_vlan("100", "f/n2/2"))
+        self.assertEqual(self._store.metrics["expired"], 3)
+
+    def test_size_is_bounded(self):
+        for port in range(10):
+            self._store.add_vlan(port, "f/n1/{}".format(port))
+        metrics = self._store.metrics
+        self.assertEqual(metrics["pending_vlans"], 4)
+        self.assertEqual(metrics["evicted"], 6)
+
+    def test_map_request_halves_are_evicted_together(self):
+        for port in range(3):
+            self._store.add_map_request("f/n1/{}".format(port),
+                                        "f/n2/{}".format(port))
+        self.assertEqual(self._store.metrics["pending_map_requests"], 4)
+        self.assertIsNone(self._store.peer("f/n1/0"))
+        self.assertIsNone(self._store.peer("f/n2/0"))
+        self.assertEqual(self._store.peer("f/n2/1"), "f/n1/1")
@@ -0,0 +1,66 @@
+from unittest import TestCase
+
+from pluribus_vle.helpers.port_state import PortStateBatch, device_port_state, \
+    normalize_port_state
+
+
+class TestPortStateBatch(TestCase):
+    def setUp(self):
+        self._calls = []
+        self._batch = PortStateBatch()
+
+    def _set_ports_state(self, ports, node, port_state):
+        self._calls.append((node, port_state, ports))
+
+    def test_changes_are_grouped_by_node_and_state(self):
+        self._batch.add("n1", "1", "enable")
+        self._batch.add("n2", "2", "Enable")
+        self._batch.add("n1", "3", "enable")
+        self._batch.add("n1", "4", "disable")
+        self._batch.apply(self._set_ports_state)
+        self.assertEqual(self._calls, [("n1", "enable", ["1", "3"]),
+                                       ("n2", "enable", ["2"]),
+                                       ("n1", "disable", ["4"])])
+
+    def test_last_state_of_port_wins(self):
+        self._batch.add("n1", "1", "enable")
+        self._batch.add("n1", "1", "disable")
+        self._batch.apply(self._set_ports_state)
+        self.assertEqual(self._calls, [("n1", "disable", ["1"])])
+
+    def test_changes_are_sent_every_time(self):
+        for _ in range(2):
+            self._batch.add("n1", "1", "enable")
+            self._batch.apply(self._set_ports_state)
+        self.assertEqual(len(self._calls), 2)
+
+    def test_ports_in_state_on_device_are_skipped(self):
+        tables = {"n1": {"1": "enable", "2": "disable"}, "n2": {}}
+        reads = []
+
+        def ports_state_table(node):
+            reads.append(node)
+            return tables[node]
+
+        self._batch.add("n1", "1", "enable")
+        self._batch.add("n1", "2", "enable")
+        self._batch.add("n1", 3, "enable")
+        self._batch.add("n2", "1", "disable")
+        self._batch.apply(self._set_ports_state, ports_state_table)
+        self.assertEqual(self._calls, [("n1", "enable", ["2", 3]),
+                                       ("n2", "disable", ["1"])])
+        self.assertEqual(reads, ["n1", "n2"])
+
+    def test_nothing_is_sent_if_all_ports_are_in_state(self):
+        self._batch.add("n1", "1", "disable")
+        self._batch.apply(self._set_ports_state, lambda node: {"1": "disable"})
+        self.assertEqual(self._calls, [])
+
+    def test_device_port_state(self):
+        self.assertEqual(device_port_state("on"), "enable")
+        self.assertEqual(device_port_state(False), "disable")
+        self.assertIsNone(device_port_state(None))
+
+    def test_unknown_state_is_rejected(self):
+        self.assertRaises(ValueError, self._batch.add, "n1", "1", "up")
+        self.assertEqual(normalize_port_state("Disable"), "disable")
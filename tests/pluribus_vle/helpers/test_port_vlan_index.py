@@ -0,0 +1,23 @@
+from unittest import TestCase
+
+from pluribus_vle.helpers.port_vlan_index import PortVlanIndex, parse_vlan_ids
+
+
+class TestParseVlanIds(TestCase):
+    def test_list_and_ranges(self):
+        self.assertEqual(parse_vlan_ids("1,100-102, 200"), {1, 100, 101, 102, 200})
+
+    def test_none(self):
+        self.assertEqual(parse_vlan_ids("none"), set())
+        self.assertEqual(parse_vlan_ids(""), set())
+
+
+class TestPortVlanIndex(TestCase):
+    def test_writes_update_memberships(self):
+        index = PortVlanIndex({1: {1, 100}, "2": {100}})
+        self.assertEqual(index.vlan_ids("1"), [1, 100])
+        index.set_vlan_ids(1, [])
+        self.assertIsNone(index.vlan_ids(1))
+        index.remove_vlan(100)
+        self.assertIsNone(index.vlan_ids(2))
+        self.assertIsNone(index.vlan_ids(3))
@@ -0,0 +1,38 @@
+from unittest import TestCase
+
+from pluribus_vle.helpers.reconciler import Reconciler
+
+
+class TestReconciler(TestCase):
+    def setUp(self):
+        self._reconciler = Reconciler("QSVLE-", 100, 200)
+
+    def _scan(self, vles, vlans_table, reserved=frozenset()):
+        return self._reconciler.scan(vles, vlans_table, reserved)
+
+    def test_orphans_are_confirmed_by_second_scan(self):
+        vles = {"QSVLE-100": ("n1", "n2"), "QSVLE-101": ("n1", "n2"),
+                "user-vle": ("n1", "n2")}
+        vlans_table = {"n1": {100: 100, 101: 101, 102: 102, 103: 0, 300: 300},
+                       "n2": {100: 100}}
+        self.assertEqual(self._scan(vles, vlans_table), [])
+        self.assertEqual(self._scan(vles, vlans_table),
+                         [(Reconciler.VLE, "QSVLE-101", ("n1", "n2")),
+                          (Reconciler.VLAN, "n1", 101),
+                          (Reconciler.VLAN, "n1", 102)])
+
+    def test_reserved_ids_are_skipped(self):
+        vlans_table = {"n1": {100: 100}}
+        self._scan({}, vlans_table, {100})
+        self.assertEqual(self._scan({}, vlans_table, {100}), [])
+
+    def test_report(self):
+        vlans_table = {"n1": {100: 100}}
+        self._scan({}, vlans_table)
+        orphan, = self._scan({}, vlans_table)
+        self._reconciler.reclaimed(orphan)
+        report = self._reconciler.report
+        self.assertEqual(report["scans"], 2)
+        self.assertEqual(report["reclaimed"], 1)
+        self.assertEqual(report["history"], [orphan])
+        self.assertEqual(self._scan({}, vlans_table), [])
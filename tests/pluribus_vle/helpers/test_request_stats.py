@@ -0,0 +1,15 @@
+from unittest import TestCase
+
+from pluribus_vle.helpers.request_stats import RequestStats
+
+
+class TestRequestStats(TestCase):
+    def test_report_by_label(self):
+        stats = RequestStats()
+        stats.record("basic", 0.3)
+        stats.record("basic", 0.1)
+        stats.record("session", 0.05)
+        self.assertEqual(stats.report, {
+            "basic": {"requests": 2, "mean_latency": 0.2},
+            "session": {"requests": 1, "mean_latency": 0.05},
+        })
@@ -0,0 +1,113 @@
+import threading
+from unittest import TestCase
+
+from pluribus_vle.helpers import deadline
+from pluribus_vle.helpers.single_flight import SingleFlight
+
+
+class BlockingRead(object):
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait()
+        if self.error:
+            raise self.error
+        return self.result
+
+
+class TestSingleFlight(TestCase):
+    def setUp(self):
+        self._flight = SingleFlight()
+
+    def _run_concurrently(self, key, read, callers):
+        results = []
+
+        def call():
+            try:
+                results.append(self._flight.do(key, read))
+            except Exception as err:
+                results.append(err)
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        threads[0].start()
+        read.started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        while self._flight.coalesced < callers - 1:
+            pass
+        read.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_calls_share_result(self):
+        read = BlockingRead(result="vles")
+        results = self._run_concurrently("vles", read, 3)
+        self.assertEqual(read.calls, 1)
+        self.assertEqual(results, ["vles"] * 3)
+
+    def test_concurrent_calls_share_error(self):
+        error = Exception("Failed")
+        read = BlockingRead(error=error)
+        results = self._run_concurrently("vles", read, 2)
+        self.assertEqual(read.calls, 1)
+        self.assertEqual(results, [error, error])
+
+    def test_sequential_calls_are_executed(self):
+        calls = []
+        self._flight.do("vles", calls.append, 1)
+        self._flight.do("vles", calls.append, 2)
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(self._flight.coalesced, 0)
+
+    def test_different_keys_are_not_coalesced(self):
+        read = BlockingRead(result="vles")
+        thread = threading.Thread(target=self._flight.do, args=("vles", read))
+        thread.start()
+        read.started.wait()
+        self.assertEqual(self._flight.do("vlans", lambda: "vlans"), "vlans")
+        read.release.set()
+        thread.join()
+
+    def test_call_started_before_write_is_not_joined(self):
+        read = BlockingRead(result="stale")
+        thread = threading.Thread(target=self._flight.do, args=("vles", read))
+        thread.start()
+        read.started.wait()
+        self._flight.wrote()
+        self.assertEqual(self._flight.do("vles", lambda: "fresh"), "fresh")
+        self.assertEqual(self._flight.coalesced, 0)
+        read.release.set()
+        thread.join()
+
+    def test_call_failed_by_leader_deadline_is_executed_again(self):
+        read = BlockingRead(error=deadline.DeadlineExceeded("Leader deadline"))
+        results = []
+
+        def follow():
+            results.append(self._flight.do("vles", lambda: "vles"))
+
+        leader = threading.Thread(target=self._run_ignoring_errors, args=("vles", read))
+        leader.start()
+        read.started.wait()
+        follower = threading.Thread(target=follow)
+        follower.start()
+        while self._flight.coalesced < 1:
+            pass
+        read.release.set()
+        leader.join()
+        follower.join()
+        self.assertEqual(results, ["vles"])
+
+    def _run_ignoring_errors(self, key, read):
+        try:
+            self._flight.do(key, read)
+        except Exception:
+            pass
@@ -0,0 +1,68 @@
+from unittest import TestCase
+
+from pluribus_vle.helpers.mapping_plan import MappingPlan, Operation
+from pluribus_vle.helpers.staging import StagingArea
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.time = 0
+
+    def __call__(self):
+        return self.time
+
+
+class TestStagingArea(TestCase):
+    def setUp(self):
+        self._clock = FakeClock()
+        self._area = StagingArea(ttl=60, clock=self._clock)
+
+    def test_pop_matches_mapping_request(self):
+        stage, replaced = self._area.create("f/n1/1", "f/n2/2", "100", "n1", "1")
+        self.assertIsNone(replaced)
+        self.assertIsNone(self._area.pop("f/n1/1", "f/n2/3", 100))
+        self.assertIs(self._area.pop("f/n1/1", "f/n2/2", 100), stage)
+        self.assertIsNone(self._area.pop("f/n1/1", "f/n2/2", 100))
+
+    def test_stages_expire(self):
+        stage, _ = self._area.create("f/n1/1", "f/n2/2", 100, "n1", "1")
+        self._clock.time = 30
+        self._area.create("f/n1/3", "f/n2/4", 101, "n1", "3")
+        self._clock.time = 61
+        self.assertEqual(self._area.pop_expired(), [stage])
+        self.assertEqual(self._area.pop_expired(), [])
+
+    def test_remaining_plan_skips_staged_operations(self):
+        stage, _ = self._area.create("f/src/1", "f/dst/2", 100, "src", "1")
+        plan = MappingPlan.map_multi_node("src", "dst", "1", "2", "t1", "t2", 100,
+                                          "QSVLE-100")
+        stage.completed.update(operation.key for operation in
+                               stage.staging_plan(plan).operations)
+        remaining = stage.remaining_plan(plan).operations
+        self.assertEqual(set(operation.node for operation in remaining),
+                         {"dst", None})
+        self.assertIn(Operation.CREATE_VLE,
+                      [operation.kind for operation in remaining])
+
+    def test_staging_plan_of_multi_node_mapping(self):
+        stage, _ = self._area.create("f/src/1", "f/dst/2", 100, "src", "1")
+        plan = MappingPlan.map_multi_node("src", "dst", "1", "2", "t1", "t2", 100,
+                                          "QSVLE-100")
+        self.assertEqual([operation.kind for operation in
+                          stage.staging_plan(plan).operations],
+                         [Operation.VALIDATE_PORT, Operation.CREATE_VLAN,
+                          Operation.ADD_VXLAN, Operation.VERIFY_VXLAN])
+
+    def test_staging_plan_never_moves_peer_port_on_same_node(self):
+        stage, _ = self._area.create("f/n1/1", "f/n1/2", 100, "n1", "1")
+        plan = MappingPlan.map_single_node("n1", "1", "2", 100, "QSVLE-100")
+        staged = stage.staging_plan(plan).operations
+        self.assertEqual([operation.kind for operation in staged],
+                         [Operation.VALIDATE_PORT, Operation.CREATE_VLAN])
+        self.assertEqual(set(operation.args[1] for operation in staged), {"1"})
+
+    def test_wait_is_bounded(self):
+        stage, _ = self._area.create("f/n1/1", "f/n2/2", 100, "n1", "1")
+        self.assertFalse(stage.wait(0.01))
+        stage.finish()
+        self.assertTrue(stage.wait(0.01))
@@ -0,0 +1,63 @@
+from unittest import TestCase
+
+from pluribus_vle.helpers.switch_resolver import SwitchResolveException, \
+    SwitchResolver
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeSwitchSetup(object):
+    def __init__(self, hostids):
+        self.hostids = hostids
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return dict(self.hostids)
+
+
+class TestSwitchResolver(TestCase):
+    def setUp(self):
+        self._clock = FakeClock()
+        self._setup = FakeSwitchSetup({"leaf-1": "0x1"})
+
+    def _resolver(self, strict=True):
+        return SwitchResolver(self._setup, refresh_interval=30, strict=strict,
+                              clock=self._clock)
+
+    def test_known_switch(self):
+        resolver = self._resolver()
+        self.assertEqual(resolver.hostid("leaf-1"), "0x1")
+        self.assertEqual(self._setup.calls, 1)
+
+    def test_first_miss_after_construction_refreshes_at_once(self):
+        resolver = self._resolver()
+        self._setup.hostids["leaf-2"] = "0x2"
+        self.assertEqual(resolver.hostid("leaf-2"), "0x2")
+        self.assertEqual(resolver.metrics["refreshes"], 1)
+
+    def test_added_switch_is_found_by_refresh(self):
+        resolver = self._resolver()
+        self.assertRaises(SwitchResolveException, resolver.hostid, "leaf-2")
+        self._setup.hostids["leaf-2"] = "0x2"
+        self._clock.now += 30
+        self.assertEqual(resolver.hostid("leaf-2"), "0x2")
+        self.assertEqual(resolver.metrics["refreshes"], 2)
+
+    def test_refresh_is_rate_limited(self):
+        resolver = self._resolver()
+        self.assertRaises(SwitchResolveException, resolver.hostid, "leaf-2")
+        self.assertRaises(SwitchResolveException, resolver.hostid, "leaf-2")
+        self.assertEqual(self._setup.calls, 2)
+
+    def test_fabric_fallback_is_counted(self):
+        resolver = self._resolver(strict=False)
+        self.assertEqual(resolver.hostid("leaf-2"), "fabric")
+        self.assertEqual(resolver.metrics,
+                         {"refreshes": 1, "fallbacks": 1, "switches": 1})
@@ -0,0 +1,61 @@
+from unittest import TestCase
+
+from pluribus_vle.helpers.tunnel_index import TunnelIndex
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeTunnelShow(object):
+    def __init__(self, table):
+        self.table = table
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return dict(self.table)
+
+
+class TestTunnelIndex(TestCase):
+    def setUp(self):
+        self._clock = FakeClock()
+        self._tunnel_show = FakeTunnelShow({("leaf-1", "leaf-2"): "t12",
+                                            ("leaf-2", "leaf-1"): "t21"})
+        self._index = TunnelIndex(self._tunnel_show, refresh_interval=30,
+                                  clock=self._clock)
+        self._index.update(self._tunnel_show())
+
+    def test_lookup(self):
+        self.assertEqual(self._index.lookup("leaf-1", "leaf-2"), ("t12", "t21"))
+        self.assertEqual(self._index.lookup("leaf-2", "leaf-1"), ("t21", "t12"))
+        self.assertEqual(self._tunnel_show.calls, 1)
+
+    def test_added_tunnel_is_found_by_refresh(self):
+        self._tunnel_show.table.update({("leaf-1", "leaf-3"): "t13",
+                                        ("leaf-3", "leaf-1"): "t31"})
+        self._clock.now += 30
+        self.assertEqual(self._index.lookup("leaf-1", "leaf-3"), ("t13", "t31"))
+        self.assertEqual(self._index.metrics, {"tunnels": 4, "refreshes": 1})
+
+    def test_refresh_is_rate_limited(self):
+        self._clock.now += 10
+        self.assertIsNone(self._index.lookup("leaf-1", "leaf-3"))
+        self.assertEqual(self._tunnel_show.calls, 1)
+
+    def test_refresh_through_given_load(self):
+        self._clock.now += 30
+        tunnels = self._index.lookup("leaf-1", "leaf-3", lambda: {
+            ("leaf-1", "leaf-3"): "t13", ("leaf-3", "leaf-1"): "t31"})
+        self.assertEqual(tunnels, ("t13", "t31"))
+        self.assertEqual(self._tunnel_show.calls, 1)
+
+    def test_refresh_reports_change(self):
+        self.assertFalse(self._index.refresh())
+        del self._tunnel_show.table["leaf-2", "leaf-1"]
+        self.assertTrue(self._index.refresh())
+        self.assertEqual(self._index.pairs(), [])
@@ -0,0 +1,28 @@
+from unittest import TestCase
+
+from pluribus_vle.helpers.vlan_allocator import VlanAllocator
+
+
+class TestVlanAllocator(TestCase):
+    def setUp(self):
+        self._allocator = VlanAllocator(100, 102)
+
+    def test_reserved_ids_are_not_reallocated(self):
+        self.assertEqual(self._allocator.reserve([100]), 101)
+        self.assertEqual(self._allocator.reserve([100]), 102)
+        self.assertRaises(Exception, self._allocator.reserve, [100])
+
+    def test_release(self):
+        vlan_id = self._allocator.reserve([])
+        self._allocator.release(vlan_id)
+        self.assertEqual(self._allocator.reserve([]), vlan_id)
+
+    def test_requested_id(self):
+        self.assertEqual(self._allocator.reserve([], 1414), 1414)
+        self.assertRaises(Exception, self._allocator.reserve, [], 1414)
+        self.assertRaises(Exception, self._allocator.reserve, [200], 200)
+
+    def test_held_id_is_not_allocated(self):
+        self.assertTrue(self._allocator.hold(100))
+        self.assertFalse(self._allocator.hold(100))
+        self.assertEqual(self._allocator.reserve([]), 101)
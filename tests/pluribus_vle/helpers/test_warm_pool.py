@@ -0,0 +1,44 @@
+from unittest import TestCase
+
+from pluribus_vle.helpers.warm_pool import WarmPool
+
+
+class TestWarmPool(TestCase):
+    def setUp(self):
+        self._pool = WarmPool(size=2)
+        self._pool.set_pairs([("n1", "n2"), ("n2", "n1"), ("n3", "n1")])
+
+    def test_pairs_are_direction_independent(self):
+        self.assertEqual(sorted(self._pool.pairs), [("n1", "n2"), ("n1", "n3")])
+        self._pool.put("n2", "n1", 100)
+        self.assertEqual(self._pool.take("n1", "n2"), 100)
+        self.assertIsNone(self._pool.take("n1", "n2"))
+
+    def test_missing(self):
+        self.assertEqual(self._pool.missing("n1", "n2"), 2)
+        self._pool.put("n1", "n2", 100)
+        self._pool.put("n1", "n2", 101)
+        self._pool.put("n1", "n2", 102)
+        self.assertEqual(self._pool.missing("n1", "n2"), 0)
+
+    def test_dropped_pairs_return_their_ids(self):
+        self._pool.put("n1", "n3", 100)
+        self.assertEqual(self._pool.set_pairs([("n1", "n2")]),
+                         [("n1", 100), ("n3", 100)])
+        self.assertEqual(self._pool.pairs, [("n1", "n2")])
+
+    def test_disabled(self):
+        self.assertFalse(WarmPool(size=0).enabled)
+
+    def test_adopt(self):
+        self._pool.put("n1", "n2", 100)
+        leftovers = self._pool.adopt({"n1": {101, 102, 103, 104}, "n2": {101, 102},
+                                      "n3": {103, 105}})
+        self.assertTrue(self._pool.contains(103))
+        self.assertFalse(self._pool.contains(102))
+        self.assertEqual(self._pool.take("n1", "n2"), 100)
+        self.assertEqual(self._pool.take("n1", "n2"), 101)
+        self.assertIsNone(self._pool.take("n1", "n2"))
+        self.assertEqual(self._pool.take("n1", "n3"), 103)
+        self.assertEqual(leftovers, [("n1", 102), ("n1", 104), ("n2", 102),
+                                     ("n3", 105)])
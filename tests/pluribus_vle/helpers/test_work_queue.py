@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+from pluribus_vle.helpers.work_queue import WorkQueue
+
+
+class FakeLogger(object):
+    def __init__(self):
+        self.errors = []
+
+    def exception(self, message):
+        self.errors.append(message)
+
+    def error(self, message):
+        self.errors.append(message)
+
+
+class FlakyTask(object):
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise Exception("Failed")
+
+
+class TestWorkQueue(TestCase):
+    def setUp(self):
+        self._logger = FakeLogger()
+        self._delays = []
+        self._queue = WorkQueue(self._logger, retries=2, retry_delay=5,
+                                sleep=self._delays.append)
+
+    def test_failed_task_is_retried(self):
+        task = FlakyTask(failures=2)
+        finished = []
+        self._queue.put("task", task, lambda: finished.append(True))
+        self._queue.join()
+        self.assertEqual(task.calls, 3)
+        self.assertEqual(self._delays, [5, 5])
+        self.assertEqual(finished, [True])
+        self.assertEqual(self._queue.pending, 0)
+
+    def test_task_is_given_up(self):
+        task = FlakyTask(failures=10)
+        finished = []
+        self._queue.put("task", task, lambda: finished.append(True))
+        self._queue.join()
+        self.assertEqual(task.calls, 3)
+        self.assertEqual(finished, [True])
+        self.assertEqual(self._logger.errors[-1], "Task task is given up")
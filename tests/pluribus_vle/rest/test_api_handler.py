@@ -0,0 +1,73 @@
+from unittest import TestCase
+
+import requests
+
+from pluribus_vle.rest.api_handler import PluribusApiInvalidCredentials, \
+    PluribusRESTAPI
+
+
+class FakeResponse(object):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return {"result": {"status": "Success"}, "data": []}
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.exceptions.HTTPError(response=self)
+
+
+class FakeSession(object):
+    """ Responds with the queued status codes, setting the queued cookies. """
+
+    def __init__(self, responses):
+        self._responses = list(responses)
+        self.auth = None
+        self.verify = None
+        self.cookies = {}
+        self.sent_auth = []
+
+    def get(self, url, **kwargs):
+        self.sent_auth.append(self.auth)
+        status_code, cookies = self._responses.pop(0)
+        self.cookies.update(cookies)
+        return FakeResponse(status_code)
+
+
+class TestSessionAuth(TestCase):
+    def _api(self, *responses):
+        session = FakeSession(responses)
+        api = PluribusRESTAPI(address="switch", username="admin", password="secret",
+                              session=session, session_auth=True)
+        return api, session
+
+    def test_session_cookie_replaces_credentials(self):
+        api, session = self._api((200, {"JSESSIONID": "1"}), (200, {}))
+        api.get_vlans()
+        api.get_vlans()
+        self.assertEqual(session.sent_auth, [("admin", "secret"), None])
+
+    def test_unrelated_cookie_keeps_credentials(self):
+        api, session = self._api((200, {"balancer": "1"}), (200, {}))
+        api.get_vlans()
+        api.get_vlans()
+        self.assertEqual(session.sent_auth, [("admin", "secret")] * 2)
+
+    def test_expired_session_is_renewed_and_request_retried(self):
+        api, session = self._api((200, {"JSESSIONID": "1"}), (401, {}),
+                                 (200, {"JSESSIONID": "2"}), (200, {}))
+        api.get_vlans()
+        api.get_vlans()
+        api.get_vlans()
+        self.assertEqual(session.sent_auth, [("admin", "secret"), None,
+                                             ("admin", "secret"), None])
+
+    def test_rejected_credentials_are_not_retried(self):
+        api, session = self._api((401, {}))
+        self.assertRaises(PluribusApiInvalidCredentials, api.get_vlans)
+        self.assertEqual(session.sent_auth, [("admin", "secret")])
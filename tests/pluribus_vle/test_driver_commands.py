@@ -1,17 +1,401 @@
+import os
+import shutil
+import tempfile
+import time
 from unittest import TestCase
 
-from mock import Mock
+from mock import Mock, patch
 
 from cloudshell.layer_one.core.driver_commands_interface import DriverCommandsInterface
+from cloudshell.layer_one.core.layer_one_driver_exception import LayerOneDriverException
 from pluribus_vle.driver_commands import DriverCommands
-
-
+from tests.pluribus_vle.fake_fabric import FakeFabric, FakeRuntimeConfig
 
 
 class TestDriverCommands(TestCase):
     def setUp(self):
         self._logger = Mock()
-        self._instance = DriverCommands(self._logger)
+        self._instance = DriverCommands(self._logger, FakeRuntimeConfig())
 
     def test_implementing_interface(self):
         self.assertIsInstance(self._instance, DriverCommandsInterface)
+
+
+class FabricTestCase(TestCase):
+    """ DriverCommands logged in to a fake REST fabric of two connected leaves. """
+    CONFIG = {}
+    ADDRESS = "192.168.42.240"
+
+    def setUp(self):
+        self._fabric = FakeFabric()
+        self._fabric.add_switch("leaf1", "hostid-1")
+        self._fabric.add_switch("leaf2", "hostid-2")
+        self._fabric.connect("leaf1", "leaf2")
+        patcher = patch("pluribus_vle.driver_commands.PluribusRESTAPI",
+                        return_value=self._fabric)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self._driver = DriverCommands(Mock(), FakeRuntimeConfig(dict(self.CONFIG)))
+        self._driver.login(self.ADDRESS, "admin", "admin")
+
+    def _port(self, node, port):
+        return "{0}/{1}/{2}".format(self.ADDRESS, node, port)
+
+    def _writes(self, method):
+        return [write[1:] for write in self._fabric.writes if write[0] == method]
+
+
+class TestMapBidi(FabricTestCase):
+    def test_cross_node_mapping(self):
+        self._driver.map_bidi(self._port("leaf1", 1), self._port("leaf2", 2), 200)
+        self.assertEqual(list(self._fabric.vles), ["QSVLE-200"])
+        vle = self._fabric.vles["QSVLE-200"]
+        self.assertEqual((vle["node1-name"], vle["node-1-port"],
+                          vle["node2-name"], vle["node-2-port"]),
+                         ("leaf1", 1, "leaf2", 2))
+        self.assertEqual(self._fabric.vlan_ports("leaf1", 200), [1])
+        self.assertEqual(self._fabric.vlan_ports("leaf2", 200), [2])
+        self.assertEqual(self._fabric.tunnel_vxlans("leaf1"), {200})
+        self.assertEqual(self._fabric.tunnel_vxlans("leaf2"), {200})
+        self.assertEqual(self._fabric.ports["leaf1", 1]["enable"], "enable")
+        self.assertEqual(self._fabric.ports["leaf2", 2]["enable"], "enable")
+
+    def test_same_node_mapping(self):
+        self._driver.map_bidi(self._port("leaf1", 1), self._port("leaf1", 2), 200)
+        self.assertEqual(self._fabric.vlan_ports("leaf1", 200), [1, 2])
+        self.assertIsNone(self._fabric.vlan_ports("leaf2", 200))
+        self.assertEqual(self._fabric.tunnel_vxlans("leaf1"), set())
+        vle = self._fabric.vles["QSVLE-200"]
+        self.assertEqual((vle["node1-name"], vle["node2-name"]), ("leaf1", "leaf1"))
+
+    def test_mapped_port_leaves_its_previous_vlan(self):
+        self._fabric.add_vle("other", "leaf1", 1, "leaf1", 3, 50)
+        del self._fabric.vles["other"]
+        self._driver.map_bidi(self._port("leaf1", 1), self._port("leaf1", 2), 200)
+        self.assertEqual(self._fabric.vlan_ports("leaf1", 50), [3])
+        self.assertEqual(self._fabric.vlan_ports("leaf1", 200), [1, 2])
+
+    def test_free_vlan_id_is_allocated(self):
+        self._fabric.add_vle("other", "leaf1", 3, "leaf1", 4, 100)
+        self._driver.map_bidi(self._port("leaf1", 1), self._port("leaf2", 2))
+        self.assertIn("QSVLE-101", self._fabric.vles)
+
+
+class TestMapClear(FabricTestCase):
+    def test_mapped_ports_are_cleared(self):
+        self._driver.map_bidi(self._port("leaf1", 1), self._port("leaf2", 2), 200)
+        self._driver.map_clear([self._port("leaf1", 1), self._port("leaf2", 2)])
+        self.assertEqual(self._fabric.vles, {})
+        self.assertEqual(self._fabric.vlans, {})
+        self.assertEqual(self._fabric.tunnel_vxlans("leaf1"), set())
+        self.assertEqual(len(self._writes("delete_vles")), 1)
+        self.assertEqual(self._fabric.ports["leaf1", 1]["enable"], "disable")
+        self.assertEqual(self._fabric.ports["leaf2", 2]["enable"], "disable")
+
+    def test_one_end_clears_connection(self):
+        self._fabric.add_vle("QSVLE-300", "leaf1", 3, "leaf2", 4, 300)
+        self._driver.map_clear([self._port("leaf2", 4)])
+        self.assertEqual(self._fabric.vles, {})
+        self.assertEqual(self._fabric.vlans, {})
+
+    def test_unmapped_port_is_not_changed(self):
+        self._driver.map_clear([self._port("leaf1", 1)])
+        self.assertEqual(self._fabric.writes, [])
+
+
+class TestLedgerMapClear(FabricTestCase):
+    CONFIG = {"DRIVER.LEDGER.ENABLE": True}
+
+    def test_connection_is_taken_from_ledger(self):
+        self._driver.map_bidi(self._port("leaf1", 1), self._port("leaf2", 2), 200)
+        del self._fabric.reads[:]
+        self._driver.map_clear([self._port("leaf1", 1), self._port("leaf2", 2)])
+        self.assertEqual(self._fabric.vles, {})
+        self.assertEqual(self._fabric.vlans, {})
+        # Only the deletion checks read the VLEs, the connection table is not
+        self.assertEqual(self._fabric.reads.count("get_vles"), 2)
+
+    def test_stale_ledger_entry_is_verified_against_device(self):
+        ledger_path = self._ledger_file(
+            '{"op": "map", "vle": "QSVLE-200", "vlan_id": 200, '
+            '"ports": [["leaf1", "1"], ["leaf2", "2"]], "tunnels": null}\n')
+        self._driver = DriverCommands(Mock(), FakeRuntimeConfig(
+            {"DRIVER.LEDGER.ENABLE": True, "DRIVER.LEDGER.PATH": ledger_path}))
+        self._driver.login(self.ADDRESS, "admin", "admin")
+        self._fabric.add_vle("QSVLE-300", "leaf1", 1, "leaf1", 3, 300)
+        self._driver.map_clear([self._port("leaf1", 1)])
+        self.assertEqual(self._fabric.vles, {})
+        self.assertIsNone(self._fabric.vlan_ports("leaf1", 300))
+
+    def _ledger_file(self, content):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "ledger.jsonl")
+        with open(path, "w") as ledger_file:
+            ledger_file.write(content)
+        return path
+
+
+class TestDeferredTeardown(FabricTestCase):
+    CONFIG = {"DRIVER.DEFERRED_TEARDOWN.ENABLE": True}
+
+    def test_vlans_are_deleted_in_background(self):
+        self._driver.map_bidi(self._port("leaf1", 1), self._port("leaf2", 2), 200)
+        self._driver.map_clear([self._port("leaf1", 1)])
+        self.assertEqual(self._fabric.vles, {})
+        self._driver._teardown_queue.join()
+        self.assertEqual(self._fabric.vlans, {})
+        self.assertNotIn(200, self._driver._vlan_allocator.reserved)
+
+
+class TestMappingRollback(FabricTestCase):
+    def test_failed_cross_node_mapping_leaves_clean_state(self):
+        self._fabric.fail("create_vles")
+        self.assertRaises(Exception, self._driver.map_bidi, self._port("leaf1", 1),
+                          self._port("leaf2", 2), 200)
+        self.assertEqual(self._fabric.vles, {})
+        self.assertEqual(self._fabric.vlans, {})
+        self.assertEqual(self._fabric.tunnel_vxlans("leaf1"), set())
+        self.assertEqual(self._fabric.tunnel_vxlans("leaf2"), set())
+        self.assertEqual(self._fabric.ports["leaf1", 1]["enable"], "disable")
+        self.assertEqual(self._fabric.ports["leaf2", 2]["enable"], "disable")
+        self.assertEqual(self._driver._vlan_allocator.reserved, frozenset())
+
+    def test_failed_same_node_mapping_leaves_clean_state(self):
+        self._fabric.fail("add_ports_to_vlan")
+        self.assertRaises(Exception, self._driver.map_bidi, self._port("leaf1", 1),
+                          self._port("leaf1", 2), 200)
+        self.assertEqual(self._fabric.vles, {})
+        self.assertEqual(self._fabric.vlans, {})
+
+    def test_vlan_id_is_reusable_after_rollback(self):
+        self._fabric.fail("create_vles")
+        self.assertRaises(Exception, self._driver.map_bidi, self._port("leaf1", 1),
+                          self._port("leaf2", 2), 200)
+        self._fabric.recover("create_vles")
+        self._driver.map_bidi(self._port("leaf1", 1), self._port("leaf2", 2), 200)
+        self.assertIn("QSVLE-200", self._fabric.vles)
+
+
+class TestPortState(FabricTestCase):
+    def test_enabled_ports_are_not_written(self):
+        self._driver.map_bidi(self._port("leaf1", 1), self._port("leaf2", 2), 200)
+        self.assertEqual(self._writes("set_port_state"), [])
+
+    def test_port_disabled_on_device_is_enabled(self):
+        self._fabric.ports["leaf2", 2]["enable"] = "disable"
+        self._driver.map_bidi(self._port("leaf1", 1), self._port("leaf2", 2), 200)
+        self.assertEqual(self._writes("set_port_state"), [("leaf2", 2, "enable")])
+
+    def test_port_state_attribute_of_port_in_state_is_not_written(self):
+        self._driver.set_attribute_value(self._port("leaf1", 1), "Port State",
+                                         "Enable")
+        self.assertEqual(self._writes("set_port_state"), [])
+        self._driver.set_attribute_value(self._port("leaf1", 1), "Port State",
+                                         "Disable")
+        self.assertEqual(self._writes("set_port_state"), [("leaf1", 1, "disable")])
+
+
+class TestSpeculativeStaging(FabricTestCase):
+    CONFIG = {"DRIVER.MAP_ON_SET_VLAN": True, "DRIVER.SPECULATIVE_STAGING": True}
+
+    def _staged(self, port):
+        stage = self._driver._staging_area._stages[port]
+        self.assertTrue(stage.wait(5))
+        self.assertIsNone(stage.error)
+
+    def test_peer_port_on_same_node_stays_in_its_vlan(self):
+        self._fabric.add_vle("other", "leaf1", 2, "leaf1", 3, 50)
+        del self._fabric.vles["other"]
+        self._driver.map_bidi(self._port("leaf1", 1), self._port("leaf1", 2))
+        self._driver.set_attribute_value(self._port("leaf1", 1), "L1 VLAN ID", "200")
+        self._staged(self._port("leaf1", 1))
+        self.assertEqual(self._fabric.vlan_ports("leaf1", 200), [1])
+        self.assertEqual(self._fabric.vlan_ports("leaf1", 50), [2, 3])
+        self.assertEqual(self._fabric.vles, {})
+
+        self._driver.set_attribute_value(self._port("leaf1", 2), "L1 VLAN ID", "200")
+        self.assertEqual(self._fabric.vlan_ports("leaf1", 200), [1, 2])
+        self.assertEqual(self._fabric.vlan_ports("leaf1", 50), [3])
+        self.assertIn("QSVLE-200", self._fabric.vles)
+
+    def test_cross_node_stage_provisions_its_node_only(self):
+        self._driver.map_bidi(self._port("leaf1", 1), self._port("leaf2", 2))
+        self._driver.set_attribute_value(self._port("leaf1", 1), "L1 VLAN ID", "200")
+        self._staged(self._port("leaf1", 1))
+        self.assertEqual(self._fabric.vlan_ports("leaf1", 200), [1])
+        self.assertIsNone(self._fabric.vlan_ports("leaf2", 200))
+        self.assertEqual(self._fabric.tunnel_vxlans("leaf1"), {200})
+
+        self._driver.set_attribute_value(self._port("leaf2", 2), "L1 VLAN ID", "200")
+        self.assertEqual(self._fabric.vlan_ports("leaf2", 200), [2])
+        self.assertIn("QSVLE-200", self._fabric.vles)
+
+
+class TestWarmPool(FabricTestCase):
+    CONFIG = {"DRIVER.WARM_POOL.SIZE": 1}
+
+    def _wait(self, condition):
+        for _ in range(500):
+            if condition():
+                return
+            time.sleep(0.01)
+        self.fail("Condition not met")
+
+    def _warm_vlans(self):
+        return sorted(key for key, vlan in self._fabric.vlans.items()
+                      if vlan["description"] == "QSVLE-WARM")
+
+    def test_warm_vlans_of_disconnected_pair_are_deleted(self):
+        self._wait(lambda: len(self._warm_vlans()) == 2)
+        (_, vlan_id), _ = self._warm_vlans()
+        self.assertIn(vlan_id, self._driver._vlan_allocator.reserved)
+
+        self._fabric.disconnect("leaf1", "leaf2")
+        self._driver._refresh_tunnels()
+        self._wait(lambda: not self._warm_vlans())
+        self._wait(lambda: vlan_id not in self._driver._vlan_allocator.reserved)
+
+    def test_id_of_warm_vlan_failed_to_be_deleted_stays_reserved(self):
+        self._wait(lambda: len(self._warm_vlans()) == 2)
+        (_, vlan_id), _ = self._warm_vlans()
+        self._fabric.fail("delete_vlan")
+
+        self._fabric.disconnect("leaf1", "leaf2")
+        self._driver._refresh_tunnels()
+        self._wait(lambda: self._driver._logger.exception.call_count == 2)
+        self.assertEqual(len(self._warm_vlans()), 2)
+        self.assertIn(vlan_id, self._driver._vlan_allocator.reserved)
+
+
+
+class TestGetResourceDescription(FabricTestCase):
+    def test_fabric_description_has_mappings_of_all_nodes(self):
+        self._driver.map_bidi(self._port("leaf1", 1), self._port("leaf1", 2), 200)
+        self._driver.map_bidi(self._port("leaf1", 3), self._port("leaf2", 3), 201)
+        fabric = self._driver.get_resource_description(
+            self.ADDRESS).resource_info_list[0]
+        leaf1 = fabric.child_resources["leaf1"].child_resources
+        self.assertEqual(leaf1["1"].mapping.resource_id, "2")
+        self.assertEqual(leaf1["3"].mapping.address, self._port("leaf2", 3))
+
+    def test_node_description_has_its_local_mappings(self):
+        self._driver.map_bidi(self._port("leaf1", 1), self._port("leaf1", 2), 200)
+        self._driver.map_bidi(self._port("leaf1", 3), self._port("leaf2", 3), 201)
+        fabric = self._driver.get_resource_description(
+            self.ADDRESS + "/leaf1").resource_info_list[0]
+        self.assertEqual(list(fabric.child_resources), ["leaf1"])
+        leaf1 = fabric.child_resources["leaf1"].child_resources
+        self.assertEqual(leaf1["1"].mapping.resource_id, "2")
+        self.assertIsNone(leaf1["3"].mapping)
+
+
+class TestAutoloadCache(FabricTestCase):
+    CONFIG = {"DRIVER.AUTOLOAD_CACHE.ENABLE": True, "DRIVER.STATE_PROBE.ENABLE": True}
+
+    def _structure(self):
+        return self._driver.get_resource_description(self.ADDRESS).resource_info_list
+
+    @staticmethod
+    def _mapping(structure, node, port):
+        return structure[0].child_resources[node].child_resources[str(port)].mapping
+
+    def test_returned_structure_is_not_patched(self):
+        first = self._structure()
+        self._driver.map_bidi(self._port("leaf1", 1), self._port("leaf1", 2), 200)
+        second = self._structure()
+        self.assertIsNone(self._mapping(first, "leaf1", 1))
+        self.assertEqual(self._mapping(second, "leaf1", 1).resource_id, "2")
+        self.assertEqual(self._driver._autoload_cache.metrics["builds"], 1)
+
+    def test_change_made_by_others_is_not_served_from_cache(self):
+        self._structure()
+        self._fabric.add_vle("other", "leaf1", 1, "leaf2", 2, 50)
+        self._fabric.transactions["leaf1"] += 1
+        structure = self._structure()
+        self.assertEqual(self._mapping(structure, "leaf1", 1).resource_id, "2")
+
+
+class TestGetAttributeValue(FabricTestCase):
+    def _value(self, address, attribute_name):
+        return self._driver.get_attribute_value(address, attribute_name)._value
+
+    def test_serial_number_is_served_without_device_access(self):
+        reads = len(self._fabric.reads)
+        self.assertEqual(self._value(self.ADDRESS, "Serial Number"), "fabric-1-id")
+        self.assertEqual(self._value(self._port("leaf1", 1), "Serial Number"), "NA")
+        self.assertEqual(len(self._fabric.reads), reads)
+
+    def test_unsupported_attribute_is_rejected_without_device_access(self):
+        reads = len(self._fabric.reads)
+        self.assertRaises(LayerOneDriverException, self._driver.get_attribute_value,
+                          self._port("leaf1", 1), "Port Description")
+        self.assertEqual(len(self._fabric.reads), reads)
+
+    def test_port_attribute_is_read_from_device_before_autoload(self):
+        self.assertEqual(self._value(self._port("leaf1", 1), "Port Speed"), "10000")
+        self.assertEqual(self._value(self._port("leaf1", 1), "Auto Negotiation"),
+                         "True")
+        self.assertEqual(self._fabric.reads.count("get_port_config"), 1)
+
+    def test_port_attributes_are_served_from_autoload(self):
+        self._driver.get_resource_description(self.ADDRESS)
+        reads = len(self._fabric.reads)
+        self.assertEqual(self._value(self._port("leaf1", 1), "Model Name"), "F64 Port")
+        self.assertEqual(self._value(self._port("leaf1", 1), "Port Speed"), "10000")
+        self.assertEqual(len(self._fabric.reads), reads)
+
+    def test_port_model_is_not_known_before_autoload(self):
+        self.assertRaises(LayerOneDriverException, self._driver.get_attribute_value,
+                          self._port("leaf1", 1), "Model Name")
+
+    def test_read_failure_is_driver_exception(self):
+        self._fabric.fail("get_port_config")
+        self.assertRaises(LayerOneDriverException, self._driver.get_attribute_value,
+                          self._port("leaf1", 1), "Port Speed")
+
+
+class TestGetAttributeValueStrict(FabricTestCase):
+    CONFIG = {"DRIVER.SWITCH_RESOLVER.STRICT": True}
+
+    def test_unknown_switch_is_driver_exception(self):
+        self.assertRaises(LayerOneDriverException, self._driver.get_attribute_value,
+                          self._port("leaf9", 1), "Port Speed")
+
+
+class TestPhysicalPortNames(FabricTestCase):
+    CONFIG = {"DRIVER.STATE_PROBE.ENABLE": True, "DRIVER.STATE_PROBE.MIN_INTERVAL": 0}
+
+    def setUp(self):
+        super(TestPhysicalPortNames, self).setUp()
+        self._fabric.bezel_portmaps = {"leaf1": {"1": 1, "2.1": 2, "2.2": 3},
+                                       "leaf2": {"1": 1, "2.1": 4}}
+
+    def test_physical_name_is_converted_on_its_node(self):
+        self._driver.set_attribute_value(self._port("leaf1", "2.2"), "Port State",
+                                         "Disable")
+        self._driver.set_attribute_value(self._port("leaf2", "2.1"), "Port State",
+                                         "Disable")
+        self.assertEqual(self._writes("set_port_state"),
+                         [("leaf1", 3, "disable"), ("leaf2", 4, "disable")])
+
+    def test_logical_id_is_kept(self):
+        self._driver.set_attribute_value(self._port("leaf2", 4), "Port State",
+                                         "Disable")
+        self.assertEqual(self._writes("set_port_state"), [("leaf2", 4, "disable")])
+
+    def test_unknown_port_is_rejected(self):
+        self.assertRaises(LayerOneDriverException, self._driver.set_attribute_value,
+                          self._port("leaf1", "9.1"), "Port State", "Disable")
+
+    def test_port_map_is_read_again_after_fabric_change(self):
+        self._driver.set_attribute_value(self._port("leaf1", "2.2"), "Port State",
+                                         "Disable")
+        self._fabric.bezel_portmaps["leaf1"]["2.2"] = 4
+        self._fabric.transactions["leaf1"] += 1
+        self._driver.get_state_id()
+        self._driver.set_attribute_value(self._port("leaf1", "2.2"), "Port State",
+                                         "Disable")
+        self.assertEqual(self._writes("set_port_state"),
+                         [("leaf1", 3, "disable"), ("leaf1", 4, "disable")])
+        self.assertEqual(self._fabric.reads.count("get_bezel_portmaps"), 2)